@@ -0,0 +1,239 @@
+"""Archival tier for companies that have left the working set.
+
+Discarded companies and completed incorporations stop changing, yet their
+company, diagnostic, intake and project documents would otherwise stay in
+the hot collections (and their indexes) forever. CompanyArchiver moves them
+out in batches and brings single companies back on demand.
+
+An archived company is one *bundle*: the company document plus every
+diagnostic, intake and project that references it. Where bundles live is up
+to the store:
+
+- CollectionStore keeps the bundle inside the company's archive entry.
+- FileStore writes each batch of bundles as one zstd-compressed NDJSON file
+  (one line per company) and keeps only the file and line in the entry.
+
+Either way the archive repository holds one small entry per company (name,
+NIF, status, owner, archive date), so the archive can be listed and searched
+without reading bundles. Hot routes never read it.
+
+Moves are ordered so an interrupted run loses nothing and can simply be run
+again: bundles are stored before the hot documents are deleted (company
+first, so a rerun can't archive a company whose children are already gone),
+and restored documents are written before the entry is dropped. Deletes are
+conditional on the state each bundle captured; a company whose company or
+child document changed in between is put back and stays hot.
+"""
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import zstandard
+
+# repository name -> field referencing the company
+CHILDREN = {"diagnostics": "company_id", "intakes": "company_id", "projects": "company_id"}
+
+# Fields a write changes, whichever a child carries: a child is only deleted
+# while they still hold the values captured in its bundle
+STATE_FIELDS = ["version", "state_version", "updated_at", "change_seq"]
+
+# Company fields copied onto its entry for listing and search
+ENTRY_FIELDS = ["id", "name", "nif", "sector", "status", "owner_id", "owner_name", "created_at"]
+
+# ==================== ENCODING ====================
+def _default(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Valor no serializable en el archivo: {value!r}")
+
+def _hook(obj: dict):
+    if set(obj) == {"$date"}:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+def encode_bundle(bundle: dict) -> bytes:
+    return json.dumps(bundle, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+def decode_bundle(line: bytes) -> dict:
+    return json.loads(line, object_hook=_hook)
+
+def archive_entry(bundle: dict, now: datetime) -> dict:
+    company = bundle["company"]
+    return {
+        **{field: company.get(field) for field in ENTRY_FIELDS},
+        "projects": len(bundle.get("projects", [])),
+        "archived_at": now
+    }
+
+# ==================== STORES ====================
+class CollectionStore:
+    """Bundles embedded in their archive entries"""
+
+    def __init__(self, repository):
+        self.repository = repository
+
+    async def save(self, entries: List[dict], bundles: List[dict]) -> None:
+        # Replaces the entries of a rerun after an interrupted archive
+        await self.repository.delete({"id": {"$in": [entry["id"] for entry in entries]}})
+        await self.repository.insert_many([{**entry, "bundle": bundle} for entry, bundle in zip(entries, bundles)])
+
+    async def load(self, entry: dict) -> dict:
+        if "bundle" not in entry:
+            entry = await self.repository.get({"id": entry["id"]})
+        return entry["bundle"]
+
+    async def discard(self, company_ids: List[str]) -> None:
+        await self.repository.delete({"id": {"$in": company_ids}})
+
+class FileStore:
+    """Bundles as zstd-compressed NDJSON files, one file per batch.
+
+    Files are written once and never edited; a file is deleted when no entry
+    points at it any more (all its companies restored or archived again).
+    """
+
+    def __init__(self, repository, directory: Path, level: int = 10):
+        self.repository = repository
+        self.directory = Path(directory)
+        self.level = level
+
+    def _write(self, name: str, bundles: List[dict]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data = zstandard.ZstdCompressor(level=self.level).compress(
+            b"".join(encode_bundle(bundle) + b"\n" for bundle in bundles)
+        )
+        # Written aside and renamed, so a file is either complete or absent
+        partial = self.directory / f"{name}.partial"
+        partial.write_bytes(data)
+        os.replace(partial, self.directory / name)
+
+    def _read(self, name: str, line: int) -> dict:
+        data = zstandard.ZstdDecompressor().decompress((self.directory / name).read_bytes())
+        return decode_bundle(data.split(b"\n")[line])
+
+    async def _prune(self, files: Set[str]) -> None:
+        for name in files:
+            if not await self.repository.count({"file": name}):
+                (self.directory / name).unlink(missing_ok=True)
+
+    async def _files(self, company_ids: List[str]) -> Set[str]:
+        entries = await self.repository.list({"id": {"$in": company_ids}})
+        return {entry["file"] for entry in entries if entry.get("file")}
+
+    async def save(self, entries: List[dict], bundles: List[dict]) -> None:
+        now = entries[0]["archived_at"]
+        name = f"companies-{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.ndjson.zst"
+        await asyncio.to_thread(self._write, name, bundles)
+        company_ids = [entry["id"] for entry in entries]
+        replaced = await self._files(company_ids)
+        await self.repository.delete({"id": {"$in": company_ids}})
+        await self.repository.insert_many([{**entry, "file": name, "line": i} for i, entry in enumerate(entries)])
+        await self._prune(replaced)
+
+    async def load(self, entry: dict) -> dict:
+        return await asyncio.to_thread(self._read, entry["file"], entry["line"])
+
+    async def discard(self, company_ids: List[str]) -> None:
+        files = await self._files(company_ids)
+        await self.repository.delete({"id": {"$in": company_ids}})
+        await self._prune(files)
+
+# ==================== ARCHIVER ====================
+class CompanyArchiver:
+    """Moves company bundles between the hot repositories and a store"""
+
+    def __init__(
+        self, repos, store, children: Optional[Dict[str, str]] = None, state_fields: Optional[List[str]] = None
+    ):
+        self.repos = repos
+        self.store = store
+        self.children = children or CHILDREN
+        self.state_fields = state_fields or STATE_FIELDS
+
+    async def bundles(self, companies: List[dict]) -> List[dict]:
+        company_ids = [company["id"] for company in companies]
+        bundles = {company["id"]: {"company": company, **{name: [] for name in self.children}} for company in companies}
+        for name, field in self.children.items():
+            for doc in await getattr(self.repos, name).list({field: {"$in": company_ids}}):
+                bundles[doc[field]][name].append(doc)
+        return [bundles[company_id] for company_id in company_ids]
+
+    async def archive(self, companies: List[dict], now: datetime, guard: Optional[dict] = None) -> List[str]:
+        """Archive `companies` (as read by the caller); returns the ids moved.
+
+        Each company is only deleted if it still matches `guard`, and each
+        child only if it is still in the state its bundle captured. Companies
+        written to since they were read, or with a child that was, stay hot
+        and their entries are dropped again.
+        """
+        if not companies:
+            return []
+        bundles = await self.bundles(companies)
+        await self.store.save([archive_entry(bundle, now) for bundle in bundles], bundles)
+        company_ids = [company["id"] for company in companies]
+        await self.repos.companies.delete({"id": {"$in": company_ids}, **(guard or {})})
+        kept = {company["id"] for company in await self.repos.companies.list({"id": {"$in": company_ids}})}
+        moved = [bundle for bundle in bundles if bundle["company"]["id"] not in kept]
+        changed = await self._delete_children(moved)
+        if changed:
+            await self._reinstate([bundle for bundle in moved if bundle["company"]["id"] in changed])
+            kept |= changed
+        if kept:
+            await self.store.discard(sorted(kept))
+        return [company_id for company_id in company_ids if company_id not in kept]
+
+    def _state(self, doc: dict) -> dict:
+        return {field: doc.get(field) for field in self.state_fields}
+
+    async def _delete_children(self, bundles: List[dict]) -> Set[str]:
+        """Delete the children of `bundles` that are unchanged since they were
+        read; returns the ids of companies left with a child (changed or
+        created since)"""
+        company_ids = [bundle["company"]["id"] for bundle in bundles]
+        changed = set()
+        for name, field in self.children.items():
+            repository = getattr(self.repos, name)
+            unchanged = [{"id": doc["id"], **self._state(doc)} for bundle in bundles for doc in bundle[name]]
+            if unchanged:
+                await repository.delete({"$or": unchanged})
+            if company_ids:
+                changed |= {doc[field] for doc in await repository.list({field: {"$in": company_ids}})}
+        return changed
+
+    async def _reinstate(self, bundles: List[dict]) -> None:
+        """Put back the deleted documents of companies that must stay hot;
+        the children still there are the newer ones and are kept"""
+        for name in self.children:
+            repository = getattr(self.repos, name)
+            docs = [doc for bundle in bundles for doc in bundle[name]]
+            if not docs:
+                continue
+            present = {doc["id"] for doc in await repository.list({"id": {"$in": [doc["id"] for doc in docs]}})}
+            missing = [doc for doc in docs if doc["id"] not in present]
+            if missing:
+                await repository.insert_many(missing)
+        # Company last, as in restore: it is only visible once complete
+        for bundle in bundles:
+            await self.repos.companies.insert(bundle["company"])
+
+    async def load(self, entry: dict) -> dict:
+        return await self.store.load(entry)
+
+    async def restore(self, bundle: dict) -> None:
+        """Write a bundle back to the hot repositories and drop its entry"""
+        company = bundle["company"]
+        # Children first: a company is only visible once it is complete.
+        # Leftovers of an interrupted run are replaced, not duplicated.
+        for name in self.children:
+            docs = bundle.get(name) or []
+            if docs:
+                repository = getattr(self.repos, name)
+                await repository.delete({"id": {"$in": [doc["id"] for doc in docs]}})
+                await repository.insert_many(docs)
+        if not await self.repos.companies.update({"id": company["id"]}, company):
+            await self.repos.companies.insert(company)
+        await self.store.discard([company["id"]])
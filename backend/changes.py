@@ -0,0 +1,262 @@
+"""Incremental change feed over companies and projects.
+
+Every write to a tracked repository stamps the documents it touches with
+`change_seq`, the next value of one global counter, and `changed_at`; every
+delete leaves a tombstone with its own sequence. An integration keeps the
+cursor of the last change it saw and asks for what came after it, so a sync
+costs in proportion to what changed rather than to the size of the data.
+A document that changed ten times since the cursor shows up once, with its
+latest state.
+
+The feed is ordered by (change_seq, entity, id): one update_many stamps all
+the documents it touches with the same sequence, so ties are broken by
+entity and id and the cursor remembers all three.
+
+Every write carries its stamp: the sequence number is taken first and goes
+in the same write as the change, so a document is never changed without
+being stamped. A write that then matches nothing leaves a gap in the
+sequence, which readers skip. Because numbers are taken before the writes
+land, two writers can land out of order: seq 11 may be visible while seq 10
+is still in flight. A reader that moved past 11 would never see 10. The feed
+therefore stops at the first change younger than `settle` (stamped less than
+that long ago) and hands those out on a later call, once the writes before
+them have landed. Sequence blocks are never reserved ahead per worker for
+the same reason: each write pays one counter round trip.
+
+Documents written around the repositories without a stamp (restores, old
+data) are out of the feed until `recover`, run periodically, stamps them.
+
+Tombstones expire after the retention period. A cursor remembers how old
+the oldest change it has not delivered may be; once that is past the
+retention, deletions may have been lost, the cursor is expired and the
+client must resynchronise from the start.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+COUNTER = "changes"
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Tie-break order of entities sharing a sequence; tombstones come last
+ENTITIES = ["company", "project"]
+TOMBSTONE = "deleted"
+RANKS = {entity: rank for rank, entity in enumerate(ENTITIES + [TOMBSTONE])}
+
+class CursorExpired(Exception):
+    """The cursor is older than the tombstone retention"""
+
+class InvalidCursor(Exception):
+    pass
+
+class Position:
+    """Where a reader is in the feed: the last change it received, and a
+    time no change still waiting for the reader is older than (what the
+    retention check compares against)"""
+    __slots__ = ("seq", "source", "id", "at")
+
+    def __init__(self, seq: int = 0, source: str = "", id: str = "", at: Optional[datetime] = None):
+        self.seq = seq
+        self.source = source  # an entity, or TOMBSTONE
+        self.id = id
+        self.at = at
+
+    def encode(self) -> str:
+        payload = {"s": self.seq, "e": self.source, "i": self.id, "t": self.at.isoformat() if self.at else None}
+        return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "Position":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            at = datetime.fromisoformat(payload["t"]) if payload["t"] else None
+            if payload["e"] and payload["e"] not in RANKS:
+                raise ValueError(payload["e"])
+            return cls(int(payload["s"]), payload["e"], str(payload["i"]), at)
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            raise InvalidCursor(cursor)
+
+    def after(self, source: str) -> dict:
+        """Filter selecting the rows of `source` that come after this position"""
+        if not self.source:
+            return {"change_seq": {"$gt": 0}}
+        if RANKS[source] > RANKS[self.source]:
+            return {"change_seq": {"$gte": self.seq}}
+        if source == self.source:
+            return {"$or": [{"change_seq": {"$gt": self.seq}}, {"change_seq": self.seq, "id": {"$gt": self.id}}]}
+        return {"change_seq": {"$gt": self.seq}}
+
+class Change:
+    """One entry of a feed page"""
+    __slots__ = ("entity", "op", "id", "seq", "changed_at", "document")
+
+    def __init__(self, entity: str, op: str, id: str, seq: int, changed_at: datetime, document: Optional[dict]):
+        self.entity = entity
+        self.op = op
+        self.id = id
+        self.seq = seq
+        self.changed_at = changed_at
+        self.document = document
+
+class TrackedRepository:
+    """A repository whose writes go through the change feed; reads and
+    anything else pass straight to the wrapped repository"""
+
+    def __init__(self, feed: "ChangeFeed", entity: str, inner):
+        self.feed = feed
+        self.entity = entity
+        self.inner = inner
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+    async def insert(self, doc: dict) -> None:
+        await self.inner.insert({**doc, **await self.feed.stamp()})
+
+    async def insert_many(self, docs: List[dict]) -> None:
+        if not docs:
+            return
+        stamps = await self.feed.stamps(len(docs))
+        await self.inner.insert_many([{**doc, **stamp} for doc, stamp in zip(docs, stamps)])
+
+    async def insert_new(self, doc: dict) -> bool:
+        return await self.inner.insert_new({**doc, **await self.feed.stamp()})
+
+    async def update(
+        self,
+        match: dict,
+        fields: dict,
+        exclude: Iterable[str] = (),
+        increments: Optional[dict] = None,
+        removes: Iterable[str] = ()
+    ):
+        return await self.inner.update(match, {**fields, **await self.feed.stamp()}, exclude, increments, removes)
+
+    async def update_computed(
+        self,
+        match: dict,
+        fields: dict,
+        increments: Optional[dict] = None,
+        counts: Optional[Dict[str, str]] = None,
+        guarded: Optional[Tuple[dict, dict, dict]] = None
+    ) -> Optional[dict]:
+        return await self.inner.update_computed(match, {**fields, **await self.feed.stamp()}, increments, counts, guarded)
+
+    async def update_many(self, match: dict, fields: dict) -> int:
+        return await self.inner.update_many(match, {**fields, **await self.feed.stamp()})
+
+    async def bulk_update(self, updates: List[Tuple[dict, dict]]) -> int:
+        if not updates:
+            return 0
+        stamps = await self.feed.stamps(len(updates))
+        return await self.inner.bulk_update([(match, {**fields, **stamp}) for (match, fields), stamp in zip(updates, stamps)])
+
+    async def delete(self, match: dict) -> int:
+        # The ids are read first so each deleted document gets a tombstone;
+        # those still present afterwards were not deleted
+        ids = [doc["id"] for doc in await self.inner.list(match)]
+        if not ids:
+            return 0
+        deleted = await self.inner.delete(match)
+        survivors = {doc["id"] for doc in await self.inner.list({"id": {"$in": ids}})}
+        await self.feed.bury(self.entity, [i for i in ids if i not in survivors])
+        return deleted
+
+class ChangeFeed:
+    """The global change sequence, tombstones and feed reads"""
+
+    def __init__(
+        self,
+        counters,
+        tombstones,
+        clock: Callable[[], datetime],
+        id_factory: Callable[[], str],
+        settle: timedelta = timedelta(seconds=2),
+        retention: timedelta = timedelta(days=30)
+    ):
+        self.counters = counters
+        self.tombstones = tombstones
+        self.clock = clock
+        self.id_factory = id_factory
+        self.settle = settle
+        self.retention = retention
+
+    def track(self, entity: str, repository) -> TrackedRepository:
+        return TrackedRepository(self, entity, repository)
+
+    async def reserve(self, count: int = 1) -> int:
+        """Take `count` consecutive sequence numbers; returns the first"""
+        counter = await self.counters.increment({"id": COUNTER}, {"seq": count})
+        return counter["seq"] - count + 1
+
+    async def stamp(self) -> dict:
+        seq = await self.reserve()
+        # Stamped after the number is taken, so later numbers never carry
+        # earlier times from this worker
+        return {"change_seq": seq, "changed_at": self.clock()}
+
+    async def stamps(self, count: int) -> List[dict]:
+        first = await self.reserve(count)
+        now = self.clock()
+        return [{"change_seq": first + i, "changed_at": now} for i in range(count)]
+
+    async def bury(self, entity: str, ids: List[str]) -> None:
+        if not ids:
+            return
+        stamps = await self.stamps(len(ids))
+        await self.tombstones.insert_many([
+            {"id": self.id_factory(), "entity": entity, "entity_id": entity_id, **stamp}
+            for entity_id, stamp in zip(ids, stamps)
+        ])
+
+    async def recover(self, sources: Dict[str, TrackedRepository], batch_size: int = 1000) -> int:
+        """Stamp documents that were written without a stamp; returns how
+        many. Each batch shares one sequence number, like an update_many."""
+        recovered = 0
+        for repository in sources.values():
+            while True:
+                ids = [doc["id"] for doc in await repository.inner.list({"change_seq": None}, limit=batch_size)]
+                if not ids:
+                    break
+                recovered += await repository.inner.update_many(
+                    {"id": {"$in": ids}, "change_seq": None}, await self.stamp()
+                )
+        return recovered
+
+    async def read(
+        self, sources: Dict[str, object], position: Position, limit: int
+    ) -> Tuple[List[Change], Position, bool]:
+        """Up to `limit` changes after `position`; returns them, the position
+        to resume from and whether more settled changes are waiting"""
+        now = self.clock()
+        if position.at is not None and position.at < now - self.retention:
+            raise CursorExpired(position.encode())
+
+        rows: List[Tuple[tuple, Change]] = []
+        for entity, repository in sources.items():
+            for doc in await repository.list(position.after(entity), sort=[("change_seq", 1), ("id", 1)], limit=limit + 1):
+                change = Change(entity, UPSERT, doc["id"], doc["change_seq"], doc["changed_at"], doc)
+                rows.append(((doc["change_seq"], RANKS[entity], doc["id"]), change))
+        wanted = {"entity": {"$in": list(sources)}}
+        query = {"$and": [wanted, position.after(TOMBSTONE)]}
+        for doc in await self.tombstones.list(query, sort=[("change_seq", 1), ("id", 1)], limit=limit + 1):
+            change = Change(doc["entity"], DELETE, doc["entity_id"], doc["change_seq"], doc["changed_at"], None)
+            rows.append(((doc["change_seq"], RANKS[TOMBSTONE], doc["id"]), change))
+        rows.sort(key=lambda row: row[0])
+
+        horizon = now - self.settle
+        page: List[Change] = []
+        for (seq, rank, row_id), change in rows:
+            if change.changed_at > horizon:
+                # Older sequence numbers may still be in flight
+                break
+            if len(page) == limit:
+                return page, position, True
+            page.append(change)
+            source = TOMBSTONE if change.op == DELETE else change.entity
+            position = Position(seq, source, row_id, change.changed_at)
+        # Caught up: nothing left to hand out was stamped before the horizon
+        return page, Position(position.seq, position.source, position.id, horizon), False
@@ -0,0 +1,594 @@
+"""Management commands for the Espacio de Datos backend.
+
+Run from the backend directory, with the same .env as the API:
+
+    python cli.py seed --companies 100000
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import typer
+
+from seed_data import DEFAULT_STATUS_WEIGHTS, generate_chunk, precompute_password_hashes
+
+app = typer.Typer(help="Espacio de Datos management commands", no_args_is_help=True)
+
+SEED_COLLECTIONS = ["companies", "diagnostics", "client_intakes", "projects", "users"]
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """Parse "lead=0.6,apta=0.25,descartada=0.15" into a dict"""
+    weights = {}
+    for part in value.split(","):
+        key, _, weight = part.partition("=")
+        if key.strip() not in DEFAULT_STATUS_WEIGHTS:
+            raise typer.BadParameter(f"Estado desconocido: {key}")
+        weights[key.strip()] = float(weight)
+    return weights
+
+def process_pool(workers: Optional[int]) -> ProcessPoolExecutor:
+    # spawn: the parent holds a Mongo client, which must not be forked
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+# ==================== SEED ====================
+async def _insert_batch(db, batch: Dict[str, list], semaphore: asyncio.Semaphore) -> None:
+    async def insert(name: str, docs: list):
+        async with semaphore:
+            await db[name].insert_many(docs, ordered=False)
+    await asyncio.gather(*(insert(name, docs) for name, docs in batch.items() if docs))
+
+async def _seed(
+    companies: int,
+    batch_size: int,
+    status_weights: Dict[str, float],
+    client_ratio: float,
+    days: int,
+    seed: int,
+    password: str,
+    password_pool: int,
+    bcrypt_rounds: int,
+    workers: Optional[int],
+    concurrency: int,
+    drop: bool
+) -> None:
+    from server import db, ensure_indexes
+
+    if drop:
+        for name in SEED_COLLECTIONS[:-1]:
+            await db[name].drop()
+        await db.users.delete_many({"role": "cliente"})
+        typer.echo("Colecciones de empresas y usuarios cliente vaciadas")
+
+    asesor = await db.users.find_one({"role": {"$in": ["asesor", "admin"]}}, {"_id": 0, "id": 1})
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    with process_pool(workers) as pool:
+        hashes = []
+        if client_ratio > 0:
+            hashes = await loop.run_in_executor(
+                None, precompute_password_hashes, pool, password, password_pool, bcrypt_rounds
+            )
+            typer.echo(f"{len(hashes)} hashes bcrypt precalculados en {time.perf_counter() - started:.1f}s")
+
+        options = {
+            "status_weights": status_weights,
+            "client_ratio": client_ratio,
+            "days": days,
+            "password_hashes": hashes,
+            "decided_by_user_id": asesor["id"] if asesor else None
+        }
+        # Keep a bounded window of chunks in flight so memory stays flat
+        window = max(2, (workers or multiprocessing.cpu_count()) * 2)
+        pending = []
+        inserted = {name: 0 for name in SEED_COLLECTIONS}
+        done = 0
+
+        async def drain_one():
+            nonlocal done
+            batch = await pending.pop(0)
+            await _insert_batch(db, batch, semaphore)
+            for name, docs in batch.items():
+                inserted[name] += len(docs)
+            done += len(batch["companies"])
+            elapsed = time.perf_counter() - started
+            typer.echo(f"{done}/{companies} empresas ({done / elapsed:,.0f}/s)")
+
+        for start in range(0, companies, batch_size):
+            count = min(batch_size, companies - start)
+            pending.append(loop.run_in_executor(pool, _generate_chunk_kwargs, seed, start, count, options))
+            if len(pending) >= window:
+                await drain_one()
+        while pending:
+            await drain_one()
+
+    await ensure_indexes()
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{name}={count}" for name, count in inserted.items())
+    typer.echo(f"Seed completado en {elapsed:.1f}s: {summary}")
+
+def _generate_chunk_kwargs(seed: int, start: int, count: int, options: dict):
+    # run_in_executor does not forward keyword arguments
+    return generate_chunk(seed, start, count, **options)
+
+@app.command()
+def seed(
+    companies: int = typer.Option(1000, help="Número de empresas a generar"),
+    batch_size: int = typer.Option(5000, help="Empresas por lote de insert_many"),
+    status_weights: str = typer.Option("lead=0.6,apta=0.25,descartada=0.15", help="Distribución de estados"),
+    client_ratio: float = typer.Option(0.5, help="Fracción de empresas con usuario cliente"),
+    days: int = typer.Option(365, help="Antigüedad máxima de las empresas generadas"),
+    seed: int = typer.Option(42, help="Semilla para datos reproducibles"),
+    password: str = typer.Option("cliente123", help="Contraseña de los usuarios cliente"),
+    password_pool: int = typer.Option(32, help="Hashes bcrypt distintos a precalcular"),
+    bcrypt_rounds: int = typer.Option(12, help="Coste bcrypt (12 = el de la API)"),
+    workers: Optional[int] = typer.Option(None, help="Procesos de generación (por defecto, núcleos)"),
+    concurrency: int = typer.Option(4, help="insert_many concurrentes"),
+    drop: bool = typer.Option(False, help="Vaciar las colecciones antes de sembrar")
+):
+    """Generate N synthetic companies with their related documents"""
+    asyncio.run(_seed(
+        companies, batch_size, parse_weights(status_weights), client_ratio, days, seed,
+        password, password_pool, bcrypt_rounds, workers, concurrency, drop
+    ))
+
+# ==================== ROLLUPS ====================
+async def _backfill_funnel() -> None:
+    from server import rebuild_funnel_rollups
+
+    started = time.perf_counter()
+    days = await rebuild_funnel_rollups()
+    typer.echo(f"funnel_daily reconstruido: {days} días en {time.perf_counter() - started:.1f}s")
+
+@app.command("backfill-funnel")
+def backfill_funnel():
+    """Rebuild the funnel_daily rollups from the source collections"""
+    asyncio.run(_backfill_funnel())
+
+# ==================== INTAKE FACETS ====================
+async def _backfill_intake_facets(batch_size: int) -> None:
+    from server import backfill_intake_facets
+
+    updated = await backfill_intake_facets(batch_size)
+    typer.echo(f"intake_facets actualizado en {updated} empresas")
+
+@app.command("backfill-intake-facets")
+def backfill_intake_facets_command(batch_size: int = typer.Option(1000, help="Actualizaciones por bulk_write")):
+    """Copy existing intake answers onto their companies for faceted filtering"""
+    asyncio.run(_backfill_intake_facets(batch_size))
+
+# ==================== ELIGIBILITY SCORING ====================
+async def _rescore_leads(batch_size: int, force: bool) -> None:
+    from server import rescore_pending_leads, scorer
+
+    started = time.perf_counter()
+    scored = await rescore_pending_leads(batch_size, stale_only=not force)
+    typer.echo(f"{scored} leads puntuados con reglas {scorer.version} en {time.perf_counter() - started:.1f}s")
+
+@app.command("rescore-leads")
+def rescore_leads(
+    batch_size: int = typer.Option(1000, help="Diagnósticos por lote"),
+    force: bool = typer.Option(False, help="Incluir los ya puntuados con las reglas actuales")
+):
+    """Score pending leads from their submitted intakes (after a rules change)"""
+    asyncio.run(_rescore_leads(batch_size, force))
+
+# ==================== DATA SPACES ====================
+async def _backfill_data_spaces() -> None:
+    from server import backfill_data_spaces
+
+    result = await backfill_data_spaces()
+    typer.echo(f"{result['created']} espacios de datos creados, {result['linked']} proyectos enlazados")
+
+@app.command("backfill-data-spaces")
+def backfill_data_spaces_command():
+    """Catalog the free-text space names of existing projects and link them"""
+    asyncio.run(_backfill_data_spaces())
+
+# ==================== OWNERSHIP ====================
+async def _backfill_owners(batch_size: int) -> None:
+    from server import backfill_owners
+
+    assigned = await backfill_owners(batch_size)
+    typer.echo(f"{assigned} empresas asignadas a asesores")
+
+@app.command("backfill-owners")
+def backfill_owners_command(batch_size: int = typer.Option(1000, help="Actualizaciones por bulk_write")):
+    """Assign every unowned company to the asesor with the lightest workload"""
+    asyncio.run(_backfill_owners(batch_size))
+
+# ==================== LIFECYCLE ====================
+async def _repair_lifecycle(batch_size: int) -> None:
+    from server import repair_lifecycle_mirrors
+
+    repaired = await repair_lifecycle_mirrors(batch_size)
+    typer.echo(f"{repaired} empresas con estado corregido")
+
+@app.command("repair-lifecycle")
+def repair_lifecycle_command(batch_size: int = typer.Option(500, help="Empresas por lote")):
+    """Realign company status and intake_status with their diagnostic and intake"""
+    asyncio.run(_repair_lifecycle(batch_size))
+
+# ==================== ARCHIVE ====================
+async def _archive_companies(older_than_days: Optional[int], batch_size: int, dry_run: bool) -> None:
+    from server import ARCHIVE_AFTER_DAYS, ARCHIVE_STORE, archive_companies
+
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+
+    def progress(count: int) -> None:
+        typer.echo(f"{count} empresas {'archivables' if dry_run else 'archivadas'}...")
+
+    started = time.perf_counter()
+    archived = await archive_companies(days, batch_size, dry_run, progress)
+    verb = "se archivarían" if dry_run else f"archivadas ({ARCHIVE_STORE})"
+    typer.echo(f"{archived} empresas {verb} en {time.perf_counter() - started:.1f}s")
+
+@app.command("archive-companies")
+def archive_companies_command(
+    older_than_days: Optional[int] = typer.Option(None, help="Días sin cambios (por defecto ARCHIVE_AFTER_DAYS)"),
+    batch_size: int = typer.Option(500, help="Empresas por lote"),
+    dry_run: bool = typer.Option(False, help="Solo contar las empresas archivables")
+):
+    """Move idle discarded companies and completed incorporations to the archive"""
+    asyncio.run(_archive_companies(older_than_days, batch_size, dry_run))
+
+# ==================== PROJECT PROGRESS ====================
+async def _backfill_checklist_completed() -> None:
+    from server import backfill_checklist_completed
+
+    updated = await backfill_checklist_completed()
+    typer.echo(f"checklist_completed actualizado en {updated} proyectos")
+
+@app.command("backfill-checklist-progress")
+def backfill_checklist_progress():
+    """Compute checklist_completed for projects written before it existed"""
+    asyncio.run(_backfill_checklist_completed())
+
+# ==================== USER SEARCH ====================
+async def _backfill_user_search(batch_size: int) -> None:
+    from server import backfill_user_name_lower
+
+    updated = await backfill_user_name_lower(batch_size)
+    typer.echo(f"name_lower actualizado en {updated} usuarios")
+
+@app.command("backfill-user-search")
+def backfill_user_search(batch_size: int = typer.Option(1000, help="Actualizaciones por bulk_write")):
+    """Store the folded user names used by the directory prefix search"""
+    asyncio.run(_backfill_user_search(batch_size))
+
+# ==================== CHANGE FEED ====================
+async def _backfill_change_feed(batch_size: int) -> None:
+    from server import backfill_change_feed
+
+    def progress(name: str, count: int) -> None:
+        typer.echo(f"{name}: {count} documentos marcados")
+
+    stamped = await backfill_change_feed(batch_size, progress)
+    typer.echo("Feed de cambios al día: " + ", ".join(f"{k}={v}" for k, v in stamped.items()))
+
+@app.command("backfill-change-feed")
+def backfill_change_feed_command(batch_size: int = typer.Option(1000, help="Documentos por lote")):
+    """Give a change sequence to companies and projects written outside the feed (seeds, old data)"""
+    asyncio.run(_backfill_change_feed(batch_size))
+
+# ==================== MIGRATIONS ====================
+async def _migrate_timestamps(batch_size: int) -> None:
+    from server import migrate_timestamps
+
+    def progress(name: str, count: int) -> None:
+        typer.echo(f"{name}: {count} documentos convertidos")
+
+    converted = await migrate_timestamps(batch_size, progress)
+    typer.echo("Migración completada: " + ", ".join(f"{k}={v}" for k, v in converted.items()))
+
+@app.command("migrate-timestamps")
+def migrate_timestamps_command(batch_size: int = typer.Option(1000, help="Documentos por lote")):
+    """Convert ISO string timestamps to native BSON dates"""
+    asyncio.run(_migrate_timestamps(batch_size))
+
+async def _migrate_ids(target: str, batch_size: int) -> None:
+    from server import db, ensure_indexes
+    from storage import Database, collection_stats, migrate_id_storage
+
+    def progress(name: str, count: int) -> None:
+        typer.echo(f"{name}: {count} documentos copiados")
+
+    report = await migrate_id_storage(db.raw, target, batch_size, progress)
+    await ensure_indexes(Database(db.raw, target))
+
+    typer.echo(f"\n{'colección':<16}{'documentos':>12}{'datos':>14}{'índices':>14}{'nº índices':>12}")
+    saved_data = saved_index = 0
+    for name, stats in report.items():
+        before = stats["before"]
+        after = await collection_stats(db.raw, name)
+        saved_data += before["size"] - after["size"]
+        saved_index += before["index_size"] - after["index_size"]
+        for label, row in (("antes", before), ("después", after)):
+            typer.echo(
+                f"{name + ' ' + label:<16}{row['count']:>12}{row['size']:>14,}{row['index_size']:>14,}{row['indexes']:>12}"
+            )
+    typer.echo(f"\nAhorro: {saved_data:,} bytes de datos, {saved_index:,} bytes de índices")
+    typer.echo(f"Arranca la API con ID_STORAGE={target}")
+
+@app.command("migrate-ids")
+def migrate_ids(
+    to: str = typer.Option(..., help="Modo destino: uuid (id como _id binario) o legacy"),
+    batch_size: int = typer.Option(5000, help="Documentos por lote")
+):
+    """Rewrite collections between id storage modes (stop the API first)"""
+    asyncio.run(_migrate_ids(to, batch_size))
+
+# ==================== SNAPSHOTS ====================
+def _human_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def _snapshot_progress(step: int):
+    reported: Dict[str, int] = {}
+
+    def progress(name: str, count: int) -> None:
+        if count - reported.get(name, 0) >= step:
+            reported[name] = count
+            typer.echo(f"{name}: {count} documentos")
+    return progress
+
+async def _snapshot(
+    out: str,
+    collections: Optional[List[str]],
+    database: Optional[str],
+    chunk_size: int,
+    level: int,
+    concurrency: int,
+    anonymize: bool,
+    salt: Optional[str]
+) -> None:
+    from server import client, db
+    from snapshot import create_snapshot, snapshot_size
+
+    source = client[database] if database else db.raw
+    started = time.perf_counter()
+    manifest = await create_snapshot(
+        source, out, db.mode, collections, chunk_size, level, concurrency, anonymize, salt,
+        _snapshot_progress(chunk_size * 10)
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(info["count"] for info in manifest["collections"].values())
+    for name, info in manifest["collections"].items():
+        typer.echo(f"{name:<24}{info['count']:>12}{len(info['chunks']):>8} fragmentos")
+    typer.echo(
+        f"Instantánea de {total} documentos en {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} docs/s), "
+        f"{_human_bytes(snapshot_size(out))} en {out}" + (" (anonimizada)" if anonymize else "")
+    )
+
+@app.command("snapshot")
+def snapshot_command(
+    out: str = typer.Option(..., help="Directorio de destino (nuevo o vacío)"),
+    collection: Optional[List[str]] = typer.Option(None, help="Solo estas colecciones (repetible)"),
+    database: Optional[str] = typer.Option(None, help="Base de datos de origen (por defecto DB_NAME)"),
+    chunk_size: int = typer.Option(50000, help="Documentos por fragmento zstd"),
+    level: int = typer.Option(3, help="Nivel de compresión zstd"),
+    concurrency: int = typer.Option(4, help="Colecciones exportadas a la vez"),
+    anonymize: bool = typer.Option(False, help="Sustituir emails, nombres y teléfonos"),
+    salt: Optional[str] = typer.Option(None, help="Clave de anonimización, para obtener los mismos valores entre instantáneas")
+):
+    """Stream every application collection into a chunked zstd snapshot"""
+    asyncio.run(_snapshot(out, collection, database, chunk_size, level, concurrency, anonymize, salt))
+
+async def _restore_snapshot(
+    source: str,
+    collections: Optional[List[str]],
+    database: Optional[str],
+    drop: bool,
+    batch_size: int,
+    concurrency: int
+) -> None:
+    from server import client, db
+    from snapshot import load_manifest, restore_snapshot
+
+    manifest = load_manifest(source)
+    target = client[database] if database else db.raw
+    started = time.perf_counter()
+    restored = await restore_snapshot(
+        target, source, collections, drop, batch_size, concurrency, _snapshot_progress(batch_size * 100)
+    )
+    elapsed = time.perf_counter() - started
+    total = sum(restored.values())
+    typer.echo(
+        f"Restaurados {total} documentos en {len(restored)} colecciones en {elapsed:.1f}s "
+        f"({total / max(elapsed, 1e-9):,.0f} docs/s), índices incluidos"
+    )
+    if manifest["id_storage"] != db.mode:
+        typer.echo(f"La instantánea usa ID_STORAGE={manifest['id_storage']}: arranca la API con ese modo")
+
+@app.command("restore-snapshot")
+def restore_snapshot_command(
+    source: str = typer.Option(..., "--from", help="Directorio de la instantánea"),
+    collection: Optional[List[str]] = typer.Option(None, help="Solo estas colecciones (repetible)"),
+    database: Optional[str] = typer.Option(None, help="Base de datos de destino (por defecto DB_NAME)"),
+    drop: bool = typer.Option(False, help="Borrar antes las colecciones de destino"),
+    batch_size: int = typer.Option(5000, help="Documentos por insert_many"),
+    concurrency: int = typer.Option(8, help="Fragmentos cargados a la vez")
+):
+    """Load a snapshot with parallel bulk inserts, building indexes at the end"""
+    asyncio.run(_restore_snapshot(source, collection, database, drop, batch_size, concurrency))
+
+# ==================== BENCHMARKS ====================
+async def _asgi_request(app, path: str, token: str, method: str = "GET") -> int:
+    """One body-less request straight through the ASGI app; returns the status code"""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("bench", 0),
+        "server": ("bench", 80)
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def _load_memory(companies: int, seed: int):
+    """Import the API on the in-memory engine with `companies` synthetic
+    companies loaded; returns (app, synthetic batch, admin token)"""
+    # Must be set before server is imported; the Mongo client is never used
+    os.environ["STORAGE_ENGINE"] = "memory"
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "bench")
+    from server import app, create_token, repos
+
+    started = time.perf_counter()
+    batch = generate_chunk(seed, 0, companies, password_hashes=["-"])
+    targets = {
+        "companies": repos.companies,
+        "diagnostics": repos.diagnostics,
+        "client_intakes": repos.intakes,
+        "projects": repos.projects,
+        "users": repos.users
+    }
+    for name, docs in batch.items():
+        await targets[name].insert_many(docs)
+    admin = {
+        "id": str(uuid.uuid4()),
+        "email": "bench@espaciodatos.com",
+        "name": "Bench",
+        "name_lower": "bench",
+        "password": "-",
+        "role": "admin",
+        "company_id": None,
+        "created_at": datetime.now(timezone.utc)
+    }
+    await repos.users.insert(admin)
+    typer.echo(f"{companies} empresas cargadas en memoria en {time.perf_counter() - started:.1f}s")
+    return app, batch, create_token(admin["id"], admin["email"], "admin")
+
+def _latency_row(label: str, timings: list, errors: int) -> str:
+    timings.sort()
+    pick = lambda q: timings[min(int(q * len(timings)), len(timings) - 1)]
+    return (
+        f"{label:<34}{pick(0.5):>10.2f}{pick(0.95):>10.2f}{pick(0.99):>10.2f}"
+        f"{len(timings) / (sum(timings) / 1000):>10,.0f}{errors:>9}"
+    )
+
+LATENCY_HEADER = f"\n{'escenario':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errores':>9}"
+
+async def _bench_api(companies: int, requests: int, seed: int) -> None:
+    app, batch, admin_token = await _load_memory(companies, seed)
+    from server import create_token
+
+    clients = [user for user in batch["users"] if user.get("company_id")]
+    company_ids = [company["id"] for company in batch["companies"]]
+    scenarios = {
+        "GET /companies/{id}": lambda i: (f"/api/companies/{company_ids[i % len(company_ids)]}", admin_token),
+        "GET /companies/{id}/diagnostic": lambda i: (f"/api/companies/{company_ids[i % len(company_ids)]}/diagnostic", admin_token),
+        "GET /companies/{id}/similar": lambda i: (f"/api/companies/{company_ids[i % len(company_ids)]}/similar", admin_token),
+        "GET /projects?limit=50": lambda i: ("/api/projects?limit=50", admin_token),
+        "GET /analytics/funnel": lambda i: ("/api/analytics/funnel", admin_token)
+    }
+    if clients:
+        client_tokens = [create_token(user["id"], user["email"], "cliente") for user in clients[:100]]
+        scenarios["GET /client/dashboard"] = lambda i: ("/api/client/dashboard", client_tokens[i % len(client_tokens)])
+
+    typer.echo(LATENCY_HEADER)
+    for label, build in scenarios.items():
+        timings = []
+        errors = 0
+        for i in range(requests):
+            path, token = build(i)
+            t0 = time.perf_counter()
+            if await _asgi_request(app, path, token) >= 400:
+                errors += 1
+            timings.append((time.perf_counter() - t0) * 1000)
+        typer.echo(_latency_row(label, timings, errors))
+
+@app.command("bench-api")
+def bench_api(
+    companies: int = typer.Option(2000, help="Empresas sintéticas a cargar en memoria"),
+    requests: int = typer.Option(2000, help="Peticiones por escenario"),
+    seed: int = typer.Option(42, help="Semilla para datos reproducibles")
+):
+    """Micro-benchmark the API in process on the in-memory storage engine (no Mongo)"""
+    asyncio.run(_bench_api(companies, requests, seed))
+
+async def _bench_transitions(companies: int, seed: int) -> None:
+    app, batch, admin_token = await _load_memory(companies, seed)
+    intakes = {intake["company_id"]: intake for intake in batch["client_intakes"]}
+    diagnostics = {diagnostic["company_id"]: diagnostic for diagnostic in batch["diagnostics"]}
+    unsubmitted = [company_id for company_id, intake in intakes.items() if not intake.get("submitted")]
+    pending = [company_id for company_id, diagnostic in diagnostics.items() if diagnostic["result"] == "pendiente"]
+    projects = [project["company_id"] for project in batch["projects"] if project["incorporation_status"] == "pendiente"]
+    # Half the pending diagnostics are decided one at a time, the other half
+    # by two racing requests (approve and reject) of which exactly one may win
+    sequential, racing = pending[:len(pending) // 2], pending[len(pending) // 2:]
+
+    async def timed(path: str) -> tuple:
+        t0 = time.perf_counter()
+        status = await _asgi_request(app, path, admin_token, "POST")
+        return status, (time.perf_counter() - t0) * 1000
+
+    plans = [
+        ("submit_intake", unsubmitted),
+        ("reset_intake", unsubmitted),
+        ("approve", sequential[::2]),
+        ("reject", sequential[1::2]),
+        ("start_incorporation", projects)
+    ]
+    typer.echo(LATENCY_HEADER)
+    for name, company_ids in plans:
+        if not company_ids:
+            continue
+        timings = []
+        errors = 0
+        for company_id in company_ids:
+            status, elapsed = await timed(f"/api/companies/{company_id}/transitions/{name}")
+            errors += status >= 400
+            timings.append(elapsed)
+        typer.echo(_latency_row(f"POST transitions/{name}", timings, errors))
+
+    if racing:
+        results = await asyncio.gather(*(
+            timed(f"/api/companies/{company_id}/transitions/{name}")
+            for company_id in racing for name in ("approve", "reject")
+        ))
+        won = sum(status < 400 for status, _ in results)
+        conflicts = sum(status == 409 for status, _ in results)
+        typer.echo(_latency_row("POST transitions (carrera)", [elapsed for _, elapsed in results], conflicts))
+        typer.echo(f"\n{len(racing)} diagnósticos disputados: {won} transiciones aplicadas, {conflicts} rechazadas (409)")
+        if won != len(racing):
+            raise typer.Exit(code=1)
+
+@app.command("bench-transitions")
+def bench_transitions(
+    companies: int = typer.Option(2000, help="Empresas sintéticas a cargar en memoria"),
+    seed: int = typer.Option(42, help="Semilla para datos reproducibles")
+):
+    """Measure lifecycle transition latency in process on the in-memory engine,
+    and check that racing transitions on one diagnostic apply exactly once"""
+    asyncio.run(_bench_transitions(companies, seed))
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,282 @@
+"""Idempotency-Key support for POST requests.
+
+A client that may retry a POST (flaky mobile networks, timeouts) sends an
+`Idempotency-Key` header, unique per logical operation. The first request
+with a key runs normally and its response (status, headers, body) is stored;
+any retry with the same key gets that response replayed, marked with
+`Idempotent-Replayed: true`, without the handler running again: no second
+company, no second bcrypt hash, no second decision.
+
+Keys are scoped to the authenticated user and bound to the request they
+were first used with (method, path, query and body): reusing a key for a
+different request is a 422. Unauthenticated requests (login) are never
+stored.
+
+State lives in two places:
+
+- A repository (a TTL-indexed Mongo collection) shared by all workers. The
+  first request claims the key by inserting a "pending" record; the record
+  becomes "completed" with the response once the handler finishes. Records
+  expire after the TTL.
+- An in-process LRU of completed responses, so hot retries never reach
+  Mongo, plus one future per key being handled here, so concurrent
+  duplicates in this worker wait for the first one instead of polling.
+
+A duplicate that finds the key pending in another worker polls until it
+completes, up to `wait_timeout`, then gets a 409. A claim carries a lease:
+if its worker dies mid-request the key can be claimed again once the lease
+runs out. Responses with a 5xx status, or handlers that raise, release the
+key so the retry runs the handler again.
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+PENDING = "pendiente"
+COMPLETED = "completada"
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+# Larger responses are not worth keeping; their keys are released instead
+MAX_STORED_BODY = 1024 * 1024
+
+class IdempotencyConflict(Exception):
+    """The key is unusable for this request; carries the HTTP status to send"""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+# ==================== STORE ====================
+class IdempotencyStore:
+    """Claims keys and keeps the responses of completed requests"""
+
+    def __init__(
+        self,
+        repository,
+        clock: Callable[[], datetime],
+        ttl: timedelta = timedelta(hours=24),
+        lease: timedelta = timedelta(seconds=60),
+        lru_size: int = 10000,
+        wait_timeout: float = 10.0,
+        poll_interval: float = 0.05
+    ):
+        self.repository = repository
+        self.clock = clock
+        self.ttl = ttl
+        self.lease = lease
+        self.lru_size = lru_size
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._lru: "OrderedDict[str, dict]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _check(record: dict, fingerprint: str) -> None:
+        if record["fingerprint"] != fingerprint:
+            raise IdempotencyConflict(422, "La Idempotency-Key ya se usó con otra petición")
+
+    def _remember(self, key: str, record: dict) -> None:
+        self._lru[key] = record
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _cached(self, key: str) -> Optional[dict]:
+        record = self._lru.get(key)
+        if record is None:
+            return None
+        if record["created_at"] + self.ttl <= self.clock():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return record
+
+    def _own(self, key: str) -> None:
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Claim `key`: returns None when the caller now owns it and must run
+        the request, or the stored response to replay"""
+        record = self._cached(key)
+        if record is not None:
+            self._check(record, fingerprint)
+            return record["response"]
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        waiting = self._inflight.get(key)
+        if waiting is not None:
+            # Same worker: wait for the first request instead of polling
+            try:
+                record = await asyncio.wait_for(asyncio.shield(waiting), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise IdempotencyConflict(409, "Ya hay una petición en curso con esta Idempotency-Key")
+            if record is not None:
+                self._check(record, fingerprint)
+                return record["response"]
+
+        while True:
+            now = self.clock()
+            claimed = await self.repository.insert_new({
+                "id": key,
+                "fingerprint": fingerprint,
+                "status": PENDING,
+                "locked_until": now + self.lease,
+                "response": None,
+                "created_at": now
+            })
+            if claimed:
+                self._own(key)
+                return None
+            record = await self.repository.get({"id": key})
+            if record is not None:
+                self._check(record, fingerprint)
+                if record["status"] == COMPLETED:
+                    self._remember(key, record)
+                    return record["response"]
+                # The worker holding the claim died: take it over
+                if record["locked_until"] <= now and await self.repository.update(
+                    {"id": key, "status": PENDING, "locked_until": record["locked_until"]},
+                    {"locked_until": now + self.lease}
+                ):
+                    self._own(key)
+                    return None
+            if loop.time() >= deadline:
+                raise IdempotencyConflict(409, "Ya hay una petición en curso con esta Idempotency-Key")
+            await asyncio.sleep(self.poll_interval)
+
+    def _settle(self, key: str, record: Optional[dict]) -> None:
+        waiting = self._inflight.pop(key, None)
+        if waiting is not None and not waiting.done():
+            waiting.set_result(record)
+
+    async def complete(self, key: str, response: dict) -> None:
+        record = await self.repository.update(
+            {"id": key, "status": PENDING},
+            {"status": COMPLETED, "response": response, "completed_at": self.clock()}
+        )
+        if record is not None:
+            self._remember(key, record)
+        self._settle(key, record)
+
+    async def release(self, key: str) -> None:
+        """Forget a claim without a stored response, so a retry runs again"""
+        try:
+            await self.repository.delete({"id": key, "status": PENDING})
+        finally:
+            self._settle(key, None)
+
+# ==================== MIDDLEWARE ====================
+class IdempotencyMiddleware:
+    """ASGI middleware applying an IdempotencyStore to keyed POST requests.
+
+    `identify(headers)` returns the authenticated user id, or None to let
+    the request through untouched (the route then answers 401 as usual).
+    """
+
+    def __init__(self, app, store: IdempotencyStore, identify: Callable[[Dict[str, str]], Optional[str]]):
+        self.app = app
+        self.store = store
+        self.identify = identify
+
+    @staticmethod
+    async def _send_json(send, status: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _replay(send, response: dict) -> None:
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]]
+        headers += [
+            (b"content-length", str(len(response["body"])).encode()),
+            (b"idempotent-replayed", b"true")
+        ]
+        await send({"type": "http.response.start", "status": response["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": response["body"]})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        raw_key = next((value for name, value in scope.get("headers", []) if name == HEADER), None)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode().lower(): value.decode() for name, value in scope.get("headers", [])}
+        user_id = self.identify(headers)
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+        if not raw_key.strip() or len(raw_key) > MAX_KEY_LENGTH:
+            await self._send_json(send, 400, f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres")
+            return
+
+        # The body is read up front to fingerprint the request, then handed
+        # to the app as a single message
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+
+        key = hashlib.sha256(user_id.encode() + b"\0" + raw_key.strip()).hexdigest()
+        fingerprint = hashlib.sha256(b"\0".join([
+            scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body
+        ])).hexdigest()
+        try:
+            stored = await self.store.begin(key, fingerprint)
+        except IdempotencyConflict as conflict:
+            await self._send_json(send, conflict.status, conflict.detail)
+            return
+        if stored is not None:
+            await self._replay(send, stored)
+            return
+
+        delivered = False
+        async def replay_body():
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = 500
+        response_headers: List[List[str]] = []
+        response_body: List[bytes] = []
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.extend(
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.lower() != b"content-length"
+                )
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, capture)
+        except BaseException:
+            await self.store.release(key)
+            raise
+        stored_body = b"".join(response_body)
+        if status >= 500 or len(stored_body) > MAX_STORED_BODY:
+            await self.store.release(key)
+        else:
+            await self.store.complete(key, {"status": status, "headers": response_headers, "body": stored_body})
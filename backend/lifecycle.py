@@ -0,0 +1,203 @@
+"""Declarative state machine for the company lifecycle.
+
+A company's state is spread over four documents: company.status,
+intake.submitted (mirrored as company.intake_status), diagnostic.result and
+project.incorporation_status. Each Transition names the document and field
+it moves, the states it may start from and the state it leaves, plus any
+extra conditions (`guard`) and the fields it stamps on the way.
+
+Applying a transition is a single conditional update whose filter encodes
+the allowed source states, so two requests racing for the same transition
+can never both win and no read is needed beforehand. Only a rejected
+transition pays for a second read, to tell "nothing to transition" from
+"wrong state".
+
+The company fields a transition mirrors (`company`) are written once the
+conditional update has won, and that write is conditional too. Every
+mirroring transition bumps `state_version` on the document it moves, and
+the company records the version its mirror was taken from
+(`mirrored_versions.<entity>`): a mirror write only lands if it is newer, so
+when a submit and a reset of the same intake race, the company ends up
+mirroring whichever won last, whatever order the mirror writes arrive in.
+A crash between the two writes leaves the mirror behind; `repair` puts
+companies back in step with their documents.
+
+A transition that notifies the client (`notify`) records the notification
+in its own conditional update (see notifications.py), so it is never lost
+to a crash after the transition wins.
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from notifications import pending_notification
+
+# Bumped on a document by every transition that mirrors onto the company
+STATE_VERSION = "state_version"
+# Company field holding, per entity, the state_version its mirror reflects
+MIRRORED_VERSIONS = "mirrored_versions"
+
+class Transition:
+    """One allowed move of one field"""
+
+    def __init__(
+        self,
+        name: str,
+        entity: str,
+        field: str,
+        source: Iterable[Any],
+        target: Any,
+        roles: Iterable[str],
+        guard: Optional[Dict[str, Any]] = None,
+        stamps: Iterable[str] = (),
+        clears: Iterable[str] = (),
+        actor: Optional[str] = None,
+        increments: Optional[Dict[str, int]] = None,
+        company: Optional[Dict[str, Any]] = None,
+        effect: Optional[Callable[..., Awaitable[None]]] = None,
+        notify: Optional[str] = None
+    ):
+        """`entity` is the repository name; `source` may include None for
+        documents written before the field existed. `stamps` get the
+        transition time, `clears` None, `actor` the acting user's id.
+        `effect` runs after a successful transition (rollups, activity);
+        `notify` is the event of the notification it records."""
+        self.name = name
+        self.entity = entity
+        self.field = field
+        self.source = tuple(source)
+        self.target = target
+        self.roles = tuple(roles)
+        self.guard = guard or {}
+        self.stamps = tuple(stamps)
+        self.clears = tuple(clears)
+        self.actor = actor
+        self.increments = increments
+        self.company = company or {}
+        self.effect = effect
+        self.notify = notify
+
+    @property
+    def key(self) -> str:
+        return "id" if self.entity == "companies" else "company_id"
+
+    def filter(self, company_id: str) -> dict:
+        return {self.key: company_id, self.field: {"$in": list(self.source)}, **self.guard}
+
+    @property
+    def mirror_version(self) -> str:
+        return f"{MIRRORED_VERSIONS}.{self.entity}"
+
+    def changes(self, now, actor_id: Optional[str] = None) -> dict:
+        changes = {self.field: self.target}
+        changes.update({field: now for field in self.stamps})
+        changes.update({field: None for field in self.clears})
+        if self.actor:
+            changes[self.actor] = actor_id
+        return changes
+
+class TransitionRejected(Exception):
+    """The document is missing (`current` None) or not in a source state"""
+
+    def __init__(self, transition: Transition, current: Optional[dict]):
+        super().__init__(transition.name)
+        self.transition = transition
+        self.current = current
+
+class Applied:
+    """A transition that won: the moved document and the company after it"""
+    __slots__ = ("transition", "document", "company")
+
+    def __init__(self, transition: Transition, document: dict, company: Optional[dict]):
+        self.transition = transition
+        self.document = document
+        self.company = company
+
+class StateMachine:
+    """The transitions of one lifecycle, applied through a Repositories.
+
+    `initial` holds the company fields of documents no mirroring transition
+    has moved yet (a pending diagnostic: a "lead" company).
+    """
+
+    def __init__(self, repos, transitions: Iterable[Transition], initial: Optional[Dict[str, Any]] = None):
+        self.repos = repos
+        self.transitions: Dict[str, Transition] = {t.name: t for t in transitions}
+        self.initial = initial or {}
+
+    def get(self, name: str) -> Optional[Transition]:
+        return self.transitions.get(name)
+
+    async def apply(self, name: str, company_id: str, now, actor_id: Optional[str] = None) -> Applied:
+        transition = self.transitions[name]
+        repository = getattr(self.repos, transition.entity)
+        changes = transition.changes(now, actor_id)
+        increments = dict(transition.increments or {})
+        if transition.company:
+            increments[STATE_VERSION] = 1
+        if transition.notify:
+            fields, counts = pending_notification(transition.notify, now)
+            changes.update(fields)
+            increments.update(counts)
+        document = await repository.update(
+            transition.filter(company_id),
+            changes,
+            increments=increments or None
+        )
+        if document is None:
+            raise TransitionRejected(transition, await repository.get({transition.key: company_id}))
+        company = None
+        if transition.company:
+            version = document[STATE_VERSION]
+            field = transition.mirror_version
+            company = await self.repos.companies.update(
+                {"id": company_id, "$or": [{field: {"$lt": version}}, {field: None}]},
+                {**transition.company, field: version, "updated_at": now}
+            )
+            if company is None:
+                # A later transition already mirrored (or the company is gone)
+                company = await self.repos.companies.get({"id": company_id})
+        return Applied(transition, document, company)
+
+    def mirroring(self) -> Dict[str, List[Transition]]:
+        """entity -> its transitions that mirror onto the company"""
+        entities: Dict[str, List[Transition]] = {}
+        for transition in self.transitions.values():
+            if transition.company and transition.entity != "companies":
+                entities.setdefault(transition.entity, []).append(transition)
+        return entities
+
+    def expected(self, transitions: List[Transition], document: dict) -> Dict[str, Any]:
+        """Company fields that `document`'s current state mirrors to"""
+        fields = {key: self.initial.get(key) for t in transitions for key in t.company}
+        for transition in transitions:
+            if document.get(transition.field) == transition.target:
+                fields.update(transition.company)
+        return fields
+
+    async def repair(self, companies: List[dict], now) -> int:
+        """Rewrite the mirrored fields of `companies` that disagree with their
+        documents; returns how many companies were repaired. Each write is
+        conditional on the mirror versions read, so a transition landing
+        meanwhile is never undone."""
+        company_ids = [company["id"] for company in companies]
+        documents: Dict[str, Dict[str, dict]] = {}
+        for entity in self.mirroring():
+            for doc in await getattr(self.repos, entity).list({"company_id": {"$in": company_ids}}):
+                documents.setdefault(doc["company_id"], {})[entity] = doc
+        repaired = 0
+        for company in companies:
+            mirrored = company.get(MIRRORED_VERSIONS) or {}
+            changes: Dict[str, Any] = {}
+            for entity, transitions in self.mirroring().items():
+                document = documents.get(company["id"], {}).get(entity)
+                if document is None:
+                    continue
+                expected = self.expected(transitions, document)
+                if any(company.get(key) != value for key, value in expected.items()):
+                    changes.update(expected)
+                    changes[f"{MIRRORED_VERSIONS}.{entity}"] = document.get(STATE_VERSION) or 0
+            if not changes:
+                continue
+            guard = {f"{MIRRORED_VERSIONS}.{entity}": mirrored.get(entity) for entity in self.mirroring()}
+            if await self.repos.companies.update({"id": company["id"], **guard}, {**changes, "updated_at": now}):
+                repaired += 1
+        return repaired
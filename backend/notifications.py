@@ -0,0 +1,376 @@
+"""Client notifications through a transactional outbox.
+
+Routes never talk to a mail server or a webhook. The state change that
+warrants a notification (a diagnostic decided, an incorporation completed)
+records it on the document it moves, in the same conditional update
+(`pending_notification`): the change and the notification land together or
+not at all, without a multi-document transaction. The request then moves it
+into the outbox, one entry per delivery channel, and returns. OutboxDispatcher,
+a background task on every API worker, delivers them:
+
+- Collecting: each round also sweeps the documents still holding pending
+  notifications older than `grace` (their request died before moving them).
+  Entry ids derive from the notification id, so moving one twice writes its
+  entries once; a notification leaves its document only after its entries
+  are in the outbox.
+
+- Claiming: due entries are taken with a conditional update that moves them
+  to "enviando" and pushes `next_attempt_at` out by a lease. Only one worker
+  wins each entry; if it dies mid-delivery the lease expires and another one
+  picks the entry up again, so delivery is at least once.
+- Batching and limits: up to `batch_size` entries per round, at most
+  `concurrency` deliveries in flight, each bounded by `timeout`.
+- Retries: a failed delivery goes back to "pendiente" with exponential
+  backoff plus jitter; after `max_attempts` it stays "fallida" until an
+  admin requeues it.
+
+Sinks are pluggable, one per channel: SMTP, an HTTP webhook (JSON body,
+optional HMAC-SHA256 signature) and an in-memory stub for tests and local
+runs. They are configured from the environment:
+
+    NOTIFY_SINKS=smtp,webhook       # channels to write entries for
+    SMTP_HOST, SMTP_PORT (587), SMTP_USER, SMTP_PASSWORD, SMTP_FROM,
+    SMTP_STARTTLS (true)
+    NOTIFY_WEBHOOK_URL, NOTIFY_WEBHOOK_SECRET
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import smtplib
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pendiente"
+SENDING = "enviando"
+SENT = "enviada"
+FAILED = "fallida"
+
+# ==================== SINKS ====================
+class StubSink:
+    """Keeps the last deliveries in memory; `fail_next` makes sends raise"""
+
+    def __init__(self, keep: int = 1000):
+        self.sent: deque = deque(maxlen=keep)
+        self.fail_next = 0
+
+    async def send(self, entry: dict) -> None:
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError("stub failure")
+        self.sent.append(entry)
+        logger.info(f"Notification {entry['event']} for company {entry['company_id']} (stub)")
+
+class SmtpSink:
+    """Plain-text email to the entry's recipients"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        sender: Optional[str] = None,
+        starttls: bool = True,
+        timeout: float = 10.0
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender or user
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def _send(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or "")
+            smtp.send_message(message)
+
+    async def send(self, entry: dict) -> None:
+        if not entry.get("recipients"):
+            return
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = ", ".join(entry["recipients"])
+        message["Subject"] = entry["subject"]
+        message.set_content(entry["body"])
+        # smtplib blocks: keep it off the event loop
+        await asyncio.to_thread(self._send, message)
+
+class WebhookSink:
+    """POSTs the event as JSON; signed with X-Signature when a secret is set"""
+
+    def __init__(self, url: str, secret: Optional[str] = None, timeout: float = 10.0):
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+
+    def _post(self, body: bytes, headers: dict) -> None:
+        requests.post(self.url, data=body, headers=headers, timeout=self.timeout).raise_for_status()
+
+    async def send(self, entry: dict) -> None:
+        body = json.dumps({
+            "id": entry["id"],
+            "event": entry["event"],
+            "company_id": entry["company_id"],
+            "data": entry.get("payload") or {},
+            "created_at": entry["created_at"].isoformat()
+        }, ensure_ascii=False).encode()
+        headers = {"Content-Type": "application/json", "X-Event-Id": entry["id"]}
+        if self.secret:
+            digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Signature"] = f"sha256={digest}"
+        await asyncio.to_thread(self._post, body, headers)
+
+def sinks_from_env(env: Mapping[str, str]) -> Dict[str, object]:
+    """channel -> sink for every channel listed in NOTIFY_SINKS"""
+    sinks: Dict[str, object] = {}
+    for name in filter(None, (part.strip() for part in env.get("NOTIFY_SINKS", "").split(","))):
+        if name == "smtp":
+            sinks[name] = SmtpSink(
+                env["SMTP_HOST"],
+                int(env.get("SMTP_PORT", "587")),
+                env.get("SMTP_USER"),
+                env.get("SMTP_PASSWORD"),
+                env.get("SMTP_FROM"),
+                env.get("SMTP_STARTTLS", "true").lower() == "true"
+            )
+        elif name == "webhook":
+            sinks[name] = WebhookSink(env["NOTIFY_WEBHOOK_URL"], env.get("NOTIFY_WEBHOOK_SECRET"))
+        elif name == "stub":
+            sinks[name] = StubSink()
+        else:
+            raise ValueError(f"Canal de notificación desconocido: {name}")
+    return sinks
+
+# ==================== PENDING ====================
+# On the document whose state change warrants them: notification id -> the
+# notifications not yet in the outbox, and how many there are (what the
+# sweep looks for)
+PENDING_FIELD = "pending_notifications"
+PENDING_COUNT = "pending_notifications_count"
+
+def pending_notification(event: str, now: datetime) -> Tuple[dict, dict]:
+    """(fields, increments) to add to the update making the state change"""
+    notification_id = str(uuid.uuid4())
+    record = {"id": notification_id, "event": event, "created_at": now}
+    return {f"{PENDING_FIELD}.{notification_id}": record}, {PENDING_COUNT: 1}
+
+# ==================== OUTBOX ====================
+def outbox_entries(
+    channels: List[str],
+    event: str,
+    company_id: str,
+    subject: str,
+    body: str,
+    recipients: List[str],
+    payload: dict,
+    now: datetime,
+    key: Optional[str] = None
+) -> List[dict]:
+    """One entry per channel; email channels are skipped without recipients.
+    With `key` (a pending notification id) the entry ids are derived from it."""
+    return [
+        {
+            "id": f"{key}:{channel}" if key else str(uuid.uuid4()),
+            "event": event,
+            "company_id": company_id,
+            "channel": channel,
+            "recipients": recipients if channel == "smtp" else [],
+            "subject": subject,
+            "body": body,
+            "payload": payload,
+            "status": PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "last_error": None,
+            "created_at": now,
+            "sent_at": None
+        }
+        for channel in channels
+        if channel != "smtp" or recipients
+    ]
+
+class OutboxDispatcher:
+    """Background delivery of outbox entries through the configured sinks.
+
+    `sources` are the repositories whose documents hold pending
+    notifications; `render` turns one of them into its outbox entries.
+    """
+
+    def __init__(
+        self,
+        repository,
+        sinks: Dict[str, object],
+        clock: Callable[[], datetime],
+        sources: Optional[Dict[str, object]] = None,
+        render: Optional[Callable[[dict, dict], Awaitable[List[dict]]]] = None,
+        grace: float = 60.0,
+        batch_size: int = 50,
+        concurrency: int = 8,
+        poll_interval: float = 5.0,
+        max_attempts: int = 8,
+        backoff: float = 30.0,
+        max_backoff: float = 3600.0,
+        timeout: float = 30.0
+    ):
+        self.repository = repository
+        self.sinks = sinks
+        self.clock = clock
+        self.sources = sources or {}
+        self.render = render
+        self.grace = timedelta(seconds=grace)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # A claim must outlive the slowest delivery or it could be taken twice
+        self.lease = timedelta(seconds=timeout * 2)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._wake = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def channels(self) -> List[str]:
+        return list(self.sinks)
+
+    def wake(self) -> None:
+        """Deliver now instead of at the next poll (new entries were written)"""
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._task is None and self.sinks:
+            self._closing.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Finish the round in progress and stop; the rest stays in the outbox"""
+        if self._task is None:
+            return
+        self._closing.set()
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    async def collect(self, source: str, document: dict, grace: Optional[timedelta] = None) -> int:
+        """Move the pending notifications of `document` (older than `grace`)
+        to the outbox; returns how many entries were written"""
+        pending = list((document.get(PENDING_FIELD) or {}).values())
+        if grace is not None:
+            pending = [record for record in pending if record["created_at"] <= self.clock() - grace]
+        if not pending:
+            return 0
+        written = 0
+        for record in pending:
+            for entry in await self.render(document, record):
+                # False: an earlier, interrupted move already wrote it
+                if await self.repository.insert_new(entry):
+                    written += 1
+        paths = [f"{PENDING_FIELD}.{record['id']}" for record in pending]
+        # Conditional on the records still being there, so two collectors of
+        # the same document never both take them off the count
+        await self.sources[source].update(
+            {"id": document["id"], **{path: {"$exists": True} for path in paths}},
+            {},
+            increments={PENDING_COUNT: -len(pending)},
+            removes=paths
+        )
+        return written
+
+    async def sweep(self) -> int:
+        """Collect what requests left behind; returns entries written"""
+        written = 0
+        for source, repository in self.sources.items():
+            documents = await repository.list({PENDING_COUNT: {"$gt": 0}}, limit=self.batch_size)
+            for document in documents:
+                written += await self.collect(source, document, self.grace)
+        return written
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        # Jitter spreads out retries of entries that failed together
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _claim(self) -> List[dict]:
+        now = self.clock()
+        # "enviando" entries whose lease ran out were left by a dead worker
+        due = await self.repository.list(
+            {"status": {"$in": [PENDING, SENDING]}, "next_attempt_at": {"$lte": now}},
+            sort=[("next_attempt_at", 1)],
+            limit=self.batch_size
+        )
+        claimed = []
+        for entry in due:
+            won = await self.repository.update(
+                {"id": entry["id"], "status": entry["status"], "next_attempt_at": entry["next_attempt_at"]},
+                {"status": SENDING, "next_attempt_at": now + self.lease}
+            )
+            if won:
+                claimed.append(won)
+        return claimed
+
+    async def _deliver(self, entry: dict) -> bool:
+        sink = self.sinks.get(entry["channel"])
+        async with self._semaphore:
+            try:
+                if sink is None:
+                    raise RuntimeError(f"Canal no configurado: {entry['channel']}")
+                await asyncio.wait_for(sink.send(entry), self.timeout)
+            except Exception as exc:
+                attempts = entry["attempts"] + 1
+                error = f"{type(exc).__name__}: {exc}"[:500]
+                if attempts >= self.max_attempts:
+                    logger.warning(f"Notification {entry['id']} failed for good after {attempts} attempts: {error}")
+                    fields = {"status": FAILED, "attempts": attempts, "last_error": error}
+                else:
+                    retry_at = self.clock() + timedelta(seconds=self._retry_delay(attempts))
+                    fields = {"status": PENDING, "attempts": attempts, "last_error": error, "next_attempt_at": retry_at}
+                await self.repository.update({"id": entry["id"]}, fields)
+                return False
+            await self.repository.update(
+                {"id": entry["id"]},
+                {"status": SENT, "attempts": entry["attempts"] + 1, "last_error": None, "sent_at": self.clock()}
+            )
+            return True
+
+    async def run_once(self) -> int:
+        """Sweep, then claim and deliver one batch; returns how many entries
+        were claimed"""
+        if self.sources:
+            await self.sweep()
+        claimed = await self._claim()
+        if claimed:
+            await asyncio.gather(*(self._deliver(entry) for entry in claimed))
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while not self._closing.is_set():
+            # Cleared before the round so a wake() during it isn't lost
+            self._wake.clear()
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatch round failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                # Caught up: sleep until the next poll or until woken
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
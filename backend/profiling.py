@@ -0,0 +1,363 @@
+"""Opt-in request profiling for the Espacio de Datos API.
+
+Three independent tools, all writing into one local directory:
+
+- Sampled CPU profiles: a background thread samples the event loop thread's
+  stack while a profiled request's task is running and writes the result in
+  folded-stack format (`frame;frame;frame count`), which flamegraph.pl,
+  inferno and speedscope read directly.
+- Slow-request log: every Mongo call made through `db` during a request is
+  timed; requests slower than the threshold are logged with that list.
+- tracemalloc snapshots that can be diffed to find memory growth.
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+
+# Mongo calls made by the current request; None when nobody is listening
+command_trace: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar("command_trace", default=None)
+
+# ==================== MONGO COMMAND TRACING ====================
+def describe_call(op: str, args: tuple, kwargs: dict) -> dict:
+    """Shape of a collection call without its values (they may hold personal data)"""
+    spec = args[0] if args else kwargs.get("filter")
+    if op == "aggregate" and isinstance(spec, list):
+        return {"stages": [next(iter(stage), None) for stage in spec if isinstance(stage, dict)]}
+    if isinstance(spec, dict):
+        return {"filter": sorted(spec)}
+    if isinstance(spec, list):
+        return {"count": len(spec)}
+    return {}
+
+class TracedCursor:
+    """Cursor proxy: chained calls stay traced, fetching is timed"""
+
+    def __init__(self, cursor, trace: List[dict], entry: dict):
+        self._cursor = cursor
+        self._trace = trace
+        self._entry = entry
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._cursor, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if result is self._cursor:
+                return self
+            if inspect.isawaitable(result):
+                return timed(result, self._trace, dict(self._entry, op=f"{self._entry['op']}.{name}"))
+            return result
+        return call
+
+    async def __aiter__(self):
+        started = time.perf_counter()
+        fetched = 0
+        try:
+            async for doc in self._cursor:
+                fetched += 1
+                yield doc
+        finally:
+            self._trace.append(dict(
+                self._entry, op=f"{self._entry['op']}.iterate",
+                ms=round((time.perf_counter() - started) * 1000, 2), docs=fetched
+            ))
+
+async def timed(awaitable, trace: List[dict], entry: dict):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        trace.append(dict(entry, ms=round((time.perf_counter() - started) * 1000, 2)))
+
+class TracedCollection:
+    """Collection proxy that appends every awaited call to a trace list"""
+
+    def __init__(self, collection, name: str, trace: List[dict]):
+        self._collection = collection
+        self._name = name
+        self._trace = trace
+
+    def __getattr__(self, op: str):
+        attr = getattr(self._collection, op)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            entry = {"collection": self._name, "op": op, **describe_call(op, args, kwargs)}
+            if inspect.isawaitable(result):
+                return timed(result, self._trace, entry)
+            if hasattr(result, "to_list"):
+                return TracedCursor(result, self._trace, entry)
+            return result
+        return call
+
+def trace_collection(name: str, collection):
+    """`Database.observer` hook: wrap collections only while a trace is active"""
+    trace = command_trace.get()
+    return collection if trace is None else TracedCollection(collection, name, trace)
+
+# ==================== CPU SAMPLING ====================
+def frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    _, marker, tail = filename.rpartition("site-packages" + os.sep)
+    filename = tail if marker else os.path.basename(filename)
+    # ';' separates frames in the folded format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+class StackSampler:
+    """Samples the event loop thread and attributes stacks to tracked tasks.
+
+    A sample only counts for a request when its task is the one the loop is
+    running at that instant, so the profile is that request's on-CPU time;
+    time spent awaiting Mongo shows up in the command trace instead. Tasks
+    the request spawns itself (asyncio.gather) are not attributed to it.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stacks: Dict[asyncio.Task, Counter] = {}
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    def track(self, task: asyncio.Task) -> None:
+        with self._lock:
+            self._loop = task.get_loop()
+            self._loop_thread = threading.get_ident()
+            self._stacks[task] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+            self._active.set()
+
+    def untrack(self, task: asyncio.Task) -> Counter:
+        with self._lock:
+            stacks = self._stacks.pop(task, Counter())
+            if not self._stacks:
+                self._active.clear()
+        return stacks
+
+    def _run(self) -> None:
+        while True:
+            self._active.wait()
+            time.sleep(self.interval)
+            task = asyncio.current_task(self._loop)
+            frame = sys._current_frames().get(self._loop_thread)
+            if task is None or frame is None:
+                continue
+            with self._lock:
+                stacks = self._stacks.get(task)
+                if stacks is None:
+                    continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+
+# ==================== TRACEMALLOC ====================
+class MemorySnapshots:
+    """tracemalloc snapshots dumped to disk so they survive for diffing"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+    def start(self, frames: int) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+
+    def status(self) -> dict:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "snapshots": sorted(path.stem for path in self.directory.glob("*.tracemalloc"))
+        }
+
+    def take(self) -> str:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc no está activo")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        ))
+        name = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshot.dump(str(self.directory / f"{name}.tracemalloc"))
+        return name
+
+    def load(self, name: str) -> tracemalloc.Snapshot:
+        path = self.directory / f"{name}.tracemalloc"
+        if not re.fullmatch(r"[0-9TZ]+", name) or not path.exists():
+            raise FileNotFoundError(name)
+        return tracemalloc.Snapshot.load(str(path))
+
+    def top(self, name: str, group_by: str, limit: int) -> List[dict]:
+        stats = self.load(name).statistics(group_by)
+        return [
+            {"where": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in stats[:limit]
+        ]
+
+    def diff(self, base: str, target: str, group_by: str, limit: int) -> List[dict]:
+        stats = self.load(target).compare_to(self.load(base), group_by)
+        return [
+            {
+                "where": str(stat.traceback),
+                "size_bytes": stat.size,
+                "size_diff_bytes": stat.size_diff,
+                "count": stat.count,
+                "count_diff": stat.count_diff
+            }
+            for stat in stats[:limit]
+        ]
+
+# ==================== REQUEST PROFILER ====================
+class RequestProfiler:
+    """Decides which requests to profile and keeps what they produced"""
+
+    def __init__(
+        self,
+        directory: Path,
+        sample_rate: float = 0.0,
+        interval: float = 0.005,
+        slow_ms: float = 0.0,
+        keep: int = 200
+    ):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.sampler = StackSampler(interval)
+        self.memory = MemorySnapshots(directory / "tracemalloc")
+        self.slow_requests: deque = deque(maxlen=keep)
+
+    def should_sample(self, requested: bool) -> bool:
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def profiles(self) -> List[dict]:
+        if not self.directory.exists():
+            return []
+        return [
+            {"name": path.name, "size_bytes": path.stat().st_size}
+            for path in sorted(self.directory.glob("*.folded"), reverse=True)
+        ]
+
+    def profile_path(self, name: str) -> Path:
+        if not re.fullmatch(r"[\w.-]+\.folded", name):
+            raise FileNotFoundError(name)
+        path = self.directory / name
+        if not path.exists():
+            raise FileNotFoundError(name)
+        return path
+
+    def write_profile(self, method: str, path: str, duration_ms: float, stacks: Counter) -> Optional[str]:
+        if not stacks:
+            return None
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        slug = re.sub(r"[^\w]+", "_", path).strip("_")[:80]
+        name = f"{stamp}-{method}-{slug}-{int(duration_ms)}ms.folded"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / name).write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+        return name
+
+    def record_slow(self, entry: dict) -> None:
+        self.slow_requests.append(entry)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / "slow_requests.jsonl", "a") as log:
+            log.write(json.dumps(entry) + "\n")
+        logger.warning(
+            f"Slow request {entry['method']} {entry['path']}: {entry['duration_ms']}ms, "
+            f"{len(entry['commands'])} Mongo calls"
+        )
+
+class ProfilingMiddleware:
+    """ASGI middleware; plain ASGI so the endpoint runs in the request's own task.
+
+    `X-Profile: 1` asks for a CPU profile and is honoured only when
+    `authorize(headers)` returns True (the server passes an admin check).
+    """
+
+    def __init__(self, app, profiler: RequestProfiler, authorize: Callable[[Dict[str, str]], bool]):
+        self.app = app
+        self.profiler = profiler
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler
+        headers = {key.decode().lower(): value.decode() for key, value in scope.get("headers", [])}
+        requested = headers.get("x-profile") == "1" and self.authorize(headers)
+        sample = profiler.should_sample(requested)
+        if not sample and profiler.slow_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        async def capture_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        trace: List[dict] = []
+        token = command_trace.set(trace)
+        task = asyncio.current_task()
+        if sample:
+            profiler.sampler.track(task)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, capture_status)
+        finally:
+            duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            command_trace.reset(token)
+            profile = None
+            if sample:
+                stacks = profiler.sampler.untrack(task)
+                profile = await asyncio.to_thread(
+                    profiler.write_profile, scope["method"], scope["path"], duration_ms, stacks
+                )
+            if profiler.slow_ms > 0 and duration_ms >= profiler.slow_ms:
+                entry = {
+                    "ts": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query": scope.get("query_string", b"").decode(),
+                    "status": status_code,
+                    "duration_ms": duration_ms,
+                    "mongo_ms": round(sum(command["ms"] for command in trace), 2),
+                    "commands": trace,
+                    "profile": profile
+                }
+                await asyncio.to_thread(profiler.record_slow, entry)
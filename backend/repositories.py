@@ -0,0 +1,550 @@
+"""Storage-agnostic data access for the core entities.
+
+Routes reach users, companies, diagnostics, intakes, projects, the activity
+log, the funnel rollups, the data space catalog, the notification outbox,
+the company archive, idempotency records, counters and change tombstones
+through `repos.<name>` instead of raw collections, so the same route code
+runs on Mongo (MotorRepository) or on a process-local store
+(MemoryRepository) for tests and benchmarks without outside services.
+
+Filters are the Mongo query subset the routes need: equality (matching
+inside arrays), $in, $nin, $ne, $lt, $lte, $gt, $gte, $exists, $regex with
+$options "i", $or and $and. Dotted paths are allowed.
+
+`update_computed` is the one write whose values depend on the document
+itself (a count over a map, fields set only from some states); on Mongo it
+is a pipeline update, so it still takes a single round trip.
+"""
+import copy
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from storage import decode_uuid
+
+Sort = List[Tuple[str, int]]
+
+# ==================== MOTOR ====================
+class MotorRepository:
+    """Repository over one Motor collection (or a storage.Database wrapper)"""
+
+    def __init__(self, database, name: str, key: str = "id", casefold: Iterable[str] = ()):
+        self.database = database
+        self.name = name
+        self.key = key
+        self.casefold = set(casefold)
+
+    @property
+    def collection(self):
+        # Resolved per call so Database.observer (request tracing) sees it
+        return self.database[self.name]
+
+    def _filter(self, match: dict) -> dict:
+        query = dict(match)
+        for field in self.casefold & query.keys():
+            if isinstance(query[field], str):
+                query[field] = {"$regex": f"^{re.escape(query[field])}$", "$options": "i"}
+        return query
+
+    @staticmethod
+    def _projection(exclude: Iterable[str]) -> dict:
+        return {"_id": 0, **{field: 0 for field in exclude}}
+
+    async def get(self, match: dict, exclude: Iterable[str] = ()) -> Optional[dict]:
+        return await self.collection.find_one(self._filter(match), self._projection(exclude))
+
+    async def list(self, match: dict, sort: Optional[Sort] = None, limit: int = 0, exclude: Iterable[str] = ()) -> List[dict]:
+        cursor = self.collection.find(self._filter(match), self._projection(exclude))
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(limit or None)
+
+    async def count(self, match: dict) -> int:
+        return await self.collection.count_documents(self._filter(match))
+
+    async def count_by(self, match: dict, fields: List[str]) -> Dict[tuple, int]:
+        """Matching documents per combination of `fields` values (None when
+        missing); meant for scalar fields"""
+        group = {f"f{i}": f"${field}" for i, field in enumerate(fields)}
+        pipeline = [{"$match": self._filter(match)}, {"$group": {"_id": group, "count": {"$sum": 1}}}]
+        return {
+            tuple(decode_uuid(row["_id"].get(f"f{i}")) for i in range(len(fields))): row["count"]
+            async for row in self.collection.aggregate(pipeline)
+        }
+
+    async def insert(self, doc: dict) -> None:
+        # Copy so the caller's dict does not pick up an ObjectId _id
+        await self.collection.insert_one(dict(doc))
+
+    async def insert_many(self, docs: List[dict]) -> None:
+        await self.collection.insert_many([dict(doc) for doc in docs], ordered=False)
+
+    async def insert_new(self, doc: dict) -> bool:
+        """Insert unless the key is taken (needs a unique index on it);
+        returns whether the document was inserted"""
+        try:
+            await self.collection.insert_one(dict(doc))
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def update(
+        self,
+        match: dict,
+        fields: dict,
+        exclude: Iterable[str] = (),
+        increments: Optional[dict] = None,
+        removes: Iterable[str] = ()
+    ) -> Optional[dict]:
+        """$set `fields` (and $inc `increments`, $unset `removes`) on the first
+        match; returns the updated document or None"""
+        changes: Dict[str, dict] = {"$set": fields} if fields else {}
+        if increments:
+            changes["$inc"] = increments
+        if removes:
+            changes["$unset"] = {path: "" for path in removes}
+        return await self.collection.find_one_and_update(
+            self._filter(match),
+            changes,
+            projection=self._projection(exclude),
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def update_computed(
+        self,
+        match: dict,
+        fields: dict,
+        increments: Optional[dict] = None,
+        counts: Optional[Dict[str, str]] = None,
+        guarded: Optional[Tuple[dict, dict, dict]] = None
+    ) -> Optional[dict]:
+        """Set `fields` and add `increments` on the first match, in one
+        write; then set each `counts` path to how many values of the map at
+        its source path are true. `guarded` is (condition, fields,
+        increments) applied only if the document matched the condition
+        before the write. Returns the document as it was before, or None."""
+        stage = {path: {"$literal": value} for path, value in fields.items()}
+        for path, amount in (increments or {}).items():
+            stage[path] = {"$add": [{"$ifNull": [f"${path}", 0]}, amount]}
+        if guarded:
+            condition, guarded_fields, guarded_increments = guarded
+            applies = expression(condition)
+            # Expressions of one stage all see the document before it
+            for path, value in guarded_fields.items():
+                stage[path] = {"$cond": [applies, {"$literal": value}, f"${path}"]}
+            for path, amount in (guarded_increments or {}).items():
+                stage[path] = {"$add": [{"$ifNull": [f"${path}", 0]}, {"$cond": [applies, amount, 0]}]}
+        pipeline = [{"$set": stage}]
+        if counts:
+            pipeline.append({"$set": {
+                path: {"$size": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": [f"${source}", {}]}},
+                    "cond": {"$eq": ["$$this.v", True]}
+                }}}
+                for path, source in counts.items()
+            }})
+        return await self.collection.find_one_and_update(
+            self._filter(match),
+            pipeline,
+            projection=self._projection(()),
+            return_document=ReturnDocument.BEFORE
+        )
+
+    async def update_many(self, match: dict, fields: dict) -> int:
+        """$set `fields` on every match; returns how many were modified"""
+        return (await self.collection.update_many(self._filter(match), {"$set": fields})).modified_count
+
+    async def bulk_update(self, updates: List[Tuple[dict, dict]]) -> int:
+        """$set each (match, fields) pair on its first match, all in one
+        unordered bulk write; returns how many were modified"""
+        if not updates:
+            return 0
+        operations = [UpdateOne(self._filter(match), {"$set": fields}) for match, fields in updates]
+        return (await self.collection.bulk_write(operations, ordered=False)).modified_count
+
+    async def increment(self, match: dict, increments: dict) -> dict:
+        """$inc counters, creating the document from `match` if it is missing;
+        returns the document after the increment"""
+        return await self.collection.find_one_and_update(
+            self._filter(match),
+            {"$inc": increments},
+            projection=self._projection(()),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def delete(self, match: dict) -> int:
+        return (await self.collection.delete_many(self._filter(match))).deleted_count
+
+def expression(condition: dict) -> dict:
+    """Aggregation expression of a filter made of equalities and $ne (what
+    update_computed conditions need)"""
+    terms = []
+    for field, value in condition.items():
+        if isinstance(value, dict) and value.keys() == {"$ne"}:
+            terms.append({"$ne": [f"${field}", {"$literal": value["$ne"]}]})
+        elif isinstance(value, dict) and any(key.startswith("$") for key in value):
+            raise ValueError(f"Condición no soportada: {value}")
+        else:
+            terms.append({"$eq": [f"${field}", {"$literal": value}]})
+    return {"$and": terms}
+
+# ==================== IN MEMORY ====================
+MISSING = object()
+
+def get_path(doc: dict, path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+def set_path(doc: dict, path: str, value: Any) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+def remove_path(doc: dict, path: str) -> None:
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(leaf, None)
+
+def sort_key(value: Any) -> tuple:
+    # Mongo orders missing/null before any value
+    return (0,) if value is MISSING or value is None else (1, value)
+
+def compare(value: Any, operator: str, operand: Any) -> bool:
+    if value is MISSING or value is None:
+        return False
+    try:
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+        if operator == "$gt":
+            return value > operand
+        return value >= operand
+    except TypeError:
+        return False
+
+class MemoryRepository:
+    """Process-local repository with dict-based secondary indexes.
+
+    Documents live in a dict keyed by `key`; each indexed field maps a value
+    (every element, for arrays) to the set of keys holding it. Queries start
+    from the smallest index bucket their equality/$in conditions select and
+    check the rest of the filter per document. Reads and writes copy, so
+    callers can never mutate stored state. Not thread-safe; meant for a
+    single event loop.
+    """
+
+    def __init__(self, key: str = "id", indexes: Iterable[str] = (), casefold: Iterable[str] = ()):
+        self.key = key
+        self.casefold = set(casefold)
+        self._docs: Dict[Any, dict] = {}
+        self._order: Dict[Any, int] = {}  # key -> insertion sequence
+        self._sequence = 0
+        self._indexes: Dict[str, Dict[Any, Set[Any]]] = {field: defaultdict(set) for field in indexes}
+
+    def _norm(self, field: str, value: Any) -> Any:
+        if field in self.casefold and isinstance(value, str):
+            return value.lower()
+        return value
+
+    def _index_values(self, field: str, doc: dict) -> list:
+        value = get_path(doc, field)
+        values = value if isinstance(value, list) else [None if value is MISSING else value]
+        return [self._norm(field, v) for v in values if v is None or isinstance(v, (str, int, float, bool))]
+
+    def _index(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            for value in self._index_values(field, doc):
+                index[value].add(doc[self.key])
+
+    def _unindex(self, doc: dict) -> None:
+        for field, index in self._indexes.items():
+            for value in self._index_values(field, doc):
+                bucket = index.get(value)
+                if bucket is not None:
+                    bucket.discard(doc[self.key])
+                    if not bucket:
+                        del index[value]
+
+    def _store(self, doc: dict) -> None:
+        self._docs[doc[self.key]] = doc
+        self._order[doc[self.key]] = self._sequence
+        self._sequence += 1
+
+    def _conditions(self, match: dict):
+        for field, condition in match.items():
+            if field == "$and":
+                for sub in condition:
+                    yield from self._conditions(sub)
+            else:
+                yield field, condition
+
+    def _candidates(self, match: dict) -> Iterable[Any]:
+        best: Optional[Set[Any]] = None
+        for field, condition in self._conditions(match):
+            if isinstance(condition, dict) and "$in" in condition:
+                values = condition["$in"]
+            elif not isinstance(condition, (dict, list)):
+                values = [condition]
+            else:
+                continue
+            if field == self.key:
+                keys = {v for v in values if v in self._docs}
+            elif field in self._indexes:
+                index = self._indexes[field]
+                keys = set().union(*(index.get(self._norm(field, v), ()) for v in values))
+            else:
+                continue
+            if best is None or len(keys) < len(best):
+                best = keys
+        return list(self._docs) if best is None else best
+
+    def _equals(self, field: str, value: Any, operand: Any) -> bool:
+        operand = self._norm(field, operand)
+        if isinstance(value, list) and not isinstance(operand, list):
+            return any(self._norm(field, v) == operand for v in value)
+        if value is MISSING:
+            return operand is None
+        return self._norm(field, value) == operand
+
+    def _matches(self, doc: dict, match: dict) -> bool:
+        for field, condition in match.items():
+            if field == "$or":
+                if not any(self._matches(doc, sub) for sub in condition):
+                    return False
+                continue
+            if field == "$and":
+                if not all(self._matches(doc, sub) for sub in condition):
+                    return False
+                continue
+            value = get_path(doc, field)
+            if not (isinstance(condition, dict) and condition and next(iter(condition)).startswith("$")):
+                if not self._equals(field, value, condition):
+                    return False
+                continue
+            for operator, operand in condition.items():
+                if operator == "$in":
+                    ok = any(self._equals(field, value, v) for v in operand)
+                elif operator == "$nin":
+                    ok = not any(self._equals(field, value, v) for v in operand)
+                elif operator == "$ne":
+                    ok = not self._equals(field, value, operand)
+                elif operator == "$exists":
+                    ok = (value is not MISSING) == bool(operand)
+                elif operator == "$regex":
+                    flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                    ok = isinstance(value, str) and re.search(operand, value, flags) is not None
+                elif operator == "$options":
+                    continue
+                elif operator in ("$lt", "$lte", "$gt", "$gte"):
+                    ok = compare(value, operator, operand)
+                else:
+                    raise ValueError(f"Operador no soportado en memoria: {operator}")
+                if not ok:
+                    return False
+        return True
+
+    def _find(self, match: dict) -> List[dict]:
+        # Insertion order stands in for Mongo's natural order
+        keys = self._candidates(match)
+        if not isinstance(keys, list):
+            keys = sorted(keys, key=self._order.__getitem__)
+        return [self._docs[key] for key in keys if self._matches(self._docs[key], match)]
+
+    @staticmethod
+    def _copy(doc: dict, exclude: Iterable[str]) -> dict:
+        result = copy.deepcopy(doc)
+        for field in exclude:
+            result.pop(field, None)
+        return result
+
+    async def get(self, match: dict, exclude: Iterable[str] = ()) -> Optional[dict]:
+        found = self._find(match)
+        return self._copy(found[0], exclude) if found else None
+
+    async def list(self, match: dict, sort: Optional[Sort] = None, limit: int = 0, exclude: Iterable[str] = ()) -> List[dict]:
+        docs = self._find(match)
+        for field, direction in reversed(sort or []):
+            docs.sort(key=lambda doc: sort_key(get_path(doc, field)), reverse=direction < 0)
+        if limit:
+            docs = docs[:limit]
+        return [self._copy(doc, exclude) for doc in docs]
+
+    async def count(self, match: dict) -> int:
+        return len(self._find(match))
+
+    async def count_by(self, match: dict, fields: List[str]) -> Dict[tuple, int]:
+        counts: Dict[tuple, int] = defaultdict(int)
+        for doc in self._find(match):
+            values = (get_path(doc, field) for field in fields)
+            counts[tuple(None if value is MISSING else value for value in values)] += 1
+        return dict(counts)
+
+    async def insert(self, doc: dict) -> None:
+        if doc[self.key] in self._docs:
+            raise KeyError(f"{self.key} duplicado: {doc[self.key]}")
+        stored = copy.deepcopy(doc)
+        self._store(stored)
+        self._index(stored)
+
+    async def insert_many(self, docs: List[dict]) -> None:
+        for doc in docs:
+            await self.insert(doc)
+
+    async def insert_new(self, doc: dict) -> bool:
+        if doc[self.key] in self._docs:
+            return False
+        await self.insert(doc)
+        return True
+
+    async def update(
+        self,
+        match: dict,
+        fields: dict,
+        exclude: Iterable[str] = (),
+        increments: Optional[dict] = None,
+        removes: Iterable[str] = ()
+    ) -> Optional[dict]:
+        found = self._find(match)
+        if not found:
+            return None
+        doc = found[0]
+        self._unindex(doc)
+        self._apply(doc, fields, increments)
+        for path in removes:
+            remove_path(doc, path)
+        self._index(doc)
+        return self._copy(doc, exclude)
+
+    async def update_computed(
+        self,
+        match: dict,
+        fields: dict,
+        increments: Optional[dict] = None,
+        counts: Optional[Dict[str, str]] = None,
+        guarded: Optional[Tuple[dict, dict, dict]] = None
+    ) -> Optional[dict]:
+        found = self._find(match)
+        if not found:
+            return None
+        doc = found[0]
+        before = self._copy(doc, ())
+        applies = guarded is not None and self._matches(doc, guarded[0])
+        self._unindex(doc)
+        self._apply(doc, fields, increments)
+        if applies:
+            self._apply(doc, guarded[1], guarded[2])
+        for path, source in (counts or {}).items():
+            values = get_path(doc, source)
+            set_path(doc, path, sum(value is True for value in values.values()) if isinstance(values, dict) else 0)
+        self._index(doc)
+        return before
+
+    @staticmethod
+    def _apply(doc: dict, fields: dict, increments: Optional[dict]) -> None:
+        for path, value in fields.items():
+            set_path(doc, path, copy.deepcopy(value))
+        for path, amount in (increments or {}).items():
+            current = get_path(doc, path)
+            set_path(doc, path, amount if current is MISSING or current is None else current + amount)
+
+    async def update_many(self, match: dict, fields: dict) -> int:
+        found = self._find(match)
+        for doc in found:
+            self._unindex(doc)
+            for path, value in fields.items():
+                set_path(doc, path, copy.deepcopy(value))
+            self._index(doc)
+        return len(found)
+
+    async def bulk_update(self, updates: List[Tuple[dict, dict]]) -> int:
+        modified = 0
+        for match, fields in updates:
+            if await self.update(match, fields) is not None:
+                modified += 1
+        return modified
+
+    async def increment(self, match: dict, increments: dict) -> dict:
+        found = self._find(match)
+        if found:
+            doc = found[0]
+            self._unindex(doc)
+        else:
+            doc = {field: value for field, value in match.items() if not isinstance(value, dict)}
+            self._store(doc)
+        for path, amount in increments.items():
+            current = get_path(doc, path)
+            set_path(doc, path, amount if current is MISSING else current + amount)
+        self._index(doc)
+        return self._copy(doc, ())
+
+    async def delete(self, match: dict) -> int:
+        found = self._find(match)
+        for doc in found:
+            self._unindex(doc)
+            del self._docs[doc[self.key]]
+            del self._order[doc[self.key]]
+        return len(found)
+
+# ==================== REGISTRY ====================
+# name -> (collection, primary key, secondary indexes, case-insensitive fields)
+REPOSITORIES: Dict[str, Tuple[str, str, Tuple[str, ...], Tuple[str, ...]]] = {
+    "users": ("users", "id", ("email", "company_id", "role"), ("email",)),
+    "companies": ("companies", "id", ("nif", "status", "owner_id"), ()),
+    "diagnostics": ("diagnostics", "id", ("company_id",), ()),
+    "intakes": ("client_intakes", "id", ("company_id",), ()),
+    "projects": ("projects", "id", ("company_id", "space_id", "owner_id"), ()),
+    "activity": ("activity_log", "id", ("company_id",), ()),
+    "funnel": ("funnel_daily", "day", (), ()),
+    "data_spaces": ("data_spaces", "id", ("name_folded",), ()),
+    "outbox": ("notification_outbox", "id", ("status",), ()),
+    "archive": ("archived_companies", "id", ("owner_id", "nif", "file"), ()),
+    "idempotency": ("idempotency_keys", "id", (), ()),
+    "counters": ("counters", "id", (), ()),
+    "tombstones": ("change_tombstones", "id", ("entity",), ())
+}
+
+class Repositories:
+    """One repository per entity, all on the same engine"""
+
+    def __init__(self, engine: str, repositories: Dict[str, Any]):
+        self.engine = engine
+        self.users = repositories["users"]
+        self.companies = repositories["companies"]
+        self.diagnostics = repositories["diagnostics"]
+        self.intakes = repositories["intakes"]
+        self.projects = repositories["projects"]
+        self.activity = repositories["activity"]
+        self.funnel = repositories["funnel"]
+        self.data_spaces = repositories["data_spaces"]
+        self.outbox = repositories["outbox"]
+        self.archive = repositories["archive"]
+        self.idempotency = repositories["idempotency"]
+        self.counters = repositories["counters"]
+        self.tombstones = repositories["tombstones"]
+
+def motor_repositories(database) -> Repositories:
+    return Repositories("mongo", {
+        name: MotorRepository(database, collection, key, casefold)
+        for name, (collection, key, _, casefold) in REPOSITORIES.items()
+    })
+
+def memory_repositories() -> Repositories:
+    return Repositories("memory", {
+        name: MemoryRepository(key, indexes, casefold)
+        for name, (_, key, indexes, casefold) in REPOSITORIES.items()
+    })
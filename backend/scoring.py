@@ -0,0 +1,137 @@
+"""Rule-based eligibility scoring for submitted intakes.
+
+Each intake answer carries a weight (see DEFAULT_RULES). An intake's score is
+the sum of the weights of its answers, scaled to 0-100 against the best
+possible intake. The same answers also yield a suggested diagnostic that
+advisors start from instead of a blank form:
+
+- data_potential: the data_types + data_usage points reach a threshold
+- space_identified: the company is interested in any "space" interest
+- legal_risk: mapped from data_sensitivity
+- eligibility_ok: the score reaches a threshold and legal risk isn't "alto"
+
+Intakes are one-hot encoded into a matrix so scoring N intakes is a handful
+of matrix products. Submitting one intake is simply a batch of one, which
+keeps the incremental and the bulk re-score paths identical.
+
+Rules can be replaced with a JSON file (SCORING_RULES_FILE). `version` is a
+hash of the rules, stored next to every score so a rules change can find the
+scores it makes stale.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_RULES: Dict[str, Any] = {
+    "weights": {
+        "data_types": {
+            "operativos": 10, "comerciales": 10, "clientes_pacientes": 12,
+            "sensores_iot": 15, "historicos": 8, "no_lo_se": 0
+        },
+        "data_usage": {"solo_interno": 5, "reporting": 10, "estrategico": 20, "apenas": 0},
+        "main_interests": {
+            "mejorar_procesos": 8, "acceder_datos_externos": 15, "monetizar": 15,
+            "cumplimiento": 5, "no_lo_tengo_claro": 0
+        },
+        "data_sensitivity": {"baja": 10, "media": 5, "alta": -10, "no_lo_se": 0}
+    },
+    # Multiple-choice answers add up; the other fields take a single answer
+    "multi_fields": ["data_types", "main_interests"],
+    "thresholds": {"eligible": 45, "data_potential": 25},
+    "data_fields": ["data_types", "data_usage"],
+    "space_interests": ["acceder_datos_externos", "monetizar"],
+    "legal_risk": {"baja": "bajo", "media": "medio", "alta": "alto", "no_lo_se": "medio"},
+    "default_legal_risk": "medio"
+}
+
+def load_rules() -> Dict[str, Any]:
+    path = os.environ.get("SCORING_RULES_FILE")
+    if not path:
+        return DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+class EligibilityScorer:
+    """Scores intakes against one set of rules"""
+
+    def __init__(self, rules: Optional[Dict[str, Any]] = None):
+        self.rules = rules or DEFAULT_RULES
+        canonical = json.dumps(self.rules, sort_keys=True, ensure_ascii=False)
+        self.version = hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+        weights = self.rules["weights"]
+        self.fields = list(weights)
+        # One column per (field, answer)
+        self.columns = {(field, value): i for i, (field, value) in enumerate(
+            (field, value) for field in self.fields for value in weights[field]
+        )}
+        self.weights = np.array([weights[field][value] for field, value in self.columns], dtype=np.float64)
+        self.field_columns = {
+            field: np.array([i for (f, _), i in self.columns.items() if f == field])
+            for field in self.fields
+        }
+
+        # Best case: every positive answer of multiple-choice fields, the best one of the others
+        best = 0.0
+        for field in self.fields:
+            values = np.array(list(weights[field].values()), dtype=np.float64)
+            best += values.clip(min=0).sum() if field in self.rules["multi_fields"] else max(values.max(), 0)
+        self.max_points = best or 1.0
+
+        self.data_columns = np.concatenate([self.field_columns[f] for f in self.rules["data_fields"]])
+        self.space_columns = np.array([self.columns[("main_interests", v)] for v in self.rules["space_interests"]])
+        self.sensitivity_values = list(weights["data_sensitivity"])
+
+    def encode(self, intakes: List[dict]) -> np.ndarray:
+        matrix = np.zeros((len(intakes), len(self.columns)), dtype=np.float64)
+        for row, intake in enumerate(intakes):
+            for field in self.fields:
+                answer = intake.get(field)
+                for value in answer if isinstance(answer, list) else [answer]:
+                    column = self.columns.get((field, value))
+                    if column is not None:
+                        matrix[row, column] = 1.0
+        return matrix
+
+    def score_batch(self, intakes: List[dict]) -> List[dict]:
+        """Score and suggested diagnostic for each intake, in order"""
+        if not intakes:
+            return []
+        matrix = self.encode(intakes)
+        points = matrix * self.weights
+        by_field = {field: points[:, columns].sum(axis=1) for field, columns in self.field_columns.items()}
+        scores = np.clip(points.sum(axis=1) / self.max_points * 100, 0, 100).round(1)
+        data_points = points[:, self.data_columns].sum(axis=1)
+        space = matrix[:, self.space_columns].any(axis=1)
+
+        sensitivity = matrix[:, self.field_columns["data_sensitivity"]]
+        answered = sensitivity.any(axis=1)
+        risk_names = np.array([
+            self.rules["legal_risk"].get(value, self.rules["default_legal_risk"]) for value in self.sensitivity_values
+        ])
+        legal_risk = np.where(answered, risk_names[sensitivity.argmax(axis=1)], self.rules["default_legal_risk"])
+
+        thresholds = self.rules["thresholds"]
+        eligible = (scores >= thresholds["eligible"]) & (legal_risk != "alto")
+        potential = data_points >= thresholds["data_potential"]
+
+        return [
+            {
+                "score": float(scores[i]),
+                "breakdown": {field: float(by_field[field][i]) for field in self.fields},
+                "suggestion": {
+                    "eligibility_ok": bool(eligible[i]),
+                    "space_identified": bool(space[i]),
+                    "data_potential": bool(potential[i]),
+                    "legal_risk": str(legal_risk[i])
+                },
+                "version": self.version
+            }
+            for i in range(len(intakes))
+        ]
+
+    def score(self, intake: dict) -> dict:
+        return self.score_batch([intake])[0]
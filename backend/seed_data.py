@@ -0,0 +1,295 @@
+"""Synthetic data generator for local benchmarking.
+
+Produces companies, diagnostics, intakes, projects and cliente users with the
+same document shapes that the API writes in server.py, so the bulk seeder can
+insert them directly with insert_many.
+"""
+import random
+import re
+import unicodedata
+import uuid
+from concurrent.futures import Executor
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import bcrypt
+
+# ==================== VOCABULARY ====================
+NAME_PREFIXES = [
+    "Grupo", "Industrias", "Soluciones", "Servicios", "Talleres", "Distribuciones",
+    "Construcciones", "Transportes", "Laboratorios", "Consultoría", "Agroalimentaria",
+    "Comercial", "Tecnologías", "Ingeniería", "Logística", "Hermanos"
+]
+NAME_ROOTS = [
+    "Ibérica", "Levante", "Cantábrica", "del Sur", "Mediterránea", "Atlántica",
+    "Castellana", "Andaluza", "Galaica", "Navarra", "Aragonesa", "Balear",
+    "Canaria", "Manchega", "Extremeña", "Riojana", "Norte", "Centro",
+    "García", "Martínez", "López", "Sánchez", "Fernández", "Ruiz", "Moreno",
+    "Alba", "Sol", "Olivo", "Encina", "Mar", "Sierra", "Valle", "Duero", "Ebro"
+]
+LEGAL_FORMS = [("S.L.", "B", 0.62), ("S.A.", "A", 0.18), ("S.L.U.", "B", 0.12), ("S. Coop.", "F", 0.08)]
+
+FIRST_NAMES = [
+    "María", "Carmen", "Ana", "Laura", "Lucía", "Marta", "Elena", "Isabel", "Paula", "Cristina",
+    "Antonio", "José", "Manuel", "Francisco", "David", "Javier", "Carlos", "Daniel", "Miguel", "Pablo"
+]
+SURNAMES = [
+    "García", "Rodríguez", "González", "Fernández", "López", "Martínez", "Sánchez", "Pérez",
+    "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Álvarez", "Romero", "Navarro"
+]
+CONTACT_ROLES = ["CEO", "Director General", "Gerente", "CTO", "Director de Operaciones", "Propietario/a", "Responsable IT"]
+
+SECTORS = [
+    ("Tecnología", 0.18), ("Industria", 0.16), ("Comercio", 0.14), ("Agroalimentario", 0.12),
+    ("Energía", 0.08), ("Salud", 0.08), ("Logística", 0.08), ("Turismo", 0.08), ("Construcción", 0.08)
+]
+SIZE_RANGES = [("1-10", 0.45), ("11-50", 0.32), ("51-250", 0.17), ("250+", 0.06)]
+
+DATA_TYPES = ["operativos", "comerciales", "clientes_pacientes", "sensores_iot", "historicos", "no_lo_se"]
+DATA_USAGE = [("solo_interno", 0.4), ("reporting", 0.3), ("estrategico", 0.15), ("apenas", 0.15)]
+MAIN_INTERESTS = ["mejorar_procesos", "acceder_datos_externos", "monetizar", "cumplimiento", "no_lo_tengo_claro"]
+DATA_SENSITIVITY = [("baja", 0.35), ("media", 0.35), ("alta", 0.2), ("no_lo_se", 0.1)]
+
+SPACE_NAMES = [
+    "Espacio de Datos Industrial", "Espacio de Datos Agroalimentario", "Espacio de Datos de Turismo",
+    "Espacio de Datos de Salud", "Espacio de Datos de Movilidad", "Espacio de Datos de Energía"
+]
+USE_CASES = [
+    "Compartir datos de producción para optimización de procesos industriales.",
+    "Trazabilidad de producto a lo largo de la cadena de suministro.",
+    "Predicción de demanda con datos agregados del sector.",
+    "Mantenimiento predictivo a partir de datos de sensores.",
+    "Benchmarking de consumo energético entre empresas del sector."
+]
+
+DEFAULT_STATUS_WEIGHTS = {"lead": 0.6, "apta": 0.25, "descartada": 0.15}
+INCORPORATION_WEIGHTS = [("pendiente", 0.35), ("en_progreso", 0.45), ("completada", 0.2)]
+
+CIF_CONTROL_LETTERS = "JABCDEFGHI"
+
+# ==================== HELPERS ====================
+def cif_control(letter: str, digits: str) -> str:
+    """Control character for a Spanish CIF (organisation letter + 7 digits)"""
+    even = sum(int(d) for d in digits[1::2])
+    odd = 0
+    for d in digits[0::2]:
+        doubled = int(d) * 2
+        odd += doubled // 10 + doubled % 10
+    control = (10 - (even + odd) % 10) % 10
+    if letter in "ABEH":
+        return str(control)
+    if letter in "KNPQRSW":
+        return CIF_CONTROL_LETTERS[control]
+    return str(control)
+
+def make_nif(letter: str, number: int) -> str:
+    digits = f"{number % 10_000_000:07d}"
+    return f"{letter}{digits}{cif_control(letter, digits)}"
+
+def fold_text(value: str) -> str:
+    """Same folding as server.fold_text (users.name_lower)"""
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii").lower()
+
+def slugify(value: str) -> str:
+    folded = unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", folded.lower()).strip("-")
+
+def _weighted(rng: random.Random, choices) -> str:
+    values, weights = zip(*choices)
+    return rng.choices(values, weights=weights)[0]
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def _hash_batch(password: str, rounds: int, count: int) -> List[str]:
+    return [
+        bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+        for _ in range(count)
+    ]
+
+def precompute_password_hashes(pool: Executor, password: str, count: int, rounds: int = 12) -> List[str]:
+    """Hash `password` `count` times (distinct salts) across a process pool.
+
+    bcrypt is deliberately slow, so seeded users share a small pool of real
+    hashes instead of hashing once per user.
+    """
+    workers = getattr(pool, "_max_workers", 4)
+    chunk = max(1, count // workers)
+    futures = [pool.submit(_hash_batch, password, rounds, min(chunk, count - i)) for i in range(0, count, chunk)]
+    return [h for f in futures for h in f.result()]
+
+# ==================== GENERATOR ====================
+class SyntheticDataGenerator:
+    """Deterministic (seeded) generator of related documents per company"""
+
+    def __init__(
+        self,
+        seed: int = 42,
+        status_weights: Optional[Dict[str, float]] = None,
+        client_ratio: float = 0.5,
+        days: int = 365,
+        password_hashes: Optional[List[str]] = None,
+        nif_offset: int = 1_000_000,
+        decided_by_user_id: Optional[str] = None,
+        now: Optional[datetime] = None
+    ):
+        self.rng = random.Random(seed)
+        self.status_weights = list((status_weights or DEFAULT_STATUS_WEIGHTS).items())
+        self.client_ratio = client_ratio
+        self.days = days
+        self.password_hashes = password_hashes or []
+        self.nif_offset = nif_offset
+        self.decided_by_user_id = decided_by_user_id
+        self.now = now or datetime.now(timezone.utc)
+
+    def _company_name(self) -> Tuple[str, str]:
+        rng = self.rng
+        form, letter = self._legal_form()
+        return f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_ROOTS)} {form}", letter
+
+    def _legal_form(self):
+        forms = [(f, l) for f, l, _ in LEGAL_FORMS]
+        weights = [w for _, _, w in LEGAL_FORMS]
+        return self.rng.choices(forms, weights=weights)[0]
+
+    def _person(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)} {rng.choice(SURNAMES)}"
+
+    def _phone(self) -> str:
+        rng = self.rng
+        return f"+34 6{rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}"
+
+    def _ts(self, base: datetime, max_days: float) -> datetime:
+        return base + timedelta(seconds=self.rng.uniform(0, max_days * 86400))
+
+    def company_bundle(self, index: int) -> Dict[str, List[dict]]:
+        """All documents belonging to the `index`-th synthetic company"""
+        rng = self.rng
+        name, letter = self._company_name()
+        company_id = _uuid(rng)
+        status = _weighted(rng, self.status_weights)
+        created = self.now - timedelta(seconds=rng.uniform(0, self.days * 86400))
+        # Decisions happen within a few weeks of the lead being created
+        decided = min(self._ts(created, 30), self.now) if status != "lead" else None
+        updated = decided or created
+
+        intake_submitted = status != "lead" or rng.random() < 0.5
+        has_intake = intake_submitted or rng.random() < 0.5
+
+        bundle = {"companies": [], "diagnostics": [], "client_intakes": [], "projects": [], "users": []}
+
+        contact = self._person()
+        bundle["companies"].append({
+            "id": company_id,
+            "name": name,
+            "nif": make_nif(letter, self.nif_offset + index),
+            "sector": _weighted(rng, SECTORS),
+            "size_range": _weighted(rng, SIZE_RANGES),
+            "country": "España",
+            "website": f"https://{slugify(name)}.example.com" if rng.random() < 0.7 else None,
+            "contact_name": contact,
+            "contact_role": rng.choice(CONTACT_ROLES),
+            "contact_phone": self._phone(),
+            "status": status,
+            "intake_status": "recibida" if intake_submitted else "pendiente",
+            "created_at": created,
+            "updated_at": updated
+        })
+
+        apta = status == "apta"
+        bundle["diagnostics"].append({
+            "id": _uuid(rng),
+            "company_id": company_id,
+            "eligibility_ok": status != "descartada" and (apta or rng.random() < 0.5),
+            "space_identified": apta or rng.random() < 0.2,
+            "data_potential": apta or rng.random() < 0.3,
+            "legal_risk": "alto" if status == "descartada" and rng.random() < 0.6 else _weighted(rng, [("bajo", 0.6), ("medio", 0.3), ("alto", 0.1)]),
+            "notes": "Evaluación completada." if decided else None,
+            "result": {"lead": "pendiente", "apta": "apta", "descartada": "no_apta"}[status],
+            "decided_by_user_id": self.decided_by_user_id if decided else None,
+            "decided_at": decided,
+            "created_at": created
+        })
+
+        if has_intake:
+            intake_created = self._ts(created, 7)
+            submitted_at = intake_created + timedelta(hours=rng.uniform(0, 72)) if intake_submitted else None
+            intake = {
+                "id": _uuid(rng),
+                "company_id": company_id,
+                "data_types": rng.sample(DATA_TYPES, rng.randint(1, 3)),
+                "data_usage": _weighted(rng, DATA_USAGE),
+                "main_interests": rng.sample(MAIN_INTERESTS, rng.randint(1, 3)),
+                "data_sensitivity": _weighted(rng, DATA_SENSITIVITY),
+                "notes": None,
+                "submitted": intake_submitted,
+                "submitted_at": submitted_at,
+                "created_at": intake_created,
+                "updated_at": submitted_at or intake_created
+            }
+            bundle["client_intakes"].append(intake)
+            # Denormalized copy used by the company list facet filters
+            bundle["companies"][0]["intake_facets"] = {
+                field: intake[field] for field in ("data_types", "main_interests", "data_usage", "data_sensitivity")
+            }
+
+        if apta:
+            incorporation_status = _weighted(rng, INCORPORATION_WEIGHTS)
+            done = incorporation_status == "completada"
+            space = rng.choice(SPACE_NAMES) if done or rng.random() < 0.7 else None
+            role = rng.choice(["participante", "proveedor"]) if done or rng.random() < 0.6 else None
+            use_case = rng.choice(USE_CASES) if done or rng.random() < 0.5 else None
+            rgpd = done or rng.random() < 0.4
+            bundle["projects"].append({
+                "id": _uuid(rng),
+                "company_id": company_id,
+                "title": f"Incorporación - {name}",
+                "phase": 2,
+                "status": "iniciado",
+                "target_role": role,
+                "space_name": space,
+                "use_case": use_case,
+                "rgpd_checked": rgpd,
+                "incorporation_status": incorporation_status,
+                "incorporation_checklist": {
+                    "espacio_seleccionado": space is not None,
+                    "rol_definido": role is not None,
+                    "caso_uso_definido": use_case is not None,
+                    "validacion_rgpd": rgpd
+                },
+                "checklist_completed": sum([space is not None, role is not None, use_case is not None, rgpd]),
+                "created_at": decided
+            })
+
+        if self.password_hashes and rng.random() < self.client_ratio:
+            bundle["users"].append({
+                "id": _uuid(rng),
+                "email": f"cliente{index}@{slugify(name)[:40]}.example.com",
+                "name": f"{contact} ({name})",
+                "name_lower": fold_text(f"{contact} ({name})"),
+                "password": rng.choice(self.password_hashes),
+                "role": "cliente",
+                "company_id": company_id,
+                "created_at": self._ts(created, 2)
+            })
+
+        return bundle
+
+    def batches(self, count: int, batch_size: int, start: int = 0) -> Iterator[Dict[str, List[dict]]]:
+        """Yield per-collection document lists covering `batch_size` companies each"""
+        for offset in range(start, start + count, batch_size):
+            batch = {"companies": [], "diagnostics": [], "client_intakes": [], "projects": [], "users": []}
+            for index in range(offset, min(offset + batch_size, start + count)):
+                for collection, docs in self.company_bundle(index).items():
+                    batch[collection].extend(docs)
+            yield batch
+
+def generate_chunk(seed: int, start: int, count: int, **options) -> Dict[str, List[dict]]:
+    """Generate companies [start, start + count) in a worker process.
+
+    Each chunk gets its own RNG stream so chunks can be produced in parallel
+    and the output is still reproducible for a given seed.
+    """
+    generator = SyntheticDataGenerator(seed=seed * 1_000_003 + start, **options)
+    return next(generator.batches(count, count, start=start))
@@ -1,26 +1,65 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Response, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import FileResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, BeforeValidator
+from typing import Annotated, Any, Dict, List, Optional, Literal, Tuple, Union
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
 import re
+import asyncio
+import contextvars
+import copy
+from storage import Database, encode_index_keys
+from profiling import ProfilingMiddleware, RequestProfiler, trace_collection
+from repositories import memory_repositories, motor_repositories, set_path
+from scoring import EligibilityScorer, load_rules
+from suggest import CatalogSuggester
+from similarity import SimilarityIndex
+from lifecycle import Applied, StateMachine, Transition, TransitionRejected
+from notifications import (
+    FAILED,
+    PENDING,
+    PENDING_COUNT,
+    SENDING,
+    SENT,
+    OutboxDispatcher,
+    outbox_entries,
+    pending_notification,
+    sinks_from_env
+)
+from archive import CollectionStore, CompanyArchiver, FileStore
+from idempotency import IdempotencyMiddleware, IdempotencyStore
+from changes import ChangeFeed, CursorExpired, InvalidCursor, Position
+import unicodedata
+import base64
+import json
+import math
+import numpy as np
+import pandas as pd
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+# ID_STORAGE=uuid stores the application id as a binary UUID _id (see storage.py)
+db = Database(client[os.environ['DB_NAME']], os.environ.get('ID_STORAGE', 'legacy'))
+# Times each Mongo call while a request is being traced (see profiling.py)
+db.observer = trace_collection
+# Core entities go through repositories; STORAGE_ENGINE=memory runs them in
+# process with no Mongo (tests, benchmarks). Every route does; only CLI work
+# (rollup rebuilds, backfills, migrations) uses `db` directly.
+STORAGE_ENGINE = os.environ.get('STORAGE_ENGINE', 'mongo')
+repos = memory_repositories() if STORAGE_ENGINE == 'memory' else motor_repositories(db)
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'espacio-datos-secret-key-2024')
@@ -32,6 +71,89 @@ app = FastAPI()
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
 
+# ==================== TIMESTAMPS ====================
+# Timestamps are stored as native BSON dates (the client is tz_aware, so they
+# come back as UTC datetimes) and exposed by the API as ISO 8601 strings.
+def utcnow() -> datetime:
+    # BSON dates have millisecond precision; truncate so responses built from
+    # freshly written documents match what a later read returns
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+def as_datetime(value: Any) -> datetime:
+    """Accept a stored datetime or a legacy/client ISO string"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida: {value}")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def to_iso(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return as_datetime(value).isoformat()
+    return value
+
+Timestamp = Annotated[str, BeforeValidator(to_iso)]
+
+# ==================== CHANGE FEED ====================
+# Every write to companies and projects takes the next value of one global
+# sequence (change_seq) and every delete leaves a tombstone, so integrations
+# pull only what changed with GET /changes (see changes.py). Writes that skip
+# the repositories (bulk backfills) stamp themselves with
+# change_feed.stamp()/stamps(); anything left unstamped is stamped by
+# stamp_unstamped_changes every CHANGE_FEED_RECOVER_SECONDS. Changes younger
+# than CHANGE_FEED_SETTLE_SECONDS are held back until earlier sequence numbers
+# have landed; tombstones, and so cursors, last CHANGE_RETENTION_DAYS.
+CHANGE_FEED_SETTLE_SECONDS = float(os.environ.get("CHANGE_FEED_SETTLE_SECONDS", "2"))
+CHANGE_RETENTION_DAYS = int(os.environ.get("CHANGE_RETENTION_DAYS", "30"))
+CHANGE_FEED_RECOVER_SECONDS = float(os.environ.get("CHANGE_FEED_RECOVER_SECONDS", "300"))
+change_feed = ChangeFeed(
+    repos.counters,
+    repos.tombstones,
+    clock=utcnow,
+    id_factory=lambda: str(uuid.uuid4()),
+    settle=timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS),
+    retention=timedelta(days=CHANGE_RETENTION_DAYS)
+)
+repos.companies = change_feed.track("company", repos.companies)
+repos.projects = change_feed.track("project", repos.projects)
+
+async def backfill_change_feed(batch_size: int = 1000, progress=None) -> Dict[str, int]:
+    """Give a change_seq to companies and projects written before the feed
+    existed (or by seeds and restores that skipped it), so a first sync from
+    an empty cursor sees them; returns documents stamped per collection"""
+    from pymongo import UpdateOne
+
+    stamped = {}
+    for name in ("companies", "projects"):
+        collection = db[name]
+        stamped[name] = 0
+        while True:
+            docs = await collection.find({"change_seq": None}, {"_id": 0, "id": 1}).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            stamps = await change_feed.stamps(len(docs))
+            ops = [
+                UpdateOne({"id": doc["id"], "change_seq": None}, {"$set": stamp})
+                for doc, stamp in zip(docs, stamps)
+            ]
+            stamped[name] += (await collection.bulk_write(ops, ordered=False)).modified_count
+            if progress:
+                progress(name, stamped[name])
+    return stamped
+
+async def stamp_unstamped_changes() -> None:
+    while True:
+        await asyncio.sleep(CHANGE_FEED_RECOVER_SECONDS)
+        try:
+            recovered = await change_feed.recover({"company": repos.companies, "project": repos.projects})
+            if recovered:
+                logger.info(f"Change feed: stamped {recovered} unstamped documents")
+        except Exception:
+            logger.exception("Change feed recovery failed")
+
 # ==================== USER MODELS ====================
 class UserBase(BaseModel):
     email: EmailStr
@@ -52,7 +174,8 @@ class UserResponse(BaseModel):
     name: str
     role: Optional[str] = None
     company_id: Optional[str] = None
-    created_at: str
+    company_name: Optional[str] = None
+    created_at: Timestamp
 
 class UserUpdate(BaseModel):
     name: Optional[str] = None
@@ -82,6 +205,7 @@ class CompanyCreate(BaseModel):
     contact_name: Optional[str] = None
     contact_role: Optional[str] = None
     contact_phone: Optional[str] = None
+    owner_id: Optional[str] = None  # admins only; an asesor always owns what they create
 
 class CompanyUpdate(BaseModel):
     name: Optional[str] = None
@@ -108,8 +232,73 @@ class CompanyResponse(BaseModel):
     contact_phone: Optional[str] = None
     status: str  # lead, apta, descartada
     intake_status: str = "pendiente"  # pendiente, recibida
-    created_at: str
-    updated_at: str
+    eligibility_score: Optional[float] = None  # copied from the diagnostic for sorting
+    owner_id: Optional[str] = None  # owning asesor
+    owner_name: Optional[str] = None
+    created_at: Timestamp
+    updated_at: Timestamp
+
+class CompanyAssignment(BaseModel):
+    owner_id: Optional[str] = None  # None leaves the company unassigned
+
+class CompanyReassignment(BaseModel):
+    to_owner_id: Optional[str] = None
+    status: Optional[Literal["lead", "apta", "descartada"]] = None  # only companies in this status
+
+class AdvisorWorkload(BaseModel):
+    id: str
+    name: str
+    email: str
+    total: int
+    lead: int
+    apta: int
+    descartada: int
+
+class WorkloadResponse(BaseModel):
+    advisors: List[AdvisorWorkload]  # fewest open leads first
+    unassigned: Dict[str, int]  # status -> companies without owner, plus "total"
+
+class ArchivedCompanyResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    nif: str
+    sector: Optional[str] = None
+    status: str  # apta (incorporation completed) or descartada
+    owner_id: Optional[str] = None
+    owner_name: Optional[str] = None
+    projects: int = 0
+    created_at: Timestamp
+    archived_at: Timestamp
+
+class CompanyFacetedResponse(BaseModel):
+    items: List[CompanyResponse]
+    facets: Dict[str, Dict[str, int]]  # facet -> value -> count within the filtered set
+
+class SimilarCompany(BaseModel):
+    company: CompanyResponse
+    similarity: float  # cosine, 0-1
+    space_id: Optional[str] = None
+    space_name: Optional[str] = None
+    target_role: Optional[str] = None
+    incorporation_status: Optional[str] = None
+
+class SpaceRecommendation(BaseModel):
+    space_id: str
+    space_name: Optional[str] = None
+    score: float  # sum of the similarities of the peers in the space
+    companies: int
+
+class SimilarCompaniesResponse(BaseModel):
+    items: List[SimilarCompany]
+    spaces: List[SpaceRecommendation]
+
+class TransitionResponse(BaseModel):
+    transition: str
+    entity: str  # intakes, diagnostics, projects
+    field: str
+    state: Any  # value the field was moved to
+    company: Optional[CompanyResponse] = None  # when the transition changed it
 
 # ==================== CLIENT INTAKE MODELS ====================
 class ClientIntakeCreate(BaseModel):
@@ -129,9 +318,9 @@ class ClientIntakeResponse(BaseModel):
     data_sensitivity: str
     notes: Optional[str] = None
     submitted: bool = False
-    submitted_at: Optional[str] = None
-    created_at: str
-    updated_at: str
+    submitted_at: Optional[Timestamp] = None
+    created_at: Timestamp
+    updated_at: Timestamp
 
 # ==================== DIAGNOSTIC MODELS ====================
 class DiagnosticCreate(BaseModel):
@@ -148,6 +337,12 @@ class DiagnosticUpdate(BaseModel):
     legal_risk: Optional[Literal["bajo", "medio", "alto"]] = None
     notes: Optional[str] = None
 
+class DiagnosticSuggestion(BaseModel):
+    eligibility_ok: bool
+    space_identified: bool
+    data_potential: bool
+    legal_risk: str
+
 class DiagnosticResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -158,13 +353,30 @@ class DiagnosticResponse(BaseModel):
     legal_risk: str
     notes: Optional[str] = None
     result: str  # pendiente, apta, no_apta
+    score: Optional[float] = None  # 0-100, from the submitted intake (see scoring.py)
+    score_breakdown: Dict[str, float] = {}
+    suggestion: Optional[DiagnosticSuggestion] = None
+    prefilled: bool = False  # fields still hold the suggestion, untouched by an advisor
+    scored_at: Optional[Timestamp] = None
     decided_by_user_id: Optional[str] = None
-    decided_at: Optional[str] = None
-    created_at: str
+    decided_at: Optional[Timestamp] = None
+    created_at: Timestamp
 
 class DiagnosticDecision(BaseModel):
     result: Literal["apta", "no_apta"]
 
+# ==================== ACTIVITY MODELS ====================
+class ActivityResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    company_id: Optional[str] = None
+    action: str  # company_created, intake_saved, diagnostic_decided, ...
+    actor_id: Optional[str] = None
+    actor_name: Optional[str] = None
+    actor_role: Optional[str] = None
+    details: dict = {}
+    ts: Timestamp
+
 # ==================== PROJECT MODELS ====================
 class IncorporationChecklist(BaseModel):
     espacio_seleccionado: bool = False
@@ -173,7 +385,8 @@ class IncorporationChecklist(BaseModel):
     validacion_rgpd: bool = False
 
 class ProjectUpdate(BaseModel):
-    space_name: Optional[str] = None
+    space_id: Optional[str] = None  # data_spaces catalog id; "" clears the space
+    space_name: Optional[str] = None  # resolved against catalog names and aliases
     target_role: Optional[Literal["participante", "proveedor"]] = None
     use_case: Optional[str] = None
     rgpd_checked: Optional[bool] = None
@@ -187,12 +400,85 @@ class ProjectResponse(BaseModel):
     phase: int
     status: str
     target_role: Optional[str] = None
+    space_id: Optional[str] = None
     space_name: Optional[str] = None
     use_case: Optional[str] = None
     rgpd_checked: bool = False
     incorporation_status: str = "pendiente"
     incorporation_checklist: IncorporationChecklist = IncorporationChecklist()
-    created_at: str
+    checklist_completed: int = 0
+    version: int = 0  # bumped on every update; send it back in If-Match
+    owner_id: Optional[str] = None  # copied from the company
+    completed_at: Optional[Timestamp] = None
+    created_at: Timestamp
+
+# ==================== DATA SPACE MODELS ====================
+class DataSpaceCreate(BaseModel):
+    name: str = Field(min_length=1)
+    description: Optional[str] = None
+    sector: Optional[str] = None
+    website: Optional[str] = None
+    aliases: List[str] = []  # other spellings that resolve to this space
+
+class DataSpaceUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1)
+    description: Optional[str] = None
+    sector: Optional[str] = None
+    website: Optional[str] = None
+    aliases: Optional[List[str]] = None
+
+class DataSpaceResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    description: Optional[str] = None
+    sector: Optional[str] = None
+    website: Optional[str] = None
+    aliases: List[str] = []
+    projects: int = 0
+    participants: int = 0  # projects with target_role "participante"
+    providers: int = 0  # projects with target_role "proveedor"
+    created_at: Timestamp
+    updated_at: Timestamp
+
+class DataSpaceSuggestion(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    name: str
+    sector: Optional[str] = None
+
+# ==================== BATCH MODELS ====================
+class BatchOperation(BaseModel):
+    id: Optional[str] = None  # echoed back so clients can match results
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    path: str  # e.g. /api/companies/{id} or /companies/{id}, query string allowed
+    body: Optional[Any] = None
+    headers: Dict[str, str] = {}  # extra headers such as If-Match
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=50)
+    sequential: bool = False  # run strictly one after another
+    stop_on_error: bool = False  # sequential only: skip the rest after a >= 400
+
+class BatchResult(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str] = {}
+    body: Optional[Any] = None
+
+# ==================== CHANGE FEED MODELS ====================
+class ChangeEntry(BaseModel):
+    entity: Literal["company", "project"]
+    op: Literal["upsert", "delete"]
+    id: str
+    seq: int
+    changed_at: Timestamp
+    data: Optional[Union[CompanyResponse, ProjectResponse]] = None  # current state; None for deletes
+
+class ChangesPage(BaseModel):
+    items: List[ChangeEntry]
+    cursor: str  # pass back as ?since= to resume after the last item
+    has_more: bool  # more changes are ready: ask again right away
 
 # ==================== HELPER FUNCTIONS ====================
 def hash_password(password: str) -> str:
@@ -201,6 +487,10 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def fold_text(value: str) -> str:
+    """Lowercase and strip accents, for prefix search on names"""
+    return unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii").lower()
+
 def create_token(user_id: str, email: str, role: Optional[str]) -> str:
     payload = {
         "user_id": user_id,
@@ -218,9 +508,16 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
+# Set by POST /api/batch for the duration of its sub-requests so they reuse
+# the user it already loaded instead of hitting the users collection again
+batch_user: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("batch_user", default=None)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     payload = decode_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+    preloaded = batch_user.get()
+    if preloaded and preloaded["id"] == payload["user_id"]:
+        return preloaded
+    user = await repos.users.get({"id": payload["user_id"]})
     if not user:
         raise HTTPException(status_code=401, detail="Usuario no encontrado")
     return user
@@ -232,10 +529,1112 @@ def require_role(allowed_roles: List[str]):
         return current_user
     return role_checker
 
+# ==================== PAGINATION ====================
+# Keyset pagination: the cursor carries the sort value and id of the last row
+# returned; the next page starts strictly after it. List endpoints keep
+# returning a plain JSON array and put the cursor in the X-Next-Cursor header.
+def _cursor_default(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Valor no serializable en cursor: {value!r}")
+
+def _cursor_hook(obj: dict):
+    if set(obj) == {"$date"}:
+        return as_datetime(obj["$date"])
+    return obj
+
+def encode_cursor(values: list) -> str:
+    payload = json.dumps(values, separators=(",", ":"), default=_cursor_default)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()), object_hook=_cursor_hook)
+    except (ValueError, HTTPException):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != 2:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+def keyset_filter(field: str, direction: int, cursor: str) -> dict:
+    """Filter selecting rows after the cursor for a sort on (field, id)"""
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if direction < 0 else "$gt"
+    return {"$or": [{field: {op: value}}, {field: value, "id": {op: last_id}}]}
+
+def and_filters(query: dict, extra: dict) -> dict:
+    if not query:
+        return extra
+    return {"$and": [query, extra]}
+
+def set_next_cursor(response: Response, rows: List[dict], limit: int, field: str) -> None:
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([last.get(field), last["id"]])
+
+# ==================== AUDIT LOG ====================
+AUDIT_QUEUE_MAXSIZE = int(os.environ.get('AUDIT_QUEUE_MAXSIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', '1.0'))
+AUDIT_WRITE_ATTEMPTS = int(os.environ.get('AUDIT_WRITE_ATTEMPTS', '6'))
+
+class AuditLogWriter:
+    """Write-behind buffer for activity events.
+
+    Routes enqueue events without awaiting Mongo; a background task flushes
+    them with insert_many once a batch fills up or the flush interval elapses.
+    The queue is bounded: when it is full new events are dropped and counted.
+    A failed insert is retried with exponential backoff (new events keep
+    queueing meanwhile, up to the bound); a batch that still fails after
+    `attempts` tries is given up and its events counted as lost.
+    """
+
+    def __init__(
+        self,
+        collection,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        attempts: int = 6,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.dropped = 0  # rejected because the queue was full
+        self.lost = 0  # given up after every write attempt failed
+        self.written = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, event: dict) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Audit queue full, {self.dropped} events dropped so far")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._closing.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the background task"""
+        if self._task is None:
+            return
+        self._closing.set()
+        await self._task
+        self._task = None
+
+    async def _next_batch(self) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch = []
+        while len(batch) < self.batch_size:
+            if self._closing.is_set():
+                # Draining: take whatever is left without waiting
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def status(self) -> dict:
+        return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped, "lost": self.lost}
+
+    async def _write(self, batch: List[dict]) -> None:
+        delay = self.backoff
+        for attempt in range(1, self.attempts + 1):
+            try:
+                if attempt > 1:
+                    # An unordered insert_many may have written part of the
+                    # batch before failing; only the rest is sent again
+                    written = await self.collection.list({"id": {"$in": [event["id"] for event in batch]}})
+                    stored = {event["id"] for event in written}
+                    self.written += len(stored)
+                    batch = [event for event in batch if event["id"] not in stored]
+                    if not batch:
+                        return
+                await self.collection.insert_many(batch)
+                self.written += len(batch)
+                return
+            except Exception:
+                if attempt == self.attempts:
+                    self.lost += len(batch)
+                    logger.exception(
+                        f"Gave up on {len(batch)} audit events after {attempt} attempts, {self.lost} lost so far"
+                    )
+                    return
+                logger.warning(f"Failed to write {len(batch)} audit events (attempt {attempt}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    async def _run(self) -> None:
+        while not (self._closing.is_set() and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+audit_log = AuditLogWriter(
+    repos.activity,
+    max_queue=AUDIT_QUEUE_MAXSIZE,
+    batch_size=AUDIT_BATCH_SIZE,
+    flush_interval=AUDIT_FLUSH_INTERVAL_SECONDS,
+    attempts=AUDIT_WRITE_ATTEMPTS
+)
+
+def record_activity(action: str, actor: Optional[dict], company_id: Optional[str] = None, **details) -> None:
+    """Queue an activity event; never blocks the request"""
+    audit_log.record({
+        "id": str(uuid.uuid4()),
+        "company_id": company_id,
+        "action": action,
+        "actor_id": actor.get("id") if actor else None,
+        "actor_name": actor.get("name") if actor else None,
+        "actor_role": actor.get("role") if actor else None,
+        "details": details,
+        "ts": utcnow()
+    })
+
+# ==================== FUNNEL ROLLUPS ====================
+# funnel_daily holds one document per UTC day ("YYYY-MM-DD") with counters
+# that routes bump with $inc, so analytics never scan the source collections.
+#   created                      leads created that day
+#   decided_apta/_descartada     decisions taken that day
+#   cohort_apta/_descartada      decisions for leads *created* that day
+#   decision_seconds_sum         lead creation -> decision, summed
+#   decision_hours_hist.<b>      decisions with log2(hours + 1) in bucket b
+#   completed                    incorporations completed that day
+#   completion_seconds_sum       project creation -> completion, summed
+FUNNEL_HIST_BUCKETS = 16
+FUNNEL_COUNTERS = [
+    "created", "decided_apta", "decided_descartada", "cohort_apta", "cohort_descartada",
+    "decision_seconds_sum", "completed", "completion_seconds_sum"
+]
+
+def funnel_day(ts) -> str:
+    return as_datetime(ts).astimezone(timezone.utc).strftime("%Y-%m-%d")
+
+def seconds_between(start, end) -> float:
+    return max((as_datetime(end) - as_datetime(start)).total_seconds(), 0.0)
+
+def decision_bucket(seconds: float) -> int:
+    return min(int(math.log2(seconds / 3600 + 1)), FUNNEL_HIST_BUCKETS - 1)
+
+async def bump_funnel(day: str, increments: dict) -> None:
+    await repos.funnel.increment({"day": day}, increments)
+
+async def record_decision_rollup(company: dict, new_status: str, decided_at: datetime) -> None:
+    seconds = seconds_between(company["created_at"], decided_at)
+    decided_day = funnel_day(decided_at)
+    cohort_day = funnel_day(company["created_at"])
+    decided = {
+        f"decided_{new_status}": 1,
+        "decision_seconds_sum": seconds,
+        f"decision_hours_hist.{decision_bucket(seconds)}": 1
+    }
+    if cohort_day == decided_day:
+        decided[f"cohort_{new_status}"] = 1
+    else:
+        await bump_funnel(cohort_day, {f"cohort_{new_status}": 1})
+    await bump_funnel(decided_day, decided)
+
+async def rebuild_funnel_rollups() -> int:
+    """Recompute funnel_daily from companies, diagnostics and projects.
+
+    Used to backfill the rollups and to repair drift; expects native dates
+    (run migrate-timestamps first on older data). Archived companies are not
+    in the source collections, so a rebuild drops them from the counts.
+    Returns the number of day documents written.
+    """
+    days: dict = {}
+
+    def bucket(day: str) -> dict:
+        return days.setdefault(day, {"day": day, "decision_hours_hist": {}})
+
+    def add(day: str, field: str, value) -> None:
+        doc = bucket(day)
+        doc[field] = doc.get(field, 0) + value
+
+    created = db.companies.aggregate([
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}, "n": {"$sum": 1}}}
+    ])
+    async for row in created:
+        add(row["_id"], "created", row["n"])
+
+    # Diagnostics are created together with their company, so the diagnostic
+    # created_at is the lead creation time.
+    decision_seconds = {"$divide": [{"$subtract": ["$decided_at", "$created_at"]}, 1000]}
+    decisions = db.diagnostics.aggregate([
+        {"$match": {"result": {"$in": ["apta", "no_apta"]}, "decided_at": {"$ne": None}}},
+        {"$project": {
+            "status": {"$cond": [{"$eq": ["$result", "apta"]}, "apta", "descartada"]},
+            "decided_day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$decided_at"}},
+            "cohort_day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "seconds": {"$max": [decision_seconds, 0]}
+        }},
+        {"$project": {
+            "status": 1, "decided_day": 1, "cohort_day": 1, "seconds": 1,
+            "bucket": {"$min": [
+                {"$floor": {"$log": [{"$add": [{"$divide": ["$seconds", 3600]}, 1]}, 2]}},
+                FUNNEL_HIST_BUCKETS - 1
+            ]}
+        }},
+        {"$group": {
+            "_id": {"status": "$status", "decided_day": "$decided_day", "cohort_day": "$cohort_day", "bucket": "$bucket"},
+            "n": {"$sum": 1},
+            "seconds": {"$sum": "$seconds"}
+        }}
+    ], allowDiskUse=True)
+    async for row in decisions:
+        key = row["_id"]
+        add(key["decided_day"], f"decided_{key['status']}", row["n"])
+        add(key["decided_day"], "decision_seconds_sum", row["seconds"])
+        add(key["cohort_day"], f"cohort_{key['status']}", row["n"])
+        hist = bucket(key["decided_day"])["decision_hours_hist"]
+        b = str(int(key["bucket"]))
+        hist[b] = hist.get(b, 0) + row["n"]
+
+    # Projects completed before completed_at existed fall back to created_at
+    completed_at = {"$ifNull": ["$completed_at", "$created_at"]}
+    completions = db.projects.aggregate([
+        {"$match": {"incorporation_status": "completada"}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": completed_at}},
+            "n": {"$sum": 1},
+            "seconds": {"$sum": {"$divide": [{"$subtract": [completed_at, "$created_at"]}, 1000]}}
+        }}
+    ])
+    async for row in completions:
+        add(row["_id"], "completed", row["n"])
+        add(row["_id"], "completion_seconds_sum", row["seconds"])
+
+    await db.funnel_daily.delete_many({})
+    if days:
+        await db.funnel_daily.insert_many(list(days.values()))
+    return len(days)
+
+def summarize_funnel(rows: List[dict], granularity: str) -> dict:
+    """Aggregate daily rollups into periods with conversion and latency metrics"""
+    if not rows:
+        return {"granularity": granularity, "periods": [], "totals": None}
+
+    counts = pd.DataFrame(rows).reindex(columns=["day", *FUNNEL_COUNTERS]).fillna(0)
+    days = pd.to_datetime(counts.pop("day"))
+    hist = (
+        pd.DataFrame([r.get("decision_hours_hist") or {} for r in rows])
+        .reindex(columns=[str(b) for b in range(FUNNEL_HIST_BUCKETS)])
+        .fillna(0)
+    )
+
+    if granularity == "day":
+        period = days
+    else:
+        period = days.dt.to_period("W" if granularity == "week" else "M").dt.start_time
+    counts = counts.groupby(period.values).sum()
+    hist = hist.groupby(period.values).sum().to_numpy()
+
+    periods = _funnel_metrics(counts, hist)
+    periods.insert(0, "period", counts.index.strftime("%Y-%m-%d"))
+    # Completion ratio over time: completed so far / apta so far
+    apta_to_date = counts["decided_apta"].cumsum().to_numpy()
+    periods["completion_rate_to_date"] = _ratio(counts["completed"].cumsum().to_numpy(), apta_to_date)
+
+    totals = _funnel_metrics(counts.sum().to_frame().T, hist.sum(axis=0, keepdims=True))
+    return {
+        "granularity": granularity,
+        "periods": _records(periods),
+        "totals": _records(totals)[0]
+    }
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan), where=denominator > 0)
+
+def _funnel_metrics(counts: pd.DataFrame, hist: np.ndarray) -> pd.DataFrame:
+    apta = counts["decided_apta"].to_numpy(dtype=float)
+    descartada = counts["decided_descartada"].to_numpy(dtype=float)
+    decided = apta + descartada
+    cohort_apta = counts["cohort_apta"].to_numpy(dtype=float)
+    cohort_decided = cohort_apta + counts["cohort_descartada"].to_numpy(dtype=float)
+    completed = counts["completed"].to_numpy(dtype=float)
+
+    metrics = pd.DataFrame({
+        "leads_created": counts["created"].to_numpy(dtype=int),
+        "decided_apta": apta.astype(int),
+        "decided_descartada": descartada.astype(int),
+        "apta_rate": _ratio(apta, decided),
+        "cohort_conversion_rate": _ratio(cohort_apta, cohort_decided),
+        "cohort_decided_rate": _ratio(cohort_decided, counts["created"].to_numpy(dtype=float)),
+        "avg_decision_hours": _ratio(counts["decision_seconds_sum"].to_numpy(dtype=float), decided) / 3600,
+        "incorporations_completed": completed.astype(int),
+        "avg_completion_days": _ratio(counts["completion_seconds_sum"].to_numpy(dtype=float), completed) / 86400
+    })
+
+    # Percentiles from the log2 histogram: upper bound of the bucket where the
+    # cumulative count crosses the quantile.
+    cumulative = hist.cumsum(axis=1)
+    total = cumulative[:, -1:]
+    upper_hours = 2.0 ** (np.arange(FUNNEL_HIST_BUCKETS) + 1) - 1
+    for q in (0.5, 0.9):
+        idx = (cumulative >= q * total).argmax(axis=1)
+        metrics[f"p{int(q * 100)}_decision_hours"] = np.where(total[:, 0] > 0, upper_hours[idx], np.nan)
+    return metrics
+
+def _records(frame: pd.DataFrame) -> List[dict]:
+    frame = frame.round(4).astype(object)
+    return frame.where(pd.notna(frame), None).to_dict(orient="records")
+
+# ==================== INTAKE FACETS ====================
+# Intake answers are copied onto the company as `intake_facets` so that the
+# company list can filter on them through multikey indexes without a join.
+INTAKE_FACETS = ["data_types", "main_interests", "data_usage", "data_sensitivity"]
+
+def intake_facets(intake: dict) -> dict:
+    return {field: intake.get(field) for field in INTAKE_FACETS}
+
+# Answers offered by the intake form; facet counts cover these values
+INTAKE_FACET_VALUES = {
+    "data_types": ["operativos", "comerciales", "clientes_pacientes", "sensores_iot", "historicos", "no_lo_se"],
+    "main_interests": ["mejorar_procesos", "acceder_datos_externos", "monetizar", "cumplimiento", "no_lo_tengo_claro"],
+    "data_usage": ["solo_interno", "reporting", "estrategico", "apenas"],
+    "data_sensitivity": ["baja", "media", "alta", "no_lo_se"]
+}
+
+async def count_intake_facets(query: dict) -> Dict[str, Dict[str, int]]:
+    """Value counts per intake facet for the companies matching `query`.
+
+    One count per facet value, each an equality on that facet's multikey
+    index: with no other filter the count is answered from the index alone,
+    otherwise the index narrows the documents the rest of the query checks.
+    Values with no companies are left out.
+    """
+    pairs = [(field, value) for field in INTAKE_FACETS for value in INTAKE_FACET_VALUES[field]]
+    counts = await asyncio.gather(*(
+        repos.companies.count(and_filters(query, {f"intake_facets.{field}": value})) for field, value in pairs
+    ))
+    facets: Dict[str, Dict[str, int]] = {field: {} for field in INTAKE_FACETS}
+    for (field, value), count in zip(pairs, counts):
+        if count:
+            facets[field][value] = count
+    return facets
+
+async def backfill_intake_facets(batch_size: int = 1000) -> int:
+    """Copy intake answers onto their companies; returns companies updated"""
+    from pymongo import UpdateOne
+
+    updated = 0
+    batch = []  # (company id, facets)
+    
+    async def flush() -> int:
+        stamps = await change_feed.stamps(len(batch))
+        ops = [
+            UpdateOne({"id": company_id}, {"$set": {"intake_facets": facets, **stamp}})
+            for (company_id, facets), stamp in zip(batch, stamps)
+        ]
+        modified = (await db.companies.bulk_write(ops, ordered=False)).modified_count
+        batch.clear()
+        return modified
+    
+    cursor = db.client_intakes.find({}, {"_id": 0, "company_id": 1, **{f: 1 for f in INTAKE_FACETS}})
+    async for intake in cursor:
+        batch.append((intake["company_id"], intake_facets(intake)))
+        if len(batch) >= batch_size:
+            updated += await flush()
+    if batch:
+        updated += await flush()
+    return updated
+
+# ==================== ELIGIBILITY SCORING ====================
+# Submitted intakes are scored into a suggested diagnostic (see scoring.py).
+# The score lives on the diagnostic and is copied onto the company as
+# `eligibility_score` so the lead list can sort by it through an index. The
+# suggestion pre-fills the diagnostic fields until an advisor edits them.
+scorer = EligibilityScorer(load_rules())
+
+# Fields of a diagnostic nobody has touched yet (see create_company)
+BLANK_DIAGNOSTIC = {
+    "eligibility_ok": False,
+    "space_identified": False,
+    "data_potential": False,
+    "legal_risk": "bajo",
+    "notes": None
+}
+
+def prefillable(company_id: str) -> dict:
+    """Pending diagnostics whose fields may be overwritten by the suggestion"""
+    return {
+        "company_id": company_id,
+        "result": "pendiente",
+        "$or": [{"prefilled": True}, {"prefilled": {"$exists": False}, **BLANK_DIAGNOSTIC}]
+    }
+
+def score_fields(scored: dict, now: datetime) -> dict:
+    return {
+        "score": scored["score"],
+        "score_breakdown": scored["breakdown"],
+        "suggestion": scored["suggestion"],
+        "score_version": scored["version"],
+        "scored_at": now
+    }
+
+async def score_intake(company_id: str, intake: dict) -> None:
+    """Score one submitted intake onto its pending diagnostic"""
+    scored = scorer.score(intake)
+    updated = await repos.diagnostics.update(
+        {"company_id": company_id, "result": "pendiente"}, score_fields(scored, utcnow())
+    )
+    if not updated:
+        return
+    await repos.diagnostics.update(prefillable(company_id), {**scored["suggestion"], "prefilled": True})
+    await repos.companies.update({"id": company_id}, {"eligibility_score": scored["score"]})
+
+async def rescore_pending_leads(batch_size: int = 1000, stale_only: bool = True) -> int:
+    """Re-score every pending diagnostic with a submitted intake in bulk;
+    with `stale_only`, only those scored under other rules. Returns the
+    number of diagnostics scored."""
+    query = {"result": "pendiente"}
+    if stale_only:
+        query["score_version"] = {"$ne": scorer.version}
+
+    async def flush(company_ids: List[str]) -> int:
+        intakes = await repos.intakes.list({"company_id": {"$in": company_ids}, "submitted": True})
+        if not intakes:
+            return 0
+        now = utcnow()
+        diagnostic_updates, company_updates = [], []
+        for intake, scored in zip(intakes, scorer.score_batch(intakes)):
+            company_id = intake["company_id"]
+            diagnostic_updates.append(({"company_id": company_id, "result": "pendiente"}, score_fields(scored, now)))
+            diagnostic_updates.append((prefillable(company_id), {**scored["suggestion"], "prefilled": True}))
+            company_updates.append(({"id": company_id}, {"eligibility_score": scored["score"]}))
+        await asyncio.gather(
+            repos.diagnostics.bulk_update(diagnostic_updates),
+            repos.companies.bulk_update(company_updates)
+        )
+        return len(intakes)
+
+    # Keyset pages on id: rescored diagnostics may drop out of the query
+    scored = 0
+    last_id = None
+    while True:
+        page = await repos.diagnostics.list(
+            and_filters(query, {"id": {"$gt": last_id}}) if last_id else query, sort=[("id", 1)], limit=batch_size
+        )
+        if page:
+            scored += await flush([diagnostic["company_id"] for diagnostic in page])
+        if len(page) < batch_size:
+            return scored
+        last_id = page[-1]["id"]
+
+# ==================== DATA SPACES ====================
+# Projects point at a `data_spaces` catalog entry through `space_id` and keep
+# `space_name` as a display copy, updated when the space is renamed. Names
+# and aliases are matched folded, so "Agrícola" and "agricola" are one space.
+def data_space_keys(name: str, aliases: List[str]) -> dict:
+    return {
+        "name_folded": fold_text(name.strip()),
+        "aliases_folded": [fold_text(alias.strip()) for alias in aliases if alias.strip()]
+    }
+
+async def load_data_spaces() -> List[dict]:
+    return await repos.data_spaces.list({}, sort=[("name", 1)], exclude=("name_folded", "aliases_folded"))
+
+# Autocomplete index, rebuilt on every catalog change made here and at least
+# every SUGGEST_MAX_AGE_SECONDS for changes made by other workers
+space_suggester = CatalogSuggester(
+    load_data_spaces,
+    fold_text,
+    lambda space: space.get("aliases", []),
+    max_age=float(os.environ.get("SUGGEST_MAX_AGE_SECONDS", "60"))
+)
+
+async def find_data_space(name: str) -> Optional[dict]:
+    folded = fold_text(name.strip())
+    return await repos.data_spaces.get({"$or": [{"name_folded": folded}, {"aliases_folded": folded}]})
+
+async def ensure_data_space(name: str) -> dict:
+    """Catalog entry for `name`, created if no name or alias matches"""
+    space = await find_data_space(name)
+    if space:
+        return space
+    now = utcnow()
+    space = {
+        "id": str(uuid.uuid4()),
+        "name": name.strip(),
+        "description": None,
+        "sector": None,
+        "website": None,
+        "aliases": [],
+        **data_space_keys(name, []),
+        "created_at": now,
+        "updated_at": now
+    }
+    await repos.data_spaces.insert(space)
+    await space_suggester.reload()
+    return space
+
+async def resolve_data_space(space_id: Optional[str], space_name: Optional[str]) -> Optional[dict]:
+    """Catalog entry a project update points at; None clears the space"""
+    if space_id is not None:
+        if not space_id:
+            return None
+        space = await repos.data_spaces.get({"id": space_id})
+        if not space:
+            raise HTTPException(status_code=404, detail="Espacio de datos no encontrado")
+        return space
+    if not space_name or not space_name.strip():
+        return None
+    space = await find_data_space(space_name)
+    if not space:
+        raise HTTPException(status_code=400, detail="El espacio de datos no está en el catálogo")
+    return space
+
+async def count_space_roles(space_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """Projects per data space and target_role (None for undecided)"""
+    grouped = await repos.projects.count_by({"space_id": {"$in": space_ids}}, ["space_id", "target_role"])
+    counts: Dict[str, Dict[str, int]] = {}
+    for (space_id, role), count in grouped.items():
+        counts.setdefault(space_id, {})[role] = count
+    return counts
+
+def build_data_space_response(space: dict, counts: Dict[str, Dict[str, int]]) -> DataSpaceResponse:
+    roles = counts.get(space["id"], {})
+    return DataSpaceResponse(
+        **space,
+        projects=sum(roles.values()),
+        participants=roles.get("participante", 0),
+        providers=roles.get("proveedor", 0)
+    )
+
+async def backfill_data_spaces() -> Dict[str, int]:
+    """Catalog the free-text space names of existing projects and point the
+    projects at them; names differing only in case/accents share an entry"""
+    names = await db.projects.aggregate([
+        {"$match": {"space_id": None, "space_name": {"$type": "string"}}},
+        {"$group": {"_id": "$space_name"}}
+    ]).to_list(None)
+    before = await repos.data_spaces.count({})
+    linked = 0
+    for row in names:
+        name = row["_id"]
+        if not name.strip():
+            continue
+        space = await ensure_data_space(name)
+        linked += await repos.projects.update_many(
+            {"space_id": None, "space_name": name},
+            {"space_id": space["id"], "space_name": space["name"]}
+        )
+    return {"created": await repos.data_spaces.count({}) - before, "linked": linked}
+
+# ==================== COMPANY SIMILARITY ====================
+# Feature vectors of every company, in memory (see similarity.py). Route
+# writes update single rows; a background task rebuilds the whole index at
+# startup and every SIMILARITY_REBUILD_SECONDS so writes made by other
+# workers or the CLI show up too.
+similarity = SimilarityIndex(fold_text)
+SIMILARITY_REBUILD_SECONDS = float(os.environ.get("SIMILARITY_REBUILD_SECONDS", "600"))
+
+async def rebuild_similarity_index() -> int:
+    companies = await repos.companies.list({})
+    similarity.rebuild(companies)
+    return len(companies)
+
+async def refresh_similarity_index() -> None:
+    while True:
+        try:
+            count = await rebuild_similarity_index()
+            logger.info(f"Similarity index rebuilt: {count} companies")
+        except Exception:
+            logger.exception("Similarity index rebuild failed")
+        await asyncio.sleep(SIMILARITY_REBUILD_SECONDS)
+
+# ==================== NOTIFICATIONS ====================
+# Client notifications go through the outbox (see notifications.py): the
+# lifecycle transitions and the project update record them on the diagnostic
+# or project they move, send_pending_notifications moves them to the outbox
+# once the request's effects have run, and `notifier` delivers them in the
+# background (sweeping up whatever a failed request left behind). With
+# NOTIFY_SINKS empty the recorded notifications are dropped.
+OUTBOX_RETENTION_DAYS = int(os.environ.get("OUTBOX_RETENTION_DAYS", "30"))
+
+def decision_message(company: dict, result: str) -> Tuple[str, str]:
+    if result == "apta":
+        subject = "Vuestra empresa es apta para el espacio de datos"
+        outcome = (
+            "la empresa es apta. Vuestro asesor se pondrá en contacto con vosotros "
+            "para iniciar el proyecto de incorporación."
+        )
+    else:
+        subject = "Resultado del diagnóstico de elegibilidad"
+        outcome = (
+            "por ahora la empresa no es apta para incorporarse al espacio de datos. "
+            "Vuestro asesor os explicará los motivos."
+        )
+    return subject, f"Hola,\n\nEl diagnóstico de elegibilidad de {company['name']} ha concluido: {outcome}\n"
+
+def incorporation_completed_message(company: dict, project: dict) -> Tuple[str, str]:
+    space = f" al espacio {project['space_name']}" if project.get("space_name") else ""
+    return "Incorporación completada", f"Hola,\n\nLa incorporación de {company['name']}{space} se ha completado.\n"
+
+async def render_notification(document: dict, record: dict) -> List[dict]:
+    """Outbox entries of a notification pending on a diagnostic or project;
+    none once the company is gone"""
+    company = await repos.companies.get({"id": document["company_id"]})
+    if not company or not notifier.channels:
+        return []
+    if record["event"] == "diagnostic_decided":
+        subject, body = decision_message(company, document["result"])
+        project = await repos.projects.get({"company_id": company["id"]}) if document["result"] == "apta" else None
+        payload = {"result": document["result"], "project_id": project["id"] if project else None}
+    else:
+        subject, body = incorporation_completed_message(company, document)
+        payload = {
+            "project_id": document["id"],
+            "space_id": document.get("space_id"),
+            "space_name": document.get("space_name"),
+            "target_role": document.get("target_role")
+        }
+    users = await repos.users.list({"company_id": company["id"], "role": "cliente"})
+    return outbox_entries(
+        notifier.channels,
+        record["event"],
+        company["id"],
+        subject,
+        body,
+        [user["email"] for user in users],
+        payload,
+        record["created_at"],
+        key=record["id"]
+    )
+
+notifier = OutboxDispatcher(
+    repos.outbox,
+    sinks_from_env(os.environ),
+    utcnow,
+    sources={"diagnostics": repos.diagnostics, "projects": repos.projects},
+    render=render_notification,
+    grace=float(os.environ.get("OUTBOX_GRACE_SECONDS", "60")),
+    batch_size=int(os.environ.get("OUTBOX_BATCH_SIZE", "50")),
+    concurrency=int(os.environ.get("OUTBOX_CONCURRENCY", "8")),
+    poll_interval=float(os.environ.get("OUTBOX_POLL_SECONDS", "5")),
+    max_attempts=int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+)
+
+async def send_pending_notifications(source: str, document: dict) -> None:
+    """Move the notifications recorded on `document` to the outbox. They are
+    already durable: if this fails the next sweep moves them."""
+    try:
+        if await notifier.collect(source, document):
+            notifier.wake()
+    except Exception:
+        logger.exception(f"Moving notifications of {source} {document['id']} to the outbox failed")
+
+# ==================== COMPANY OWNERSHIP ====================
+# A company may be owned by one asesor (owner_id, with owner_name copied for
+# display); its project carries a copy of owner_id. Company and project lists
+# are scoped by owner through (owner_id, ...) compound indexes, so an
+# asesor's view is a range scan over their own rows.
+OWNER_STATUSES = ["lead", "apta", "descartada"]
+
+def owner_scope(current_user: dict, owner: Optional[str]) -> dict:
+    """Owner filter of a company/project list: asesores see their own rows or
+    the unassigned queue ("none"); admins see everything unless they ask for
+    one owner ("me", "none" or a user id)"""
+    if owner == "none":
+        return {"owner_id": None}
+    if current_user.get("role") == "asesor" or owner == "me":
+        return {"owner_id": current_user["id"]}
+    return {"owner_id": owner} if owner else {}
+
+async def find_advisor(user_id: str) -> dict:
+    advisor = await repos.users.get({"id": user_id, "role": "asesor"}, exclude=["password"])
+    if not advisor:
+        raise HTTPException(status_code=400, detail="El responsable debe ser un asesor")
+    return advisor
+
+def owner_fields(advisor: Optional[dict]) -> dict:
+    return {"owner_id": advisor["id"] if advisor else None, "owner_name": advisor["name"] if advisor else None}
+
+async def move_projects(company_ids: List[str], owner_id: Optional[str], chunk: int = 1000) -> None:
+    for i in range(0, len(company_ids), chunk):
+        await repos.projects.update_many({"company_id": {"$in": company_ids[i:i + chunk]}}, {"owner_id": owner_id})
+
+async def reassign_companies(match: dict, advisor: Optional[dict]) -> int:
+    """Move every company matching `match`, and their projects, to `advisor`"""
+    company_ids = [company["id"] for company in await repos.companies.list(match)]
+    if not company_ids:
+        return 0
+    fields = {**owner_fields(advisor), "updated_at": utcnow()}
+    moved = 0
+    for i in range(0, len(company_ids), 1000):
+        moved += await repos.companies.update_many({"id": {"$in": company_ids[i:i + 1000]}}, fields)
+    await move_projects(company_ids, fields["owner_id"])
+    return moved
+
+async def count_by_status(owner_id: Optional[str]) -> Dict[str, int]:
+    # One count per (owner_id, status) prefix of the compound index
+    counts = await asyncio.gather(*(
+        repos.companies.count({"owner_id": owner_id, "status": status}) for status in OWNER_STATUSES
+    ))
+    return {**dict(zip(OWNER_STATUSES, counts)), "total": sum(counts)}
+
+async def backfill_owners(batch_size: int = 1000) -> int:
+    """Hand every unowned company, oldest first, to the asesor with the
+    fewest companies at that point; returns companies assigned"""
+    import heapq
+    from pymongo import UpdateMany, UpdateOne
+
+    advisors = await repos.users.list({"role": "asesor"}, sort=[("created_at", 1)])
+    if not advisors:
+        return 0
+    loads = await asyncio.gather(*(repos.companies.count({"owner_id": a["id"]}) for a in advisors))
+    heap = [(load, i) for i, load in enumerate(loads)]
+    heapq.heapify(heap)
+    
+    assigned = 0
+    pending = []  # (company id, advisor)
+    
+    async def flush() -> int:
+        # Projects share their company's change_seq
+        stamps = await change_feed.stamps(len(pending))
+        companies = [
+            UpdateOne({"id": company_id, "owner_id": None}, {"$set": {**owner_fields(advisor), **stamp}})
+            for (company_id, advisor), stamp in zip(pending, stamps)
+        ]
+        projects = [
+            UpdateMany({"company_id": company_id}, {"$set": {"owner_id": advisor["id"], **stamp}})
+            for (company_id, advisor), stamp in zip(pending, stamps)
+        ]
+        modified = (await db.companies.bulk_write(companies, ordered=False)).modified_count
+        await db.projects.bulk_write(projects, ordered=False)
+        pending.clear()
+        return modified
+    
+    cursor = db.companies.find({"owner_id": None}, {"_id": 0, "id": 1}).sort("created_at", 1)
+    async for company in cursor:
+        load, i = heapq.heappop(heap)
+        pending.append((company["id"], advisors[i]))
+        heapq.heappush(heap, (load + 1, i))
+        if len(pending) >= batch_size:
+            assigned += await flush()
+    if pending:
+        assigned += await flush()
+    return assigned
+
+# ==================== COMPANY LIFECYCLE ====================
+# Status changes of intakes, diagnostics and projects as a declarative table
+# (see lifecycle.py). The dedicated routes (intake submit/reset, diagnostic
+# decide) and POST /companies/{id}/transitions/{name} all go through
+# run_transition; PUT /companies/{id}/project keeps its own conditional
+# update since it also edits the checklist.
+INITIAL_COMPANY_STATE = {"status": "lead", "intake_status": "pendiente"}
+CHECKLIST_FLAGS = list(IncorporationChecklist.model_fields)
+
+def new_project(company: dict, now: datetime) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "company_id": company["id"],
+        "title": f"Incorporación - {company['name']}",
+        "phase": 2,
+        "status": "iniciado",
+        "target_role": None,
+        "space_id": None,
+        "space_name": None,
+        "use_case": None,
+        "rgpd_checked": False,
+        "incorporation_status": "pendiente",
+        "incorporation_checklist": {flag: False for flag in CHECKLIST_FLAGS},
+        "checklist_completed": 0,
+        "owner_id": company.get("owner_id"),
+        "created_at": now
+    }
+
+async def intake_submitted(company_id: str, applied: Applied, current_user: dict, now: datetime) -> None:
+    await score_intake(company_id, applied.document)
+    record_activity("intake_submitted", current_user, company_id)
+
+async def intake_reset(company_id: str, applied: Applied, current_user: dict, now: datetime) -> None:
+    record_activity("intake_reset", current_user, company_id)
+
+async def diagnostic_decided(company_id: str, applied: Applied, current_user: dict, now: datetime) -> None:
+    company = applied.company
+    project_created = None
+    # None: the company was deleted while its diagnostic was being decided
+    if company is not None:
+        await record_decision_rollup(company, company["status"], now)
+        if company["status"] == "apta":
+            project = new_project(company, now)
+            await repos.projects.insert(project)
+            project_created = project["id"]
+    record_activity(
+        "diagnostic_decided", current_user, company_id, result=applied.document["result"], project_id=project_created
+    )
+
+async def incorporation_changed(company_id: str, applied: Applied, current_user: dict, now: datetime) -> None:
+    project = applied.document
+    # Sources never include "completada", so this is always a new completion
+    if project["incorporation_status"] == "completada":
+        await bump_funnel(funnel_day(now), {
+            "completed": 1,
+            "completion_seconds_sum": seconds_between(project["created_at"], now)
+        })
+    record_activity(
+        "project_updated",
+        current_user,
+        company_id,
+        changes={"incorporation_status": project["incorporation_status"]},
+        checklist=project.get("incorporation_checklist")
+    )
+
+lifecycle = StateMachine(repos, initial=INITIAL_COMPANY_STATE, transitions=[
+    Transition(
+        "submit_intake", "intakes", "submitted", [False, None], True, ["admin", "asesor", "cliente"],
+        stamps=["submitted_at", "updated_at"], company={"intake_status": "recibida"}, effect=intake_submitted
+    ),
+    Transition(
+        "reset_intake", "intakes", "submitted", [True], False, ["admin", "asesor"],
+        stamps=["updated_at"], clears=["submitted_at"], company={"intake_status": "pendiente"}, effect=intake_reset
+    ),
+    Transition(
+        "approve", "diagnostics", "result", ["pendiente"], "apta", ["admin", "asesor"],
+        stamps=["decided_at"], actor="decided_by_user_id", company={"status": "apta"}, effect=diagnostic_decided,
+        notify="diagnostic_decided"
+    ),
+    Transition(
+        "reject", "diagnostics", "result", ["pendiente"], "no_apta", ["admin", "asesor"],
+        stamps=["decided_at"], actor="decided_by_user_id", company={"status": "descartada"}, effect=diagnostic_decided,
+        notify="diagnostic_decided"
+    ),
+    # Projects are versioned for If-Match (see update_company_project)
+    Transition(
+        "start_incorporation", "projects", "incorporation_status", ["pendiente", None], "en_progreso", ["admin", "asesor"],
+        increments={"version": 1}, effect=incorporation_changed
+    ),
+    Transition(
+        "complete_incorporation", "projects", "incorporation_status", ["pendiente", "en_progreso", None], "completada",
+        ["admin", "asesor"],
+        guard={f"incorporation_checklist.{flag}": True for flag in CHECKLIST_FLAGS},
+        stamps=["completed_at"], increments={"version": 1}, effect=incorporation_changed,
+        notify="incorporation_completed"
+    )
+])
+
+# transition -> (document missing, not in a source state, guard failed)
+TRANSITION_ERRORS = {
+    "submit_intake": ("Debe completar el cuestionario antes de enviarlo", "El cuestionario ya ha sido enviado", None),
+    "reset_intake": ("No hay cuestionario para esta empresa", "El cuestionario no ha sido enviado", None),
+    "approve": ("Diagnóstico no encontrado", "El diagnóstico ya ha sido decidido", None),
+    "reject": ("Diagnóstico no encontrado", "El diagnóstico ya ha sido decidido", None),
+    "start_incorporation": ("Proyecto no encontrado", "La incorporación ya se ha iniciado", None),
+    "complete_incorporation": (
+        "Proyecto no encontrado",
+        "La incorporación ya está completada",
+        "Para completar la incorporación faltan pasos del checklist."
+    )
+}
+
+async def repair_lifecycle_mirrors(batch_size: int = 500, progress=None) -> int:
+    """Put company.status and company.intake_status back in step with the
+    diagnostic and intake they mirror (after a crash between a transition
+    and its mirror write); returns companies repaired"""
+    repaired = 0
+    last_id = None
+    while True:
+        page = await repos.companies.list(
+            {"id": {"$gt": last_id}} if last_id else {}, sort=[("id", 1)], limit=batch_size
+        )
+        if page:
+            repaired += await lifecycle.repair(page, utcnow())
+            if progress:
+                progress(repaired)
+        if len(page) < batch_size:
+            return repaired
+        last_id = page[-1]["id"]
+
+async def run_transition(name: str, company_id: str, current_user: dict, conflict_status: int = 409) -> Applied:
+    """Apply a lifecycle transition and its effects; rejections become HTTP errors"""
+    transition = lifecycle.get(name)
+    now = utcnow()
+    try:
+        applied = await lifecycle.apply(name, company_id, now, current_user["id"])
+    except TransitionRejected as rejected:
+        missing, conflict, guard_failed = TRANSITION_ERRORS[name]
+        if rejected.current is None:
+            raise HTTPException(status_code=404, detail=missing)
+        in_source = rejected.current.get(transition.field) in transition.source
+        raise HTTPException(status_code=conflict_status, detail=guard_failed if in_source and guard_failed else conflict)
+    if applied.company is not None:
+        similarity.upsert(applied.company)
+    if transition.effect:
+        await transition.effect(company_id, applied, current_user, now)
+    if transition.notify:
+        await send_pending_notifications(transition.entity, applied.document)
+    return applied
+
+# ==================== COMPANY ARCHIVE ====================
+# Discarded companies and completed incorporations that have been idle for
+# ARCHIVE_AFTER_DAYS leave the hot collections with `cli.py archive-companies`
+# (see archive.py). Hot routes never read the archive: it is only listed by
+# GET /archive/companies and brought back with
+# POST /archive/companies/{id}/restore. ARCHIVE_STORE=file keeps the bundles
+# as zstd NDJSON files under ARCHIVE_DIR instead of in archived_companies.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_STORE = os.environ.get("ARCHIVE_STORE", "collection")
+ARCHIVE_DIR = Path(os.environ.get("ARCHIVE_DIR", str(ROOT_DIR / "archive")))
+archiver = CompanyArchiver(
+    repos, FileStore(repos.archive, ARCHIVE_DIR) if ARCHIVE_STORE == "file" else CollectionStore(repos.archive)
+)
+
+async def archivable(companies: List[dict], cutoff: datetime) -> List[dict]:
+    """The discarded companies, and the apta ones whose incorporation was
+    completed before `cutoff`"""
+    apta = [company["id"] for company in companies if company["status"] == "apta"]
+    completed = set()
+    if apta:
+        projects = await repos.projects.list({"company_id": {"$in": apta}, "incorporation_status": "completada"})
+        # Projects completed before completed_at existed fall back to created_at
+        completed = {p["company_id"] for p in projects if as_datetime(p.get("completed_at") or p["created_at"]) < cutoff}
+    return [company for company in companies if company["status"] == "descartada" or company["id"] in completed]
+
+async def archive_companies(
+    older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 500, dry_run: bool = False, progress=None
+) -> int:
+    """Move companies untouched for `older_than_days` out of the hot
+    collections, oldest first; returns how many were (or, with `dry_run`,
+    would be) archived"""
+    cutoff = utcnow() - timedelta(days=older_than_days)
+    query = {"status": {"$in": ["descartada", "apta"]}, "updated_at": {"$lt": cutoff}}
+    cursor = None
+    archived = 0
+    while True:
+        page = await repos.companies.list(
+            and_filters(query, keyset_filter("updated_at", 1, cursor)) if cursor else query,
+            sort=[("updated_at", 1), ("id", 1)],
+            limit=batch_size
+        )
+        eligible = await archivable(page, cutoff)
+        if dry_run:
+            archived += len(eligible)
+        elif eligible:
+            # A company edited since it was read no longer matches the guard
+            moved = await archiver.archive(eligible, utcnow(), guard={"updated_at": {"$lt": cutoff}})
+            for company_id in moved:
+                similarity.remove(company_id)
+            archived += len(moved)
+        if progress:
+            progress(archived)
+        if len(page) < batch_size:
+            return archived
+        cursor = encode_cursor([page[-1]["updated_at"], page[-1]["id"]])
+
+async def restore_archived(entry: dict, current_user: dict) -> dict:
+    """Bring an archived company back; returns the restored company"""
+    bundle = await archiver.load(entry)
+    company = bundle["company"]
+    if await repos.companies.get({"nif": company["nif"], "id": {"$ne": company["id"]}}):
+        raise HTTPException(status_code=409, detail="Ya existe una empresa activa con este NIF")
+    # The owner may have left or been renamed while the company was archived
+    owner = await repos.users.get({"id": company["owner_id"], "role": "asesor"}) if company.get("owner_id") else None
+    company.update(owner_fields(owner))
+    for project in bundle.get("projects", []):
+        project["owner_id"] = company["owner_id"]
+    # Fresh updated_at, so the next archive run leaves it alone
+    company["updated_at"] = utcnow()
+    await archiver.restore(bundle)
+    similarity.upsert(company)
+    record_activity("company_restored", current_user, company["id"])
+    return company
+
+# ==================== PROJECT PROGRESS ====================
+async def backfill_checklist_completed() -> int:
+    """Compute checklist_completed server-side for every project"""
+    completed = {"$size": {"$filter": {
+        "input": {"$objectToArray": {"$ifNull": ["$incorporation_checklist", {}]}},
+        "cond": {"$eq": ["$$this.v", True]}
+    }}}
+    # Only the projects whose count changes, all under one change_seq
+    stamp = await change_feed.stamp()
+    result = await db.projects.update_many(
+        {"$expr": {"$ne": [{"$ifNull": ["$checklist_completed", -1]}, completed]}},
+        [{"$set": {"checklist_completed": completed, **{key: {"$literal": value} for key, value in stamp.items()}}}]
+    )
+    return result.modified_count
+
+# ==================== USER SEARCH ====================
+async def backfill_user_name_lower(batch_size: int = 1000) -> int:
+    """Store the folded name used by the user directory prefix search"""
+    from pymongo import UpdateOne
+
+    updated = 0
+    batch = []
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "name": 1}):
+        batch.append(UpdateOne({"id": user["id"]}, {"$set": {"name_lower": fold_text(user.get("name") or "")}}))
+        if len(batch) >= batch_size:
+            updated += (await db.users.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        updated += (await db.users.bulk_write(batch, ordered=False)).modified_count
+    return updated
+
+# ==================== TIMESTAMP MIGRATION ====================
+TIMESTAMP_FIELDS = {
+    "users": ["created_at"],
+    "companies": ["created_at", "updated_at"],
+    "diagnostics": ["created_at", "decided_at"],
+    "client_intakes": ["created_at", "updated_at", "submitted_at"],
+    "projects": ["created_at", "completed_at"],
+    "activity_log": ["ts"]
+}
+
+async def migrate_timestamps(batch_size: int = 1000, progress=None) -> Dict[str, int]:
+    """Convert ISO string timestamps to BSON dates, batch by batch.
+
+    Idempotent: only documents that still hold a string in one of the fields
+    are touched, so the migration can be interrupted and re-run.
+    """
+    converted = {}
+    for name, fields in TIMESTAMP_FIELDS.items():
+        # Raw collection: this works on _id directly, whatever the id storage mode
+        collection = db.raw[name]
+        pending = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        convert = [{"$set": {
+            field: {"$cond": [
+                {"$eq": [{"$type": f"${field}"}, "string"]},
+                {"$dateFromString": {"dateString": f"${field}"}},
+                f"${field}"
+            ]}
+            for field in fields
+        }}]
+        converted[name] = 0
+        while True:
+            ids = [d["_id"] for d in await collection.find(pending, {"_id": 1}).limit(batch_size).to_list(batch_size)]
+            if not ids:
+                break
+            result = await collection.update_many({"_id": {"$in": ids}}, convert)
+            converted[name] += result.modified_count
+            if progress:
+                progress(name, converted[name])
+    return converted
+
 # ==================== AUTH ROUTES ====================
 @api_router.post("/auth/login", response_model=LoginResponse)
 async def login(request: LoginRequest):
-    user = await db.users.find_one({"email": {"$regex": f"^{re.escape(request.email)}$", "$options": "i"}}, {"_id": 0})
+    user = await repos.users.get({"email": request.email})
     if not user:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
     
@@ -272,7 +1671,7 @@ async def create_user(
     user_data: UserCreate,
     current_user: dict = Depends(require_role(["admin"]))
 ):
-    existing = await db.users.find_one({"email": {"$regex": f"^{re.escape(user_data.email)}$", "$options": "i"}})
+    existing = await repos.users.get({"email": user_data.email})
     if existing:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
@@ -284,13 +1683,15 @@ async def create_user(
         "id": user_id,
         "email": user_data.email.lower(),
         "name": user_data.name,
+        "name_lower": fold_text(user_data.name),
         "password": hash_password(user_data.password),
         "role": user_data.role,
         "company_id": user_data.company_id,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
-    await db.users.insert_one(user_doc)
+    await repos.users.insert(user_doc)
+    record_activity("user_created", current_user, user_doc["company_id"], user_id=user_id, email=user_doc["email"], role=user_doc["role"])
     
     return UserResponse(
         id=user_doc["id"],
@@ -302,19 +1703,42 @@ async def create_user(
     )
 
 @api_router.get("/users", response_model=List[UserResponse])
-async def list_users(current_user: dict = Depends(require_role(["admin"]))):
-    users = await db.users.find({}, {"_id": 0, "password": 0}).to_list(1000)
-    return [
-        UserResponse(
-            id=u["id"],
-            email=u["email"],
-            name=u["name"],
-            role=u.get("role"),
-            company_id=u.get("company_id"),
-            created_at=u["created_at"]
-        )
-        for u in users
-    ]
+async def list_users(
+    response: Response,
+    role: Optional[Literal["admin", "asesor", "cliente", "sin_rol"]] = Query(None),
+    company_id: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="Prefijo de nombre o email"),
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    query = {}
+    if role:
+        query["role"] = None if role == "sin_rol" else role
+    if company_id:
+        query["company_id"] = company_id
+    if q and q.strip():
+        # Anchored prefixes on stored lowercase values so both branches use an index
+        query["$or"] = [
+            {"email": {"$regex": f"^{re.escape(q.strip().lower())}"}},
+            {"name_lower": {"$regex": f"^{re.escape(fold_text(q.strip()))}"}}
+        ]
+    
+    page_query = and_filters(query, keyset_filter("created_at", -1, cursor)) if cursor else query
+    users, total = await asyncio.gather(
+        repos.users.list(page_query, sort=[("created_at", -1), ("id", -1)], limit=limit, exclude=["password"]),
+        repos.users.count(query)
+    )
+    # Company name for the admin table, resolved for this page only
+    company_ids = sorted({user["company_id"] for user in users if user.get("company_id")})
+    companies = await repos.companies.list({"id": {"$in": company_ids}}) if company_ids else []
+    names = {company["id"]: company["name"] for company in companies}
+    for user in users:
+        user["company_name"] = names.get(user.get("company_id"))
+    
+    response.headers["X-Total-Count"] = str(total)
+    set_next_cursor(response, users, limit, "created_at")
+    return [UserResponse(**u) for u in users]
 
 @api_router.put("/users/{user_id}", response_model=UserResponse)
 async def update_user(
@@ -322,13 +1746,14 @@ async def update_user(
     user_data: UserUpdate,
     current_user: dict = Depends(require_role(["admin"]))
 ):
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await repos.users.get({"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     update_data = {}
     if user_data.name:
         update_data["name"] = user_data.name
+        update_data["name_lower"] = fold_text(user_data.name)
     if user_data.role is not None:
         if user_data.role and user_data.role not in ["admin", "asesor", "cliente"]:
             raise HTTPException(status_code=400, detail="Rol inválido")
@@ -336,10 +1761,12 @@ async def update_user(
     if user_data.company_id is not None:
         update_data["company_id"] = user_data.company_id
     
-    if update_data:
-        await db.users.update_one({"id": user_id}, {"$set": update_data})
-    
-    updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    updated_user = await repos.users.update({"id": user_id}, update_data, exclude=["password"]) if update_data else user
+    # Owned companies follow the asesor: renamed, or unassigned when they stop being one
+    if user.get("role") == "asesor" and updated_user.get("role") != "asesor":
+        await reassign_companies({"owner_id": user_id}, None)
+    elif "name" in update_data and updated_user.get("role") == "asesor":
+        await repos.companies.update_many({"owner_id": user_id}, {"owner_name": updated_user["name"]})
     return UserResponse(
         id=updated_user["id"],
         email=updated_user["email"],
@@ -357,9 +1784,10 @@ async def delete_user(
     if current_user["id"] == user_id:
         raise HTTPException(status_code=400, detail="No puedes eliminar tu propia cuenta")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    if not await repos.users.delete({"id": user_id}):
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    # Their companies go back to the unassigned queue
+    await reassign_companies({"owner_id": user_id}, None)
     
     return {"message": "Usuario eliminado correctamente"}
 
@@ -374,7 +1802,7 @@ async def change_user_password(
     if current_user["id"] != user_id and current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="No autorizado para cambiar esta contraseña")
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await repos.users.get({"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
@@ -384,7 +1812,7 @@ async def change_user_password(
             raise HTTPException(status_code=400, detail="La contraseña actual es incorrecta")
     else:
         # Admin changing another user's password - verify admin's own password
-        admin_user = await db.users.find_one({"id": current_user["id"]}, {"_id": 0})
+        admin_user = await repos.users.get({"id": current_user["id"]})
         if not verify_password(password_data.current_password, admin_user["password"]):
             raise HTTPException(status_code=400, detail="Tu contraseña de admin es incorrecta")
     
@@ -393,10 +1821,7 @@ async def change_user_password(
         raise HTTPException(status_code=400, detail="La nueva contraseña debe tener al menos 6 caracteres")
     
     # Update password
-    await db.users.update_one(
-        {"id": user_id},
-        {"$set": {"password": hash_password(password_data.new_password)}}
-    )
+    await repos.users.update({"id": user_id}, {"password": hash_password(password_data.new_password)})
     
     return {"message": "Contraseña actualizada correctamente"}
 
@@ -407,12 +1832,16 @@ async def create_company(
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
     # Check NIF unique
-    existing = await db.companies.find_one({"nif": company_data.nif})
+    existing = await repos.companies.get({"nif": company_data.nif})
     if existing:
         raise HTTPException(status_code=400, detail="Ya existe una empresa con este NIF")
     
+    if current_user.get("role") == "asesor":
+        owner = current_user
+    else:
+        owner = await find_advisor(company_data.owner_id) if company_data.owner_id else None
     company_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
+    now = utcnow()
     
     company_doc = {
         "id": company_id,
@@ -425,13 +1854,14 @@ async def create_company(
         "contact_name": company_data.contact_name,
         "contact_role": company_data.contact_role,
         "contact_phone": company_data.contact_phone,
-        "status": "lead",
-        "intake_status": "pendiente",
+        **INITIAL_COMPANY_STATE,
+        **owner_fields(owner),
         "created_at": now,
         "updated_at": now
     }
     
-    await db.companies.insert_one(company_doc)
+    await repos.companies.insert(company_doc)
+    similarity.upsert(company_doc)
     
     # Create initial diagnostic
     diagnostic_doc = {
@@ -447,39 +1877,79 @@ async def create_company(
         "decided_at": None,
         "created_at": now
     }
-    await db.diagnostics.insert_one(diagnostic_doc)
+    await repos.diagnostics.insert(diagnostic_doc)
+    await bump_funnel(funnel_day(now), {"created": 1})
+    record_activity("company_created", current_user, company_id, name=company_doc["name"], nif=company_doc["nif"])
     
-    return CompanyResponse(**{k: v for k, v in company_doc.items() if k != "_id"})
+    return CompanyResponse(**company_doc)
 
-@api_router.get("/companies", response_model=List[CompanyResponse])
+@api_router.get("/companies", response_model=Union[List[CompanyResponse], CompanyFacetedResponse])
 async def list_companies(
+    response: Response,
     status: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+    data_types: Optional[List[str]] = Query(None),
+    main_interests: Optional[List[str]] = Query(None),
+    data_usage: Optional[List[str]] = Query(None),
+    data_sensitivity: Optional[List[str]] = Query(None),
+    include_facets: bool = Query(False),
+    sort: Literal["recent", "score"] = Query("recent"),
+    owner: Optional[str] = Query(None, description='"me", "none" (sin asignar) o id de asesor'),
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
+    """Newest first (or highest eligibility score first, scored companies
+    only), keyset-paginated: pass X-Next-Cursor back as `cursor`. Asesores
+    only list their own companies or, with owner=none, the unassigned ones"""
     # Cliente only sees their company
     if current_user.get("role") == "cliente":
         if not current_user.get("company_id"):
             return []
-        company = await db.companies.find_one({"id": current_user["company_id"]}, {"_id": 0})
+        company = await repos.companies.get({"id": current_user["company_id"]})
         return [CompanyResponse(**company)] if company else []
     
-    # Asesor/Admin see all
     if current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    query = {}
-    if status:
-        query["status"] = status
-    if search:
+    query = owner_scope(current_user, owner)
+    # Every company is in one of OWNER_STATUSES: naming them all keeps status
+    # an equality prefix, so the ([owner_id,] status, sort, id) compounds
+    # serve the unfiltered list too (one merged keyset scan per status)
+    query["status"] = status or {"$in": OWNER_STATUSES}
+    if search and search.strip():
+        pattern = re.escape(search.strip())
         query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"nif": {"$regex": search, "$options": "i"}},
-            {"contact_name": {"$regex": search, "$options": "i"}}
+            {"name": {"$regex": pattern, "$options": "i"}},
+            {"nif": {"$regex": pattern, "$options": "i"}},
+            {"contact_name": {"$regex": pattern, "$options": "i"}}
         ]
     
-    companies = await db.companies.find(query, {"_id": 0}).to_list(1000)
-    return [CompanyResponse(**c) for c in companies]
+    # Intake facets: any of the given values within a facet, all facets combined
+    facet_filters = {
+        "data_types": data_types,
+        "main_interests": main_interests,
+        "data_usage": data_usage,
+        "data_sensitivity": data_sensitivity
+    }
+    for field, values in facet_filters.items():
+        if values:
+            query[f"intake_facets.{field}"] = {"$in": values}
+    
+    sort_field = "eligibility_score" if sort == "score" else "created_at"
+    if sort == "score":
+        query["eligibility_score"] = {"$exists": True}
+    page_query = and_filters(query, keyset_filter(sort_field, -1, cursor)) if cursor else query
+    page = repos.companies.list(page_query, sort=[(sort_field, -1), ("id", -1)], limit=limit)
+    if include_facets:
+        companies, total, facets = await asyncio.gather(page, repos.companies.count(query), count_intake_facets(query))
+    else:
+        companies, total = await asyncio.gather(page, repos.companies.count(query))
+    
+    response.headers["X-Total-Count"] = str(total)
+    set_next_cursor(response, companies, limit, sort_field)
+    items = [CompanyResponse(**c) for c in companies]
+    return CompanyFacetedResponse(items=items, facets=facets) if include_facets else items
 
 @api_router.get("/companies/{company_id}", response_model=CompanyResponse)
 async def get_company(
@@ -493,7 +1963,7 @@ async def get_company(
     elif current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
+    company = await repos.companies.get({"id": company_id})
     if not company:
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
     
@@ -505,17 +1975,14 @@ async def update_company(
     company_data: CompanyUpdate,
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
-    if not company:
-        raise HTTPException(status_code=404, detail="Empresa no encontrada")
-    
     update_data = {k: v for k, v in company_data.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update_data["updated_at"] = utcnow()
     
-    if update_data:
-        await db.companies.update_one({"id": company_id}, {"$set": update_data})
-    
-    updated = await db.companies.find_one({"id": company_id}, {"_id": 0})
+    updated = await repos.companies.update({"id": company_id}, update_data)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Empresa no encontrada")
+    similarity.upsert(updated)
+    record_activity("company_updated", current_user, company_id, fields=sorted(k for k in update_data if k != "updated_at"))
     return CompanyResponse(**updated)
 
 @api_router.delete("/companies/{company_id}")
@@ -523,18 +1990,116 @@ async def delete_company(
     company_id: str,
     current_user: dict = Depends(require_role(["admin"]))
 ):
-    company = await db.companies.find_one({"id": company_id})
+    company = await repos.companies.get({"id": company_id})
     if not company:
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
     
     # Delete related data
-    await db.diagnostics.delete_many({"company_id": company_id})
-    await db.projects.delete_many({"company_id": company_id})
-    await db.client_intakes.delete_many({"company_id": company_id})
-    await db.companies.delete_one({"id": company_id})
+    await repos.diagnostics.delete({"company_id": company_id})
+    await repos.projects.delete({"company_id": company_id})
+    await repos.intakes.delete({"company_id": company_id})
+    await repos.companies.delete({"id": company_id})
+    similarity.remove(company_id)
     
     return {"message": "Empresa eliminada correctamente"}
 
+@api_router.put("/companies/{company_id}/owner", response_model=CompanyResponse)
+async def assign_company(
+    company_id: str,
+    assignment: CompanyAssignment,
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Admins assign any company to any asesor (or unassign it); an asesor
+    can only take an unassigned company for themselves"""
+    if current_user.get("role") == "asesor":
+        if assignment.owner_id != current_user["id"]:
+            raise HTTPException(status_code=403, detail="Solo puedes asignarte empresas a ti mismo")
+        advisor = current_user
+        match = {"id": company_id, "owner_id": None}
+    else:
+        advisor = await find_advisor(assignment.owner_id) if assignment.owner_id else None
+        match = {"id": company_id}
+    
+    updated = await repos.companies.update(match, {**owner_fields(advisor), "updated_at": utcnow()})
+    if not updated:
+        if not await repos.companies.get({"id": company_id}):
+            raise HTTPException(status_code=404, detail="Empresa no encontrada")
+        raise HTTPException(status_code=409, detail="La empresa ya tiene un asesor asignado")
+    await move_projects([company_id], updated["owner_id"])
+    record_activity("company_assigned", current_user, company_id, owner_id=updated["owner_id"])
+    return CompanyResponse(**updated)
+
+@api_router.post("/companies/{company_id}/transitions/{name}", response_model=TransitionResponse)
+async def apply_transition(
+    company_id: str,
+    name: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Apply any lifecycle transition by name (see COMPANY LIFECYCLE)"""
+    transition = lifecycle.get(name)
+    if transition is None:
+        raise HTTPException(status_code=404, detail="Transición no encontrada")
+    role = current_user.get("role")
+    if role not in transition.roles or (role == "cliente" and current_user.get("company_id") != company_id):
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    applied = await run_transition(name, company_id, current_user)
+    return TransitionResponse(
+        transition=name,
+        entity=transition.entity,
+        field=transition.field,
+        state=transition.target,
+        company=CompanyResponse(**applied.company) if applied.company else None
+    )
+
+@api_router.get("/companies/{company_id}/similar", response_model=SimilarCompaniesResponse)
+async def similar_companies(
+    company_id: str,
+    k: int = Query(10, ge=1, le=50),
+    status: List[Literal["lead", "apta", "descartada"]] = Query(["apta"]),
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Most similar companies by sector, size and intake answers, and the data
+    spaces their projects join, ranked by the summed similarity of the peers"""
+    company = await repos.companies.get({"id": company_id})
+    if not company:
+        raise HTTPException(status_code=404, detail="Empresa no encontrada")
+    if company_id not in similarity.rows:
+        similarity.upsert(company)
+    
+    neighbours = similarity.similar(company, k, status)
+    ids = [neighbour_id for neighbour_id, _ in neighbours]
+    companies = {c["id"]: c for c in await repos.companies.list({"id": {"$in": ids}})}
+    projects = {p["company_id"]: p for p in await repos.projects.list({"company_id": {"$in": ids}})}
+    
+    items: List[SimilarCompany] = []
+    spaces: Dict[str, dict] = {}
+    for neighbour_id, score in neighbours:
+        # Deleted through another worker since the last rebuild
+        if neighbour_id not in companies:
+            continue
+        project = projects.get(neighbour_id) or {}
+        items.append(SimilarCompany(
+            company=CompanyResponse(**companies[neighbour_id]),
+            similarity=round(score, 4),
+            space_id=project.get("space_id"),
+            space_name=project.get("space_name"),
+            target_role=project.get("target_role"),
+            incorporation_status=project.get("incorporation_status")
+        ))
+        if project.get("space_id"):
+            space = spaces.setdefault(project["space_id"], {
+                "space_id": project["space_id"], "space_name": project.get("space_name"), "score": 0.0, "companies": 0
+            })
+            space["score"] += score
+            space["companies"] += 1
+    
+    ranked = sorted(spaces.values(), key=lambda space: space["score"], reverse=True)
+    return SimilarCompaniesResponse(
+        items=items,
+        spaces=[SpaceRecommendation(**{**space, "score": round(space["score"], 4)}) for space in ranked]
+    )
+
 # ==================== CLIENT INTAKE ROUTES ====================
 @api_router.get("/companies/{company_id}/intake", response_model=Optional[ClientIntakeResponse])
 async def get_client_intake(
@@ -548,7 +2113,7 @@ async def get_client_intake(
     elif current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    intake = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
+    intake = await repos.intakes.get({"company_id": company_id})
     if not intake:
         return None
     
@@ -568,18 +2133,18 @@ async def create_or_update_intake(
         raise HTTPException(status_code=403, detail="No autorizado")
     
     # Check company exists and is in lead status
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
+    company = await repos.companies.get({"id": company_id})
     if not company:
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
     
     # Check if intake already exists and is submitted
-    existing = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
+    existing = await repos.intakes.get({"company_id": company_id})
     if existing and existing.get("submitted"):
         # Only admin/asesor can update submitted intake
         if current_user.get("role") == "cliente":
             raise HTTPException(status_code=400, detail="El cuestionario ya ha sido enviado y no puede modificarse")
     
-    now = datetime.now(timezone.utc).isoformat()
+    now = utcnow()
     
     if existing:
         # Update existing
@@ -591,8 +2156,11 @@ async def create_or_update_intake(
             "notes": intake_data.notes,
             "updated_at": now
         }
-        await db.client_intakes.update_one({"company_id": company_id}, {"$set": update_data})
-        updated = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
+        updated = await repos.intakes.update({"company_id": company_id}, update_data)
+        similarity.upsert(await repos.companies.update({"id": company_id}, {"intake_facets": intake_facets(update_data)}))
+        if updated.get("submitted"):
+            await score_intake(company_id, updated)
+        record_activity("intake_saved", current_user, company_id)
         return ClientIntakeResponse(**updated)
     else:
         # Create new
@@ -609,7 +2177,9 @@ async def create_or_update_intake(
             "created_at": now,
             "updated_at": now
         }
-        await db.client_intakes.insert_one(intake_doc)
+        await repos.intakes.insert(intake_doc)
+        similarity.upsert(await repos.companies.update({"id": company_id}, {"intake_facets": intake_facets(intake_doc)}))
+        record_activity("intake_saved", current_user, company_id)
         return ClientIntakeResponse(**intake_doc)
 
 @api_router.post("/companies/{company_id}/intake/submit", response_model=ClientIntakeResponse)
@@ -624,29 +2194,8 @@ async def submit_intake(
     elif current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    intake = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
-    if not intake:
-        raise HTTPException(status_code=404, detail="Debe completar el cuestionario antes de enviarlo")
-    
-    if intake.get("submitted"):
-        raise HTTPException(status_code=400, detail="El cuestionario ya ha sido enviado")
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
-    # Mark as submitted
-    await db.client_intakes.update_one(
-        {"company_id": company_id},
-        {"$set": {"submitted": True, "submitted_at": now, "updated_at": now}}
-    )
-    
-    # Update company intake_status
-    await db.companies.update_one(
-        {"id": company_id},
-        {"$set": {"intake_status": "recibida", "updated_at": now}}
-    )
-    
-    updated = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
-    return ClientIntakeResponse(**updated)
+    applied = await run_transition("submit_intake", company_id, current_user, conflict_status=400)
+    return ClientIntakeResponse(**applied.document)
 
 @api_router.post("/companies/{company_id}/intake/reset")
 async def reset_intake(
@@ -654,22 +2203,7 @@ async def reset_intake(
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
     """Allow asesor/admin to reset intake so client can edit again"""
-    intake = await db.client_intakes.find_one({"company_id": company_id}, {"_id": 0})
-    if not intake:
-        raise HTTPException(status_code=404, detail="No hay cuestionario para esta empresa")
-    
-    now = datetime.now(timezone.utc).isoformat()
-    
-    await db.client_intakes.update_one(
-        {"company_id": company_id},
-        {"$set": {"submitted": False, "submitted_at": None, "updated_at": now}}
-    )
-    
-    await db.companies.update_one(
-        {"id": company_id},
-        {"$set": {"intake_status": "pendiente", "updated_at": now}}
-    )
-    
+    await run_transition("reset_intake", company_id, current_user, conflict_status=400)
     return {"message": "Cuestionario reabierto para edición"}
 
 # Create client user for company
@@ -685,17 +2219,17 @@ async def create_company_user(
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
     # Check company exists
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
+    company = await repos.companies.get({"id": company_id})
     if not company:
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
     
     # Check if email already exists
-    existing = await db.users.find_one({"email": {"$regex": f"^{re.escape(user_data.email)}$", "$options": "i"}})
+    existing = await repos.users.get({"email": user_data.email})
     if existing:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
     # Check if company already has a user
-    existing_company_user = await db.users.find_one({"company_id": company_id})
+    existing_company_user = await repos.users.get({"company_id": company_id})
     if existing_company_user:
         raise HTTPException(status_code=400, detail="Esta empresa ya tiene un usuario asignado")
     
@@ -704,13 +2238,15 @@ async def create_company_user(
         "id": user_id,
         "email": user_data.email.lower(),
         "name": user_data.name,
+        "name_lower": fold_text(user_data.name),
         "password": hash_password(user_data.password),
         "role": "cliente",
         "company_id": company_id,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
-    await db.users.insert_one(user_doc)
+    await repos.users.insert(user_doc)
+    record_activity("user_created", current_user, company_id, user_id=user_id, email=user_doc["email"], role="cliente")
     
     return UserResponse(
         id=user_doc["id"],
@@ -726,7 +2262,7 @@ async def get_company_user(
     company_id: str,
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
-    user = await db.users.find_one({"company_id": company_id, "role": "cliente"}, {"_id": 0, "password": 0})
+    user = await repos.users.get({"company_id": company_id, "role": "cliente"}, exclude=["password"])
     if not user:
         return None
     
@@ -739,6 +2275,28 @@ async def get_company_user(
         created_at=user["created_at"]
     )
 
+# ==================== ACTIVITY ROUTES ====================
+@api_router.get("/companies/{company_id}/activity", response_model=List[ActivityResponse])
+async def get_company_activity(
+    company_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None),
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Company timeline, newest first. Pass the last `ts` as `before` to page back"""
+    query = {"company_id": company_id}
+    if before:
+        query["ts"] = {"$lt": as_datetime(before)}
+    
+    events = await repos.activity.list(query, sort=[("ts", -1)], limit=limit)
+    return [ActivityResponse(**e) for e in events]
+
+@api_router.get("/admin/activity/status")
+async def activity_log_status(current_user: dict = Depends(require_role(["admin"]))):
+    """Write-behind counters: events queued, written, dropped (queue full)
+    and lost (writes that kept failing)"""
+    return audit_log.status()
+
 # ==================== DIAGNOSTIC ROUTES ====================
 @api_router.get("/companies/{company_id}/diagnostic", response_model=DiagnosticResponse)
 async def get_diagnostic(
@@ -752,7 +2310,7 @@ async def get_diagnostic(
     elif current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    diagnostic = await db.diagnostics.find_one({"company_id": company_id}, {"_id": 0})
+    diagnostic = await repos.diagnostics.get({"company_id": company_id})
     if not diagnostic:
         raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
     
@@ -764,7 +2322,7 @@ async def update_diagnostic(
     diagnostic_data: DiagnosticUpdate,
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
-    diagnostic = await db.diagnostics.find_one({"company_id": company_id}, {"_id": 0})
+    diagnostic = await repos.diagnostics.get({"company_id": company_id})
     if not diagnostic:
         raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
     
@@ -774,10 +2332,12 @@ async def update_diagnostic(
     
     update_data = {k: v for k, v in diagnostic_data.model_dump().items() if v is not None}
     
+    updated = diagnostic
     if update_data:
-        await db.diagnostics.update_one({"company_id": company_id}, {"$set": update_data})
+        # From now on the fields are the advisor's; re-scoring won't touch them
+        updated = await repos.diagnostics.update({"company_id": company_id}, {**update_data, "prefilled": False})
+        record_activity("diagnostic_updated", current_user, company_id, changes=update_data)
     
-    updated = await db.diagnostics.find_one({"company_id": company_id}, {"_id": 0})
     return DiagnosticResponse(**updated)
 
 @api_router.post("/companies/{company_id}/diagnostic/decide", response_model=DiagnosticResponse)
@@ -786,65 +2346,156 @@ async def decide_diagnostic(
     decision: DiagnosticDecision,
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
-    diagnostic = await db.diagnostics.find_one({"company_id": company_id}, {"_id": 0})
-    if not diagnostic:
-        raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
-    
-    if diagnostic["result"] != "pendiente":
-        raise HTTPException(status_code=400, detail="El diagnóstico ya ha sido decidido")
-    
-    company = await db.companies.find_one({"id": company_id}, {"_id": 0})
-    if not company:
-        raise HTTPException(status_code=404, detail="Empresa no encontrada")
+    transition = "approve" if decision.result == "apta" else "reject"
+    applied = await run_transition(transition, company_id, current_user, conflict_status=400)
     
-    now = datetime.now(timezone.utc).isoformat()
-    
-    # Update diagnostic
-    await db.diagnostics.update_one(
-        {"company_id": company_id},
-        {"$set": {
-            "result": decision.result,
-            "decided_by_user_id": current_user["id"],
-            "decided_at": now
-        }}
+    return DiagnosticResponse(**applied.document)
+
+@api_router.get("/advisors/workload", response_model=WorkloadResponse)
+async def advisor_workload(current_user: dict = Depends(require_role(["admin"]))):
+    """Companies per asesor and status, to balance assignments"""
+    advisors = await repos.users.list({"role": "asesor"}, sort=[("name_lower", 1)], exclude=["password"])
+    *counts, unassigned = await asyncio.gather(
+        *(count_by_status(advisor["id"]) for advisor in advisors), count_by_status(None)
     )
-    
-    # Update company status
-    new_status = "apta" if decision.result == "apta" else "descartada"
-    await db.companies.update_one(
-        {"id": company_id},
-        {"$set": {"status": new_status, "updated_at": now}}
+    rows = [
+        AdvisorWorkload(id=advisor["id"], name=advisor["name"], email=advisor["email"], **count)
+        for advisor, count in zip(advisors, counts)
+    ]
+    rows.sort(key=lambda row: (row.lead, row.total))
+    return WorkloadResponse(advisors=rows, unassigned=unassigned)
+
+@api_router.post("/advisors/{user_id}/reassign")
+async def reassign_advisor_companies(
+    user_id: str,
+    reassignment: CompanyReassignment,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Move an asesor's companies (optionally only those in one status) to
+    another asesor, or back to the unassigned queue"""
+    if reassignment.to_owner_id == user_id:
+        raise HTTPException(status_code=400, detail="El asesor de destino es el mismo")
+    advisor = await find_advisor(reassignment.to_owner_id) if reassignment.to_owner_id else None
+    match = {"owner_id": user_id}
+    if reassignment.status:
+        match["status"] = reassignment.status
+    moved = await reassign_companies(match, advisor)
+    record_activity(
+        "companies_reassigned", current_user, from_owner_id=user_id, to_owner_id=reassignment.to_owner_id, moved=moved
     )
-    
-    # If APTA, create project
-    project_created = None
-    if decision.result == "apta":
-        project_doc = {
-            "id": str(uuid.uuid4()),
-            "company_id": company_id,
-            "title": f"Incorporación - {company['name']}",
-            "phase": 2,
-            "status": "iniciado",
-            "target_role": None,
-            "space_name": None,
-            "use_case": None,
-            "rgpd_checked": False,
-            "incorporation_status": "pendiente",
-            "incorporation_checklist": {
-                "espacio_seleccionado": False,
-                "rol_definido": False,
-                "caso_uso_definido": False,
-                "validacion_rgpd": False
-            },
-            "created_at": now
-        }
-        await db.projects.insert_one(project_doc)
-        project_created = project_doc["id"]
-    
-    updated = await db.diagnostics.find_one({"company_id": company_id}, {"_id": 0})
-    response = DiagnosticResponse(**updated)
-    
-    return response
+    return {"moved": moved}
+
+@api_router.get("/admin/outbox")
+async def outbox_status(current_user: dict = Depends(require_role(["admin"]))):
+    """Entries per status and the latest permanent failures"""
+    counts = {status: await repos.outbox.count({"status": status}) for status in (PENDING, SENDING, SENT, FAILED)}
+    failed = await repos.outbox.list(
+        {"status": FAILED}, sort=[("created_at", -1)], limit=20, exclude=["body", "recipients"]
+    )
+    return {"channels": notifier.channels, "counts": counts, "failed": failed}
+
+@api_router.post("/admin/outbox/retry")
+async def retry_outbox(current_user: dict = Depends(require_role(["admin"]))):
+    """Requeue every failed notification"""
+    requeued = await repos.outbox.update_many(
+        {"status": FAILED}, {"status": PENDING, "attempts": 0, "next_attempt_at": utcnow()}
+    )
+    notifier.wake()
+    record_activity("outbox_requeued", current_user, requeued=requeued)
+    return {"requeued": requeued}
+
+@api_router.get("/admin/scoring/rules")
+async def get_scoring_rules(current_user: dict = Depends(require_role(["admin"]))):
+    return {"version": scorer.version, "rules": scorer.rules}
+
+@api_router.post("/admin/scoring/rescore")
+async def rescore_leads(
+    force: bool = Query(False, description="Re-puntuar también los ya puntuados con las reglas actuales"),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Re-score pending leads after a rules change"""
+    scored = await rescore_pending_leads(stale_only=not force)
+    record_activity("leads_rescored", current_user, scored=scored, version=scorer.version)
+    return {"scored": scored, "version": scorer.version}
+
+# ==================== CHANGE FEED ROUTES ====================
+@api_router.get("/changes", response_model=ChangesPage)
+async def list_changes(
+    since: Optional[str] = Query(None, description="Cursor de la respuesta anterior; vacío para empezar desde el principio"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Companies and projects created, updated or deleted after `since`, in
+    change order; each changed entity appears once with its current state.
+    A client syncs by calling again with the returned cursor (immediately
+    while has_more, then on its own schedule)"""
+    try:
+        position = Position.decode(since) if since else Position()
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    try:
+        changes, position, has_more = await change_feed.read(
+            {"company": repos.companies, "project": repos.projects}, position, limit
+        )
+    except CursorExpired:
+        raise HTTPException(
+            status_code=410,
+            detail=f"El cursor tiene más de {CHANGE_RETENTION_DAYS} días; sincroniza de nuevo desde el principio"
+        )
+    items = []
+    for change in changes:
+        data = None
+        if change.document is not None:
+            data = CompanyResponse(**change.document) if change.entity == "company" else build_project_response(change.document)
+        items.append(ChangeEntry(
+            entity=change.entity, op=change.op, id=change.id, seq=change.seq, changed_at=change.changed_at, data=data
+        ))
+    return ChangesPage(items=items, cursor=position.encode(), has_more=has_more)
+
+# ==================== ARCHIVE ROUTES ====================
+@api_router.get("/archive/companies", response_model=List[ArchivedCompanyResponse])
+async def list_archived_companies(
+    response: Response,
+    search: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    owner: Optional[str] = Query(None, description='"me", "none" (sin asignar) o id de asesor'),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Archived companies, most recently archived first, keyset-paginated
+    like GET /companies; only the archive entries are read, never the
+    bundles"""
+    query = owner_scope(current_user, owner)
+    if status:
+        query["status"] = status
+    if search and search.strip():
+        pattern = re.escape(search.strip())
+        query["$or"] = [
+            {"name": {"$regex": pattern, "$options": "i"}},
+            {"nif": {"$regex": pattern, "$options": "i"}}
+        ]
+    page_query = and_filters(query, keyset_filter("archived_at", -1, cursor)) if cursor else query
+    entries, total = await asyncio.gather(
+        repos.archive.list(page_query, sort=[("archived_at", -1), ("id", -1)], limit=limit, exclude=["bundle"]),
+        repos.archive.count(query)
+    )
+    response.headers["X-Total-Count"] = str(total)
+    set_next_cursor(response, entries, limit, "archived_at")
+    return [ArchivedCompanyResponse(**entry) for entry in entries]
+
+@api_router.post("/archive/companies/{company_id}/restore", response_model=CompanyResponse)
+async def restore_archived_company(
+    company_id: str,
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Move an archived company, with its diagnostic, intake and project,
+    back to the hot collections. Asesores restore their own companies"""
+    entry = await repos.archive.get({**owner_scope(current_user, None), "id": company_id})
+    if not entry:
+        raise HTTPException(status_code=404, detail="Empresa archivada no encontrada")
+    company = await restore_archived(entry, current_user)
+    return CompanyResponse(**company)
 
 # ==================== PROJECT ROUTES ====================
 def build_project_response(project: dict) -> ProjectResponse:
@@ -857,6 +2508,7 @@ def build_project_response(project: dict) -> ProjectResponse:
         phase=project["phase"],
         status=project["status"],
         target_role=project.get("target_role"),
+        space_id=project.get("space_id"),
         space_name=project.get("space_name"),
         use_case=project.get("use_case"),
         rgpd_checked=project.get("rgpd_checked", False),
@@ -867,12 +2519,32 @@ def build_project_response(project: dict) -> ProjectResponse:
             caso_uso_definido=checklist.get("caso_uso_definido", False),
             validacion_rgpd=checklist.get("validacion_rgpd", False)
         ),
+        checklist_completed=project.get("checklist_completed", sum(bool(v) for v in checklist.values())),
+        version=project.get("version", 0),
+        owner_id=project.get("owner_id"),
+        completed_at=project.get("completed_at"),
         created_at=project["created_at"]
     )
 
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """Project version from an If-Match header ("3", "W/\"3\"" or *)"""
+    if value is None or value.strip() == "*":
+        return None
+    tag = value.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cabecera If-Match inválida")
+
+def set_project_etag(response: Response, project: dict) -> None:
+    response.headers["ETag"] = f'"{project.get("version", 0)}"'
+
 @api_router.get("/companies/{company_id}/project", response_model=Optional[ProjectResponse])
 async def get_company_project(
     company_id: str,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     # Cliente can only access their company project
@@ -882,88 +2554,290 @@ async def get_company_project(
     elif current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    project = await db.projects.find_one({"company_id": company_id}, {"_id": 0})
+    project = await repos.projects.get({"company_id": company_id})
     if not project:
         return None
     
+    set_project_etag(response, project)
     return build_project_response(project)
 
 @api_router.put("/companies/{company_id}/project", response_model=ProjectResponse)
 async def update_company_project(
     company_id: str,
     project_data: ProjectUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: dict = Depends(require_role(["admin", "asesor"]))
 ):
-    project = await db.projects.find_one({"company_id": company_id}, {"_id": 0})
-    if not project:
-        raise HTTPException(status_code=404, detail="Proyecto no encontrado")
-    
-    update_data = {}
-    checklist = project.get("incorporation_checklist", {
-        "espacio_seleccionado": False,
-        "rol_definido": False,
-        "caso_uso_definido": False,
-        "validacion_rgpd": False
-    })
+    """Field-level update in a single conditional write.
+
+    Checklist flags are set individually, so concurrent edits of different
+    fields don't overwrite each other. If-Match adds optimistic concurrency on
+    `version`; completing is only allowed when every flag ends up true, which
+    the filter enforces server-side.
+    """
+    fields = {}
+    flags = {}
     
     # Update fields and auto-update checklist
-    if project_data.space_name is not None:
-        update_data["space_name"] = project_data.space_name
-        checklist["espacio_seleccionado"] = bool(project_data.space_name and project_data.space_name.strip())
+    if project_data.space_id is not None or project_data.space_name is not None:
+        space = await resolve_data_space(project_data.space_id, project_data.space_name)
+        fields["space_id"] = space["id"] if space else None
+        fields["space_name"] = space["name"] if space else None
+        flags["espacio_seleccionado"] = space is not None
     
     if project_data.target_role is not None:
-        update_data["target_role"] = project_data.target_role
-        checklist["rol_definido"] = bool(project_data.target_role)
+        fields["target_role"] = project_data.target_role
+        flags["rol_definido"] = bool(project_data.target_role)
     
     if project_data.use_case is not None:
-        update_data["use_case"] = project_data.use_case
-        checklist["caso_uso_definido"] = bool(project_data.use_case and project_data.use_case.strip())
+        fields["use_case"] = project_data.use_case
+        flags["caso_uso_definido"] = bool(project_data.use_case and project_data.use_case.strip())
     
     if project_data.rgpd_checked is not None:
-        update_data["rgpd_checked"] = project_data.rgpd_checked
-        checklist["validacion_rgpd"] = project_data.rgpd_checked
-    
-    update_data["incorporation_checklist"] = checklist
-    
-    # Handle incorporation status
-    if project_data.incorporation_status is not None:
-        # Can only mark as completed if all checklist items are true
-        if project_data.incorporation_status == "completada":
-            all_checked = all([
-                checklist["espacio_seleccionado"],
-                checklist["rol_definido"],
-                checklist["caso_uso_definido"],
-                checklist["validacion_rgpd"]
-            ])
-            if not all_checked:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Para completar la incorporación faltan pasos del checklist."
-                )
-        update_data["incorporation_status"] = project_data.incorporation_status
-    
-    if update_data:
-        await db.projects.update_one({"company_id": company_id}, {"$set": update_data})
+        fields["rgpd_checked"] = project_data.rgpd_checked
+        flags["validacion_rgpd"] = project_data.rgpd_checked
+    
+    new_status = project_data.incorporation_status
+    completing = new_status == "completada"
+    checklist_error = HTTPException(
+        status_code=400,
+        detail="Para completar la incorporación faltan pasos del checklist."
+    )
+    # Can only mark as completed if all checklist items are true
+    if completing and not all(flags.values()):
+        raise checklist_error
+    
+    query = {"company_id": company_id}
+    expected_version = parse_if_match(if_match)
+    if expected_version is not None:
+        # Projects written before versioning have no field: version 0
+        query["version"] = expected_version if expected_version else {"$in": [0, None]}
+    if completing:
+        # The flags this request doesn't set must already be true
+        for flag in CHECKLIST_FLAGS:
+            if flag not in flags:
+                query[f"incorporation_checklist.{flag}"] = True
+    
+    now = utcnow()
+    # Flags are set one by one so edits of other flags are never reverted
+    changes = {**fields, **{f"incorporation_checklist.{flag}": value for flag, value in flags.items()}}
+    first_completion = None
+    if new_status is not None:
+        changes["incorporation_status"] = new_status
+        if completing:
+            # Recorded in the same write, so the completion can't land without
+            # its notification; only a project not completed yet gets either
+            pending, counts = pending_notification("incorporation_completed", now)
+            first_completion = ({"incorporation_status": {"$ne": "completada"}}, {"completed_at": now, **pending}, counts)
+        else:
+            changes["completed_at"] = None
+    project = await repos.projects.update_computed(
+        query,
+        changes,
+        increments={"version": 1},
+        counts={"checklist_completed": "incorporation_checklist"},
+        guarded=first_completion
+    )
+    if project is None:
+        # Only the failure path pays for a second read, to report why
+        current = await repos.projects.get({"company_id": company_id})
+        if not current:
+            raise HTTPException(status_code=404, detail="Proyecto no encontrado")
+        if expected_version is not None and (current.get("version") or 0) != expected_version:
+            raise HTTPException(status_code=412, detail="El proyecto ha sido modificado por otro usuario. Recarga los datos.")
+        raise checklist_error
+    
+    # Rebuild the stored result from the pre-image and the applied changes
+    was_completed = project.get("incorporation_status") == "completada"
+    updated = copy.deepcopy(project)
+    applied = {**changes, **(first_completion[1] if first_completion and not was_completed else {})}
+    for path, value in applied.items():
+        set_path(updated, path, value)
+    checklist = {**{flag: False for flag in CHECKLIST_FLAGS}, **(updated.get("incorporation_checklist") or {})}
+    updated["incorporation_checklist"] = checklist
+    updated["checklist_completed"] = sum(bool(v) for v in checklist.values())
+    updated["version"] = (project.get("version") or 0) + 1
+    if first_completion and not was_completed:
+        updated[PENDING_COUNT] = (project.get(PENDING_COUNT) or 0) + 1
+    now_completed = updated.get("incorporation_status") == "completada"
+    
+    record_activity(
+        "project_updated",
+        current_user,
+        company_id,
+        changes={k: v for k, v in project_data.model_dump().items() if v is not None},
+        checklist=checklist
+    )
     
-    updated = await db.projects.find_one({"company_id": company_id}, {"_id": 0})
+    # Keep the funnel rollup in step with completion changes
+    if now_completed and not was_completed:
+        await bump_funnel(funnel_day(now), {
+            "completed": 1,
+            "completion_seconds_sum": seconds_between(project["created_at"], now)
+        })
+        await send_pending_notifications("projects", updated)
+    elif was_completed and not now_completed:
+        completed_at = project.get("completed_at") or project["created_at"]
+        await bump_funnel(funnel_day(completed_at), {
+            "completed": -1,
+            "completion_seconds_sum": -seconds_between(project["created_at"], completed_at)
+        })
+    
+    set_project_etag(response, updated)
     return build_project_response(updated)
 
+PROJECT_SORTS = {
+    "created_at": ("created_at", 1),
+    "-created_at": ("created_at", -1),
+    "checklist_completed": ("checklist_completed", 1),
+    "-checklist_completed": ("checklist_completed", -1)
+}
+
 @api_router.get("/projects", response_model=List[ProjectResponse])
 async def list_projects(
+    response: Response,
+    incorporation_status: Optional[Literal["pendiente", "en_progreso", "completada"]] = Query(None),
+    espacio_seleccionado: Optional[bool] = Query(None),
+    rol_definido: Optional[bool] = Query(None),
+    caso_uso_definido: Optional[bool] = Query(None),
+    validacion_rgpd: Optional[bool] = Query(None),
+    target_role: Optional[Literal["participante", "proveedor"]] = Query(None),
+    space_id: Optional[str] = Query(None),
+    space_name: Optional[str] = Query(None),
+    sort: Literal["created_at", "-created_at", "checklist_completed", "-checklist_completed"] = Query("-created_at"),
+    owner: Optional[str] = Query(None, description='"me", "none" (sin asignar) o id de asesor'),
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
     if current_user.get("role") == "cliente":
         if not current_user.get("company_id"):
             return []
-        project = await db.projects.find_one({"company_id": current_user["company_id"]}, {"_id": 0})
+        project = await repos.projects.get({"company_id": current_user["company_id"]})
         return [build_project_response(project)] if project else []
     
     if current_user.get("role") not in ["admin", "asesor"]:
         raise HTTPException(status_code=403, detail="No autorizado")
     
-    projects = await db.projects.find({}, {"_id": 0}).to_list(1000)
+    query = owner_scope(current_user, owner)
+    if incorporation_status:
+        query["incorporation_status"] = incorporation_status
+    checklist_filters = {
+        "espacio_seleccionado": espacio_seleccionado,
+        "rol_definido": rol_definido,
+        "caso_uso_definido": caso_uso_definido,
+        "validacion_rgpd": validacion_rgpd
+    }
+    for flag, value in checklist_filters.items():
+        if value is not None:
+            query[f"incorporation_checklist.{flag}"] = value
+    if target_role:
+        query["target_role"] = target_role
+    if space_id:
+        query["space_id"] = space_id
+    if space_name:
+        query["space_name"] = space_name
+    
+    field, direction = PROJECT_SORTS[sort]
+    if cursor:
+        query = and_filters(query, keyset_filter(field, direction, cursor))
+    
+    projects = await repos.projects.list(query, sort=[(field, direction), ("id", direction)], limit=limit)
+    set_next_cursor(response, projects, limit, field)
     return [build_project_response(p) for p in projects]
 
+# ==================== DATA SPACE ROUTES ====================
+@api_router.get("/data-spaces", response_model=List[DataSpaceResponse])
+async def list_data_spaces(current_user: dict = Depends(require_role(["admin", "asesor"]))):
+    """The whole catalog by name, with project counts per target_role"""
+    spaces = await load_data_spaces()
+    counts = await count_space_roles([space["id"] for space in spaces])
+    return [build_data_space_response(space, counts) for space in spaces]
+
+@api_router.get("/data-spaces/suggest", response_model=List[DataSpaceSuggestion])
+async def suggest_data_spaces(
+    q: str = Query("", description="Prefijos de palabras del nombre o alias, sin importar tildes"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    return await space_suggester.suggest(q, limit)
+
+@api_router.get("/data-spaces/{space_id}", response_model=DataSpaceResponse)
+async def get_data_space(space_id: str, current_user: dict = Depends(require_role(["admin", "asesor"]))):
+    space = await repos.data_spaces.get({"id": space_id}, exclude=("name_folded", "aliases_folded"))
+    if not space:
+        raise HTTPException(status_code=404, detail="Espacio de datos no encontrado")
+    return build_data_space_response(space, await count_space_roles([space_id]))
+
+async def check_data_space_names(name: str, aliases: List[str], space_id: Optional[str] = None) -> None:
+    """Names and aliases must resolve to a single catalog entry"""
+    for value in [name, *aliases]:
+        if not value.strip():
+            continue
+        other = await find_data_space(value)
+        if other and other["id"] != space_id:
+            raise HTTPException(status_code=400, detail=f"Ya existe un espacio de datos llamado \"{value.strip()}\"")
+
+@api_router.post("/data-spaces", response_model=DataSpaceResponse)
+async def create_data_space(
+    space_data: DataSpaceCreate,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    await check_data_space_names(space_data.name, space_data.aliases)
+    now = utcnow()
+    space = {
+        "id": str(uuid.uuid4()),
+        **space_data.model_dump(),
+        "name": space_data.name.strip(),
+        **data_space_keys(space_data.name, space_data.aliases),
+        "created_at": now,
+        "updated_at": now
+    }
+    await repos.data_spaces.insert(space)
+    await space_suggester.reload()
+    record_activity("data_space_created", current_user, space_id=space["id"], name=space["name"])
+    return build_data_space_response(space, {})
+
+@api_router.put("/data-spaces/{space_id}", response_model=DataSpaceResponse)
+async def update_data_space(
+    space_id: str,
+    space_data: DataSpaceUpdate,
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    space = await repos.data_spaces.get({"id": space_id})
+    if not space:
+        raise HTTPException(status_code=404, detail="Espacio de datos no encontrado")
+    
+    update_data = {k: v for k, v in space_data.model_dump().items() if v is not None}
+    name = update_data.get("name", space["name"]).strip()
+    aliases = update_data.get("aliases", space.get("aliases", []))
+    await check_data_space_names(name, aliases, space_id)
+    if "name" in update_data:
+        update_data["name"] = name
+    
+    updated = await repos.data_spaces.update(
+        {"id": space_id},
+        {**update_data, **data_space_keys(name, aliases), "updated_at": utcnow()},
+        exclude=("name_folded", "aliases_folded")
+    )
+    if name != space["name"]:
+        # Keep the display copy on the projects in step
+        await repos.projects.update_many({"space_id": space_id}, {"space_name": name})
+    await space_suggester.reload()
+    record_activity("data_space_updated", current_user, space_id=space_id, changes=update_data)
+    return build_data_space_response(updated, await count_space_roles([space_id]))
+
+@api_router.delete("/data-spaces/{space_id}")
+async def delete_data_space(space_id: str, current_user: dict = Depends(require_role(["admin"]))):
+    if await repos.projects.count({"space_id": space_id}):
+        raise HTTPException(status_code=400, detail="Hay proyectos asociados a este espacio de datos")
+    if not await repos.data_spaces.delete({"id": space_id}):
+        raise HTTPException(status_code=404, detail="Espacio de datos no encontrado")
+    await space_suggester.reload()
+    record_activity("data_space_deleted", current_user, space_id=space_id)
+    return {"message": "Espacio de datos eliminado"}
+
 # ==================== CLIENT DASHBOARD ====================
 @api_router.get("/client/dashboard")
 async def get_client_dashboard(
@@ -975,14 +2849,14 @@ async def get_client_dashboard(
             "message": "No tienes una empresa asignada. Contacta con tu asesor."
         }
     
-    company = await db.companies.find_one({"id": current_user["company_id"]}, {"_id": 0})
+    company = await repos.companies.get({"id": current_user["company_id"]})
     if not company:
         return {
             "status": "sin_empresa",
             "message": "Empresa no encontrada. Contacta con tu asesor."
         }
     
-    project = await db.projects.find_one({"company_id": company["id"]}, {"_id": 0})
+    project = await repos.projects.get({"company_id": company["id"]})
     
     status_messages = {
         "lead": {
@@ -1011,7 +2885,7 @@ async def get_client_dashboard(
     }
     
     # Include intake info for lead companies
-    intake = await db.client_intakes.find_one({"company_id": company["id"]}, {"_id": 0})
+    intake = await repos.intakes.get({"company_id": company["id"]})
     if intake:
         result["intake"] = {
             "id": intake["id"],
@@ -1039,6 +2913,275 @@ async def get_client_dashboard(
     
     return result
 
+# ==================== ANALYTICS ROUTES ====================
+@api_router.get("/analytics/funnel")
+async def get_funnel_analytics(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    granularity: Literal["day", "week", "month"] = Query("week"),
+    current_user: dict = Depends(require_role(["admin", "asesor"]))
+):
+    """Lead conversion, time-to-decision and incorporation completion per period"""
+    query = {}
+    if date_from or date_to:
+        query["day"] = {}
+        if date_from:
+            query["day"]["$gte"] = date_from[:10]
+        if date_to:
+            query["day"]["$lte"] = date_to[:10]
+    
+    rows = await repos.funnel.list(query, sort=[("day", 1)])
+    return summarize_funnel(rows, granularity)
+
+# ==================== IDEMPOTENCY ====================
+# POSTs carrying an Idempotency-Key are run once per user and key; retries
+# replay the stored response (see idempotency.py). Records expire after
+# IDEMPOTENCY_TTL_HOURS through a TTL index.
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24"))
+idempotency = IdempotencyStore(
+    repos.idempotency,
+    utcnow,
+    ttl=timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+    lru_size=int(os.environ.get("IDEMPOTENCY_LRU_SIZE", "10000"))
+)
+
+def token_user_id(headers: Dict[str, str]) -> Optional[str]:
+    """User id of a valid bearer token; the idempotency middleware runs
+    before routing, so it can't use get_current_user"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return decode_token(token).get("user_id")
+    except HTTPException:
+        return None
+
+# ==================== BATCH ROUTES ====================
+BATCH_FORWARDED_HEADERS = {"content-type", "etag", "x-next-cursor", "x-total-count"}
+# Set by the batch itself, never taken from the operation
+BATCH_INJECTED_HEADERS = {"authorization", "content-type", "content-length"}
+
+async def run_batch_operation(request: Request, operation: BatchOperation) -> BatchResult:
+    """Dispatch one sub-request through the ASGI app, in process"""
+    path, _, query_string = operation.path.partition("?")
+    if not path.startswith("/api/"):
+        path = "/api" + (path if path.startswith("/") else "/" + path)
+    if path.rstrip("/") == "/api/batch":
+        return BatchResult(id=operation.id, status=400, body={"detail": "No se permiten lotes anidados"})
+    
+    body = b"" if operation.body is None else json.dumps(operation.body, default=str).encode()
+    headers = [
+        (k.lower().encode(), v.encode()) for k, v in operation.headers.items() if k.lower() not in BATCH_INJECTED_HEADERS
+    ]
+    headers += [
+        (b"authorization", request.headers.get("authorization", "").encode()),
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode())
+    ]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": operation.method,
+        "scheme": request.url.scheme,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": headers,
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server")
+    }
+    
+    sent = False
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    status_code = 500
+    response_headers = {}
+    chunks = []
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            for key, value in message.get("headers", []):
+                name = key.decode().lower()
+                if name in BATCH_FORWARDED_HEADERS:
+                    response_headers[name] = value.decode()
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # ServerErrorMiddleware re-raises after its own 500; report it for
+        # this operation alone so the results of the others are kept
+        logger.exception(f"Batch operation {operation.method} {path} failed")
+        return BatchResult(id=operation.id, status=500, body={"detail": "Error interno del servidor"})
+    
+    raw = b"".join(chunks)
+    if raw and response_headers.get("content-type", "").startswith("application/json"):
+        payload = json.loads(raw)
+    else:
+        payload = raw.decode() or None
+    return BatchResult(id=operation.id, status=status_code, headers=response_headers, body=payload)
+
+@api_router.post("/batch", response_model=List[BatchResult])
+async def run_batch(
+    batch: BatchRequest,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Run several API calls in one request with a single authentication.
+
+    By default consecutive GETs run concurrently and every write waits for
+    what came before it, so results match sequential execution for reads
+    that follow writes. `sequential` runs everything one by one.
+    """
+    token = batch_user.set(current_user)
+    try:
+        results: List[Optional[BatchResult]] = [None] * len(batch.operations)
+        if batch.sequential:
+            for index, operation in enumerate(batch.operations):
+                results[index] = await run_batch_operation(request, operation)
+                if batch.stop_on_error and results[index].status >= 400:
+                    for skipped in range(index + 1, len(batch.operations)):
+                        results[skipped] = BatchResult(
+                            id=batch.operations[skipped].id, status=424, body={"detail": "Omitida por un error previo"}
+                        )
+                    break
+            return results
+        
+        reads: List[int] = []
+        async def flush_reads():
+            done = await asyncio.gather(*(run_batch_operation(request, batch.operations[i]) for i in reads))
+            for i, result in zip(reads, done):
+                results[i] = result
+            reads.clear()
+        
+        for index, operation in enumerate(batch.operations):
+            if operation.method == "GET":
+                reads.append(index)
+                continue
+            await flush_reads()
+            results[index] = await run_batch_operation(request, operation)
+        await flush_reads()
+        return results
+    finally:
+        batch_user.reset(token)
+
+# ==================== PROFILING ROUTES ====================
+# All opt-in: X-Profile: 1 from an admin, PROFILE_SAMPLE_RATE for a random
+# fraction of requests, SLOW_REQUEST_MS > 0 for the slow-request log
+request_profiler = RequestProfiler(
+    Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles')),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+    slow_ms=float(os.environ.get('SLOW_REQUEST_MS', '0'))
+)
+
+TracemallocGrouping = Literal["filename", "lineno", "traceback"]
+
+def is_admin_request(headers: Dict[str, str]) -> bool:
+    """Token-only role check for the profiling middleware, which runs before routing"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return False
+    try:
+        return decode_token(token).get("role") == "admin"
+    except HTTPException:
+        return False
+
+@api_router.get("/admin/profiling")
+async def get_profiling_status(current_user: dict = Depends(require_role(["admin"]))):
+    return {
+        "directory": str(request_profiler.directory),
+        "sample_rate": request_profiler.sample_rate,
+        "interval_ms": request_profiler.sampler.interval * 1000,
+        "slow_request_ms": request_profiler.slow_ms,
+        "tracemalloc": request_profiler.memory.status()
+    }
+
+@api_router.get("/admin/profiling/slow-requests")
+async def list_slow_requests(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Most recent slow requests, newest first, with their Mongo calls"""
+    return list(reversed(request_profiler.slow_requests))[:limit]
+
+@api_router.get("/admin/profiling/profiles")
+async def list_profiles(current_user: dict = Depends(require_role(["admin"]))):
+    return request_profiler.profiles()
+
+@api_router.get("/admin/profiling/profiles/{name}")
+async def get_profile(name: str, current_user: dict = Depends(require_role(["admin"]))):
+    """Folded stacks, ready for flamegraph.pl, inferno or speedscope"""
+    try:
+        path = request_profiler.profile_path(name)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+@api_router.post("/admin/profiling/tracemalloc/start")
+async def start_tracemalloc(
+    frames: int = Query(25, ge=1, le=100),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    request_profiler.memory.start(frames)
+    return request_profiler.memory.status()
+
+@api_router.post("/admin/profiling/tracemalloc/stop")
+async def stop_tracemalloc(current_user: dict = Depends(require_role(["admin"]))):
+    request_profiler.memory.stop()
+    return request_profiler.memory.status()
+
+@api_router.post("/admin/profiling/tracemalloc/snapshots")
+async def take_tracemalloc_snapshot(
+    group_by: TracemallocGrouping = "lineno",
+    limit: int = Query(20, ge=1, le=200),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    memory = request_profiler.memory
+    try:
+        name = await asyncio.to_thread(memory.take)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    top = await asyncio.to_thread(memory.top, name, group_by, limit)
+    return {"name": name, "top": top}
+
+@api_router.get("/admin/profiling/tracemalloc/snapshots/{name}")
+async def get_tracemalloc_snapshot(
+    name: str,
+    group_by: TracemallocGrouping = "lineno",
+    limit: int = Query(20, ge=1, le=200),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    try:
+        top = await asyncio.to_thread(request_profiler.memory.top, name, group_by, limit)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return {"name": name, "top": top}
+
+@api_router.get("/admin/profiling/tracemalloc/diff")
+async def diff_tracemalloc_snapshots(
+    base: str,
+    target: str,
+    group_by: TracemallocGrouping = "lineno",
+    limit: int = Query(20, ge=1, le=200),
+    current_user: dict = Depends(require_role(["admin"]))
+):
+    """Allocation growth from `base` to `target`, largest change first"""
+    try:
+        diff = await asyncio.to_thread(request_profiler.memory.diff, base, target, group_by, limit)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+    return {"base": base, "target": target, "diff": diff}
+
 # ==================== SEED DATA ====================
 @api_router.post("/seed-demo-users")
 async def seed_demo_users():
@@ -1047,27 +3190,29 @@ async def seed_demo_users():
             "id": str(uuid.uuid4()),
             "email": "admin@espaciodatos.com",
             "name": "Administrador Demo",
+            "name_lower": fold_text("Administrador Demo"),
             "password": hash_password("admin123"),
             "role": "admin",
             "company_id": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         },
         {
             "id": str(uuid.uuid4()),
             "email": "asesor@espaciodatos.com",
             "name": "Asesor Demo",
+            "name_lower": fold_text("Asesor Demo"),
             "password": hash_password("asesor123"),
             "role": "asesor",
             "company_id": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
     ]
     
     created = []
     for user in demo_users:
-        existing = await db.users.find_one({"email": user["email"]})
+        existing = await repos.users.get({"email": user["email"]})
         if not existing:
-            await db.users.insert_one(user)
+            await repos.users.insert(user)
             created.append(user["email"])
     
     return {
@@ -1081,7 +3226,7 @@ async def seed_demo_users():
 
 @api_router.post("/seed-demo-companies")
 async def seed_demo_companies(current_user: dict = Depends(require_role(["admin", "asesor"]))):
-    now = datetime.now(timezone.utc).isoformat()
+    now = utcnow()
     
     # Company 1: Lead (en evaluación)
     company1_id = str(uuid.uuid4())
@@ -1138,11 +3283,15 @@ async def seed_demo_companies(current_user: dict = Depends(require_role(["admin"
     }
     
     companies_created = []
+    # An asesor seeding the demo owns the demo companies
+    owner = owner_fields(current_user if current_user.get("role") == "asesor" else None)
     
     for company in [company1, company2, company3]:
-        existing = await db.companies.find_one({"nif": company["nif"]})
+        existing = await repos.companies.get({"nif": company["nif"]})
         if not existing:
-            await db.companies.insert_one(company)
+            company.update(owner)
+            await repos.companies.insert(company)
+            similarity.upsert(company)
             companies_created.append(company["name"])
             
             # Create diagnostic
@@ -1160,10 +3309,11 @@ async def seed_demo_companies(current_user: dict = Depends(require_role(["admin"
                 "decided_at": now if company["status"] != "lead" else None,
                 "created_at": now
             }
-            await db.diagnostics.insert_one(diagnostic)
+            await repos.diagnostics.insert(diagnostic)
             
             # Create project for apta company
             if company["status"] == "apta":
+                industrial = await ensure_data_space("Espacio de Datos Industrial")
                 project = {
                     "id": str(uuid.uuid4()),
                     "company_id": company["id"],
@@ -1171,7 +3321,8 @@ async def seed_demo_companies(current_user: dict = Depends(require_role(["admin"
                     "phase": 2,
                     "status": "iniciado",
                     "target_role": "participante",
-                    "space_name": "Espacio de Datos Industrial",
+                    "space_id": industrial["id"],
+                    "space_name": industrial["name"],
                     "use_case": "Compartir datos de producción para optimización de procesos industriales.",
                     "rgpd_checked": True,
                     "incorporation_status": "en_progreso",
@@ -1181,62 +3332,67 @@ async def seed_demo_companies(current_user: dict = Depends(require_role(["admin"
                         "caso_uso_definido": True,
                         "validacion_rgpd": True
                     },
+                    "checklist_completed": 4,
+                    "owner_id": company["owner_id"],
                     "created_at": now
                 }
-                await db.projects.insert_one(project)
+                await repos.projects.insert(project)
     
     # Create cliente users linked to companies
     cliente_users = []
     
     # Cliente for company 1 (lead)
-    cliente1_existing = await db.users.find_one({"email": "cliente.lead@espaciodatos.com"})
+    cliente1_existing = await repos.users.get({"email": "cliente.lead@espaciodatos.com"})
     if not cliente1_existing:
-        company1_doc = await db.companies.find_one({"nif": "B12345678"})
+        company1_doc = await repos.companies.get({"nif": "B12345678"})
         if company1_doc:
             cliente1 = {
                 "id": str(uuid.uuid4()),
                 "email": "cliente.lead@espaciodatos.com",
                 "name": "María García (TechData)",
+                "name_lower": fold_text("María García (TechData)"),
                 "password": hash_password("cliente123"),
                 "role": "cliente",
                 "company_id": company1_doc["id"],
                 "created_at": now
             }
-            await db.users.insert_one(cliente1)
+            await repos.users.insert(cliente1)
             cliente_users.append({"email": "cliente.lead@espaciodatos.com", "company": "TechData Solutions S.L."})
     
     # Cliente for company 2 (apta)
-    cliente2_existing = await db.users.find_one({"email": "cliente.apta@espaciodatos.com"})
+    cliente2_existing = await repos.users.get({"email": "cliente.apta@espaciodatos.com"})
     if not cliente2_existing:
-        company2_doc = await db.companies.find_one({"nif": "A87654321"})
+        company2_doc = await repos.companies.get({"nif": "A87654321"})
         if company2_doc:
             cliente2 = {
                 "id": str(uuid.uuid4()),
                 "email": "cliente.apta@espaciodatos.com",
                 "name": "Carlos López (Renovables)",
+                "name_lower": fold_text("Carlos López (Renovables)"),
                 "password": hash_password("cliente123"),
                 "role": "cliente",
                 "company_id": company2_doc["id"],
                 "created_at": now
             }
-            await db.users.insert_one(cliente2)
+            await repos.users.insert(cliente2)
             cliente_users.append({"email": "cliente.apta@espaciodatos.com", "company": "Industrias Renovables S.A."})
     
     # Cliente for company 3 (descartada)
-    cliente3_existing = await db.users.find_one({"email": "cliente.descartada@espaciodatos.com"})
+    cliente3_existing = await repos.users.get({"email": "cliente.descartada@espaciodatos.com"})
     if not cliente3_existing:
-        company3_doc = await db.companies.find_one({"nif": "B11223344"})
+        company3_doc = await repos.companies.get({"nif": "B11223344"})
         if company3_doc:
             cliente3 = {
                 "id": str(uuid.uuid4()),
                 "email": "cliente.descartada@espaciodatos.com",
                 "name": "Ana Martínez (Express)",
+                "name_lower": fold_text("Ana Martínez (Express)"),
                 "password": hash_password("cliente123"),
                 "role": "cliente",
                 "company_id": company3_doc["id"],
                 "created_at": now
             }
-            await db.users.insert_one(cliente3)
+            await repos.users.insert(cliente3)
             cliente_users.append({"email": "cliente.descartada@espaciodatos.com", "company": "Comercial Express S.L."})
     
     return {
@@ -1258,12 +3414,16 @@ async def root():
 # Include the router
 app.include_router(api_router)
 
+app.add_middleware(IdempotencyMiddleware, store=idempotency, identify=token_user_id)
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler, authorize=is_admin_request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "ETag", "Idempotent-Replayed"],
 )
 
 # Logging
@@ -1290,7 +3450,7 @@ async def bootstrap_admin():
         return
     
     # Check if any admin user exists
-    existing_admin = await db.users.find_one({"role": "admin"}, {"_id": 0})
+    existing_admin = await repos.users.get({"role": "admin"})
     
     if existing_admin:
         logger.info(f"Admin already exists: {existing_admin['email']}")
@@ -1301,15 +3461,130 @@ async def bootstrap_admin():
         "id": str(uuid.uuid4()),
         "email": admin_email.lower(),
         "name": "Administrador",
+        "name_lower": fold_text("Administrador"),
         "password": hash_password(admin_password),
         "role": "admin",
         "company_id": None,
-        "created_at": datetime.now(timezone.utc).isoformat()
+        "created_at": utcnow()
     }
     
-    await db.users.insert_one(admin_doc)
+    await repos.users.insert(admin_doc)
     logger.info(f"Bootstrap admin created: {admin_email}")
 
+# Company indexes replaced by the status-prefixed compounds
+SUPERSEDED_COMPANY_INDEXES = [
+    [("created_at", -1), ("id", -1)],
+    [("eligibility_score", -1), ("id", -1)],
+    [("owner_id", 1), ("created_at", -1), ("id", -1)],
+    [("owner_id", 1), ("eligibility_score", -1), ("id", -1)]
+]
+
+async def drop_indexes(collection, superseded: List[list]) -> None:
+    """Drop the indexes with any of the `superseded` key patterns, if present"""
+    keys = [encode_index_keys(index) for index in superseded]
+    for name, info in (await collection.index_information()).items():
+        if list(info["key"]) in keys:
+            await collection.drop_index(name)
+
+@app.on_event("startup")
+async def ensure_indexes(database: Optional[Database] = None):
+    """Create indexes; `database` lets migrations build them for another storage mode"""
+    if database is None and STORAGE_ENGINE == "memory":
+        return
+    target = database or db
+    await target.activity_log.create_index([("company_id", 1), ("ts", -1)])
+    await target.funnel_daily.create_index("day", unique=True)
+    
+    # User directory: filters as equality prefixes before the keyset order
+    await target.users.create_index("id", unique=True)
+    await target.users.create_index([("created_at", -1), ("id", -1)])
+    await target.users.create_index([("role", 1), ("created_at", -1), ("id", -1)])
+    await target.users.create_index([("company_id", 1), ("created_at", -1), ("id", -1)])
+    await target.users.create_index("email")
+    await target.users.create_index("name_lower")
+    # Company lists always filter on status (all of OWNER_STATUSES when not
+    # given), so each list is equality ([owner_id,] status), then the keyset
+    # sort (field, id), then the eligibility_score range: four compounds
+    # cover both sorts with and without an owner, and the (owner_id, status)
+    # prefix serves the workload counts
+    await target.companies.create_index("id", unique=True)
+    await target.companies.create_index("nif")
+    await target.companies.create_index([("status", 1), ("created_at", -1), ("id", -1)])
+    await target.companies.create_index([("status", 1), ("eligibility_score", -1), ("id", -1)])
+    await target.companies.create_index([("owner_id", 1), ("status", 1), ("created_at", -1), ("id", -1)])
+    await target.companies.create_index([("owner_id", 1), ("status", 1), ("eligibility_score", -1), ("id", -1)])
+    await drop_indexes(target.companies, SUPERSEDED_COMPANY_INDEXES)
+    await target.diagnostics.create_index("company_id")
+    await target.diagnostics.create_index([("result", 1), ("score_version", 1)])
+    await target.diagnostics.create_index([("result", 1), ("id", 1)])
+    # Outbox: due entries by status, delivered ones expire after the retention
+    await target.notification_outbox.create_index("id", unique=True)
+    await target.notification_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+    await target.notification_outbox.create_index("sent_at", expireAfterSeconds=OUTBOX_RETENTION_DAYS * 86400)
+    # Lifecycle transitions are conditional updates matched by company_id
+    await target.client_intakes.create_index("company_id")
+    await target.projects.create_index("company_id")
+    await target.projects.create_index([("owner_id", 1), ("created_at", -1), ("id", -1)])
+    await target.projects.create_index([("owner_id", 1), ("incorporation_status", 1), ("created_at", -1), ("id", -1)])
+    # Idempotency keys: claimed by unique id, dropped once the TTL passes
+    await target.idempotency_keys.create_index("id", unique=True)
+    await target.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_HOURS * 3600)
+    # Archive job: terminal statuses oldest-updated first
+    await target.companies.create_index([("status", 1), ("updated_at", 1), ("id", 1)])
+    await target.companies.create_index([("change_seq", 1), ("id", 1)])
+    await target.projects.create_index([("change_seq", 1), ("id", 1)])
+    await target.change_tombstones.create_index([("change_seq", 1), ("id", 1)])
+    await target.change_tombstones.create_index("changed_at", expireAfterSeconds=CHANGE_RETENTION_DAYS * 86400)
+    await target.counters.create_index("id", unique=True)
+    await target.archived_companies.create_index("id", unique=True)
+    await target.archived_companies.create_index([("archived_at", -1), ("id", -1)])
+    await target.archived_companies.create_index([("owner_id", 1), ("archived_at", -1), ("id", -1)])
+    await target.archived_companies.create_index("nif")
+    await target.archived_companies.create_index("file", sparse=True)
+    # Multikey for the array facets; one index per facet since a compound
+    # index cannot cover two array fields
+    for field in INTAKE_FACETS:
+        await target.companies.create_index(f"intake_facets.{field}")
+    
+    # Project listing: every filter is an equality prefix in front of the
+    # (sort field, id) keyset order
+    await target.projects.create_index([("created_at", -1), ("id", -1)])
+    await target.projects.create_index([("checklist_completed", -1), ("id", -1)])
+    await target.projects.create_index([("incorporation_status", 1), ("created_at", -1), ("id", -1)])
+    await target.projects.create_index([("incorporation_status", 1), ("checklist_completed", -1), ("id", -1)])
+    await target.projects.create_index([("space_name", 1), ("created_at", -1), ("id", -1)])
+    await target.projects.create_index([("space_id", 1), ("created_at", -1), ("id", -1)])
+    # Per-space participant/provider counts
+    await target.projects.create_index([("space_id", 1), ("target_role", 1)])
+    await target.data_spaces.create_index("id", unique=True)
+    await target.data_spaces.create_index("name_folded", unique=True)
+    await target.data_spaces.create_index("aliases_folded")
+    await target.projects.create_index(
+        [("target_role", 1), ("created_at", -1), ("id", -1)],
+        partialFilterExpression={"target_role": {"$type": "string"}}
+    )
+    # The outbox sweep only looks at documents holding pending notifications
+    for collection in (target.diagnostics, target.projects):
+        await collection.create_index(PENDING_COUNT, partialFilterExpression={PENDING_COUNT: {"$gt": 0}})
+    # "Missing step" queries only ever touch the unchecked projects
+    for flag in IncorporationChecklist.model_fields:
+        await target.projects.create_index(
+            [(f"incorporation_checklist.{flag}", 1), ("created_at", -1), ("id", -1)],
+            partialFilterExpression={f"incorporation_checklist.{flag}": False}
+        )
+
+@app.on_event("startup")
+async def start_background_workers():
+    audit_log.start()
+    notifier.start()
+    app.state.similarity_task = asyncio.create_task(refresh_similarity_index())
+    app.state.change_feed_task = asyncio.create_task(stamp_unstamped_changes())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Drain pending audit events before the connection goes away
+    await audit_log.stop()
+    await notifier.stop()
+    app.state.similarity_task.cancel()
+    app.state.change_feed_task.cancel()
     client.close()
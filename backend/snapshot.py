@@ -0,0 +1,283 @@
+"""Full-database snapshots for cloning environments.
+
+`cli.py snapshot` streams every application collection into a directory and
+`cli.py restore-snapshot` loads it into another database: production into
+staging, or a seeded dataset into a benchmark box, without mongodump.
+
+Layout of a snapshot directory:
+
+    manifest.json              collections, document counts, chunk files and
+                               index definitions; written last, so a
+                               directory without it is an incomplete snapshot
+    <collection>.<n>.bson.zst  one zstd frame per chunk of documents, each
+                               chunk being concatenated BSON (as mongodump)
+
+Export runs one cursor per collection, several collections at a time, and
+compresses chunk n in a worker thread while the cursor fetches chunk n+1.
+Documents are read as raw BSON and written out as is; only collections with
+personal data are decoded, and only when anonymizing. Restore decompresses
+and inserts several chunks at a time with unordered insert_many batches of
+raw BSON, and builds the indexes once all the data is in, which is much
+faster than maintaining them during the load.
+
+The export is not a point-in-time snapshot (that needs a replica set):
+collections are read one after another while the API may keep writing.
+Stop writes, or accept a fuzzy copy, when that matters. Archive files
+(ARCHIVE_STORE=file) live outside Mongo: copy ARCHIVE_DIR alongside.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import bson
+import zstandard
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import IndexModel
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+RAW = CodecOptions(document_class=RawBSONDocument)
+DECODE = CodecOptions(tz_aware=True)
+
+# collection -> {dotted path: kind} of the personal data replaced by
+# anonymize; lists (outbox recipients) are replaced element by element
+PERSONAL_FIELDS: Dict[str, Dict[str, str]] = {
+    "users": {"email": "email", "name": "name", "name_lower": "name_lower"},
+    "companies": {"name": "company", "contact_name": "name", "contact_phone": "phone", "owner_name": "name"},
+    "client_intakes": {"notes": "redact"},
+    "diagnostics": {"notes": "redact"},
+    "activity_log": {"actor_name": "name", "details.email": "email", "details.name": "company"},
+    "notification_outbox": {"recipients": "email", "subject": "redact", "body": "redact"},
+    "archived_companies": {
+        "name": "company",
+        "owner_name": "name",
+        "bundle.company.name": "company",
+        "bundle.company.contact_name": "name",
+        "bundle.company.contact_phone": "phone",
+        "bundle.company.owner_name": "name"
+    }
+}
+
+# ==================== ANONYMIZATION ====================
+class Pseudonymizer:
+    """Deterministic stand-ins: the same input always gets the same value,
+    so an asesor's name on their companies (owner_name) still matches their
+    user and unique emails stay unique. Keyed by a secret salt so values
+    can't be reversed by hashing candidate inputs."""
+
+    def __init__(self, salt: Optional[str] = None):
+        self.salt = (salt or secrets.token_hex(16)).encode()
+
+    def token(self, value: str) -> str:
+        return hmac.new(self.salt, value.strip().lower().encode(), hashlib.sha256).hexdigest()[:10]
+
+    def replace(self, kind: str, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self.replace(kind, v) for v in value]
+        if not isinstance(value, str) or not value:
+            return value
+        if kind == "redact":
+            return ""
+        token = self.token(value)
+        if kind == "email":
+            return f"{token}@example.invalid"
+        if kind == "phone":
+            return f"+34 6{int(token, 16) % 10 ** 8:08d}"
+        if kind == "company":
+            return f"Empresa {token}"
+        name = f"Persona {token}"
+        return name.lower() if kind == "name_lower" else name
+
+    def apply(self, doc: dict, fields: Dict[str, str]) -> dict:
+        for path, kind in fields.items():
+            *parents, leaf = path.split(".")
+            target = doc
+            for part in parents:
+                target = target.get(part) if isinstance(target, dict) else None
+            if isinstance(target, dict) and leaf in target:
+                target[leaf] = self.replace(kind, target[leaf])
+        return doc
+
+# ==================== FILES ====================
+def chunk_name(collection: str, index: int) -> str:
+    return f"{collection}.{index:05d}.bson.zst"
+
+def write_chunk(path: Path, data: bytes, level: int) -> int:
+    compressed = zstandard.ZstdCompressor(level=level).compress(data)
+    path.write_bytes(compressed)
+    return len(compressed)
+
+def read_chunk(path: Path) -> List[RawBSONDocument]:
+    data = zstandard.ZstdDecompressor().decompress(path.read_bytes())
+    docs, offset = [], 0
+    # Each BSON document starts with its own little-endian int32 length
+    while offset < len(data):
+        size = int.from_bytes(data[offset:offset + 4], "little")
+        docs.append(RawBSONDocument(data[offset:offset + size]))
+        offset += size
+    return docs
+
+def index_specs(information: Dict[str, dict]) -> List[dict]:
+    """index_information() -> JSON-friendly definitions, without _id"""
+    specs = []
+    for name, info in information.items():
+        if name == "_id_":
+            continue
+        options = {k: v for k, v in info.items() if k not in ("key", "v", "ns")}
+        specs.append({"name": name, "keys": [list(key) for key in info["key"]], "options": options})
+    return specs
+
+async def application_collections(database) -> List[str]:
+    names = await database.list_collection_names()
+    # Leftovers of an interrupted migrate-ids are not application data
+    return sorted(n for n in names if not n.startswith("system.") and not n.endswith("__migrating"))
+
+# ==================== EXPORT ====================
+async def export_collection(
+    database,
+    name: str,
+    directory: Path,
+    chunk_size: int,
+    level: int,
+    pseudonymizer: Optional[Pseudonymizer],
+    progress: Optional[Callable[[str, int], None]] = None
+) -> dict:
+    collection = database.get_collection(name, codec_options=RAW)
+    fields = PERSONAL_FIELDS.get(name) if pseudonymizer else None
+    cursor = collection.find({}).batch_size(min(chunk_size, 10000))
+    chunks: List[dict] = []
+    count = 0
+    writing: Optional[asyncio.Future] = None
+    while True:
+        docs = await cursor.to_list(chunk_size)
+        if not docs:
+            break
+        if fields:
+            data = b"".join(bson.encode(pseudonymizer.apply(bson.decode(doc.raw, DECODE), fields)) for doc in docs)
+        else:
+            data = b"".join(doc.raw for doc in docs)
+        # One chunk compressing in a thread while the cursor reads the next
+        if writing is not None:
+            chunks[-1]["bytes"] = await writing
+        file = chunk_name(name, len(chunks))
+        chunks.append({"file": file, "count": len(docs), "bytes": None})
+        writing = asyncio.ensure_future(asyncio.to_thread(write_chunk, directory / file, data, level))
+        count += len(docs)
+        if progress:
+            progress(name, count)
+    if writing is not None:
+        chunks[-1]["bytes"] = await writing
+    return {
+        "count": count,
+        "chunks": chunks,
+        "indexes": index_specs(await collection.index_information()),
+        "anonymized": bool(fields)
+    }
+
+async def create_snapshot(
+    database,
+    directory: Path,
+    id_storage: str,
+    collections: Optional[Iterable[str]] = None,
+    chunk_size: int = 50000,
+    level: int = 3,
+    concurrency: int = 4,
+    anonymize: bool = False,
+    salt: Optional[str] = None,
+    progress: Optional[Callable[[str, int], None]] = None
+) -> dict:
+    """Export `collections` (default: all) into `directory`; returns the manifest"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    if (directory / MANIFEST).exists():
+        raise FileExistsError(f"{directory} ya contiene una instantánea")
+    names = list(collections) if collections else await application_collections(database)
+    pseudonymizer = Pseudonymizer(salt) if anonymize else None
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def export(name: str) -> dict:
+        async with semaphore:
+            return await export_collection(database, name, directory, chunk_size, level, pseudonymizer, progress)
+
+    started = datetime.now(timezone.utc)
+    results = await asyncio.gather(*(export(name) for name in names))
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created_at": started.isoformat(),
+        "database": database.name,
+        "id_storage": id_storage,
+        "anonymized": anonymize,
+        "compression": {"codec": "zstd", "level": level},
+        "collections": dict(zip(names, results))
+    }
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2, default=str))
+    return manifest
+
+# ==================== RESTORE ====================
+def load_manifest(directory: Path) -> dict:
+    path = Path(directory) / MANIFEST
+    if not path.exists():
+        raise FileNotFoundError(f"{directory} no contiene una instantánea completa ({MANIFEST})")
+    manifest = json.loads(path.read_text())
+    if manifest.get("format") != FORMAT_VERSION:
+        raise ValueError(f"Formato de instantánea no soportado: {manifest.get('format')}")
+    return manifest
+
+async def restore_snapshot(
+    database,
+    directory: Path,
+    collections: Optional[Iterable[str]] = None,
+    drop: bool = False,
+    batch_size: int = 5000,
+    concurrency: int = 8,
+    progress: Optional[Callable[[str, int], None]] = None
+) -> Dict[str, int]:
+    """Load a snapshot into `database`; returns documents restored per collection.
+
+    Target collections must be empty unless `drop` is set. Indexes are built
+    after every collection has been loaded.
+    """
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    wanted = set(collections) if collections else None
+    selected = {name: info for name, info in manifest["collections"].items() if wanted is None or name in wanted}
+
+    for name in selected:
+        if drop:
+            await database.drop_collection(name)
+        elif await database[name].estimated_document_count():
+            raise RuntimeError(f"La colección {name} no está vacía (usa --drop para reemplazarla)")
+
+    restored = {name: 0 for name in selected}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(name: str, chunk: dict) -> None:
+        async with semaphore:
+            docs = await asyncio.to_thread(read_chunk, directory / chunk["file"])
+            collection = database.get_collection(name, codec_options=RAW)
+            for i in range(0, len(docs), batch_size):
+                await collection.insert_many(docs[i:i + batch_size], ordered=False, bypass_document_validation=True)
+            restored[name] += len(docs)
+            if progress:
+                progress(name, restored[name])
+
+    await asyncio.gather(*(load(name, chunk) for name, info in selected.items() for chunk in info["chunks"]))
+
+    async def build_indexes(name: str, specs: List[dict]) -> None:
+        models = [IndexModel([tuple(key) for key in spec["keys"]], name=spec["name"], **spec["options"]) for spec in specs]
+        if models:
+            await database[name].create_indexes(models)
+
+    await asyncio.gather(*(build_indexes(name, info["indexes"]) for name, info in selected.items()))
+    return restored
+
+def snapshot_size(directory: Path) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
@@ -0,0 +1,357 @@
+"""Data-access layer over Motor with an optional compact id storage mode.
+
+Application code always works with documents that carry a string UUID in
+`id` and never sees Mongo's `_id`. Two storage modes back that contract:
+
+- ``legacy``: documents keep `id` next to an ObjectId `_id`; collections are
+  the plain Motor ones.
+- ``uuid``: the UUID *is* the `_id`, stored as a 16-byte BSON binary UUID, and
+  UUID references (`company_id`, ...) are stored as binary too. This drops
+  the separate unique `id` index. Collections are wrapped so filters,
+  projections, sorts, updates and pipelines written against `id` are
+  translated on the way in and documents are mapped back on the way out.
+"""
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from bson.binary import Binary, UUID_SUBTYPE
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+STORAGE_MODES = ("legacy", "uuid")
+
+# Collections whose documents are keyed by a UUID `id`. The other keyed
+# collections stay plain because their ids are not UUIDs:
+# notification_outbox ("<idempotency key>:<channel>" for keyed events),
+# idempotency_keys ("<user id>:<key>") and counters (the counter name).
+ID_COLLECTIONS = {
+    "users", "companies", "diagnostics", "client_intakes", "projects", "activity_log", "archived_companies",
+    "data_spaces", "change_tombstones"
+}
+
+# Top-level fields holding UUIDs of other documents: only translated in the
+# ID_COLLECTIONS above, so plain collections keep their references as strings
+REFERENCE_FIELDS = {"company_id", "decided_by_user_id", "actor_id", "owner_id", "space_id", "entity_id"}
+
+# Query operators whose operands are values of the field
+VALUE_OPERATORS = {"$eq", "$ne", "$in", "$nin", "$lt", "$lte", "$gt", "$gte"}
+
+# ==================== VALUE MAPPING ====================
+def encode_uuid(value: Any) -> Any:
+    """String UUID -> BSON binary UUID; anything else is returned unchanged"""
+    if isinstance(value, str):
+        try:
+            return Binary.from_uuid(uuid.UUID(value))
+        except ValueError:
+            return value
+    if isinstance(value, list):
+        return [encode_uuid(v) for v in value]
+    if isinstance(value, dict):
+        return {k: encode_uuid(v) if k in VALUE_OPERATORS else v for k, v in value.items()}
+    return value
+
+def decode_uuid(value: Any) -> Any:
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return str(value.as_uuid())
+    return value
+
+def encode_doc(doc: dict) -> dict:
+    encoded = {}
+    for key, value in doc.items():
+        if key == "id":
+            encoded["_id"] = encode_uuid(value)
+        elif key in REFERENCE_FIELDS:
+            encoded[key] = encode_uuid(value)
+        else:
+            encoded[key] = value
+    return encoded
+
+def decode_doc(doc: Optional[dict]) -> Optional[dict]:
+    if doc is None:
+        return None
+    decoded = {}
+    for key, value in doc.items():
+        if key == "_id":
+            _id = decode_uuid(value)
+            # Non-UUID _id values (e.g. $group keys) are left as they are
+            decoded["id" if _id is not value else "_id"] = _id
+        else:
+            decoded[key] = decode_uuid(value) if key in REFERENCE_FIELDS else value
+    return decoded
+
+def encode_filter(query: Optional[dict]) -> Optional[dict]:
+    if not query:
+        return query
+    encoded = {}
+    for key, value in query.items():
+        if key in ("$and", "$or", "$nor"):
+            encoded[key] = [encode_filter(q) for q in value]
+        elif key == "id":
+            encoded["_id"] = encode_uuid(value)
+        elif key in REFERENCE_FIELDS:
+            encoded[key] = encode_uuid(value)
+        else:
+            encoded[key] = value
+    return encoded
+
+def encode_projection(projection: Optional[dict]) -> Optional[dict]:
+    """Keep `_id` (it carries the id) and rename `id` inclusions"""
+    if projection is None:
+        return None
+    encoded = {}
+    for key, value in projection.items():
+        if key == "_id":
+            continue
+        encoded["_id" if key == "id" else key] = value
+    return encoded or None
+
+def encode_sort(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return ("_id" if key_or_list == "id" else key_or_list), direction
+    return [("_id" if k == "id" else k, d) for k, d in key_or_list], None
+
+def encode_update(update):
+    if isinstance(update, list):
+        # Aggregation-pipeline updates only carry values as $literal
+        return [encode_pipeline_set(stage) for stage in update]
+    encoded = {}
+    for operator, fields in update.items():
+        if operator in ("$set", "$setOnInsert"):
+            encoded[operator] = encode_doc(fields)
+        else:
+            encoded[operator] = fields
+    return encoded
+
+def encode_index_keys(keys) -> list:
+    if isinstance(keys, str):
+        keys = [(keys, 1)]
+    return [("_id" if k == "id" else k, d) for k, d in keys]
+
+def encode_pipeline_set(stage: dict) -> dict:
+    """Encode the reference values a pipeline update $set writes as $literal"""
+    if "$set" not in stage:
+        return stage
+    return {"$set": {
+        key: {"$literal": encode_uuid(value["$literal"])}
+        if key in REFERENCE_FIELDS and isinstance(value, dict) and "$literal" in value else value
+        for key, value in stage["$set"].items()
+    }}
+
+def encode_pipeline(pipeline: Iterable[dict]) -> List[dict]:
+    encoded = []
+    for stage in pipeline:
+        (operator, spec), = stage.items()
+        if operator == "$match":
+            spec = encode_filter(spec)
+        elif operator == "$sort":
+            spec = {("_id" if k == "id" else k): d for k, d in spec.items()}
+        elif operator == "$project":
+            spec = encode_projection(spec)
+            if spec is None:
+                continue
+        elif operator == "$lookup":
+            spec = dict(spec)
+            for field in ("localField", "foreignField"):
+                if spec.get(field) == "id":
+                    spec[field] = "_id"
+            if "pipeline" in spec:
+                spec["pipeline"] = encode_pipeline(spec["pipeline"])
+        elif operator == "$facet":
+            spec = {name: encode_pipeline(sub) for name, sub in spec.items()}
+        encoded.append({operator: spec})
+    return encoded
+
+def encode_request(op):
+    """Rebuild a pymongo bulk write request with translated arguments"""
+    if isinstance(op, InsertOne):
+        return InsertOne(encode_doc(op._doc))
+    if isinstance(op, (UpdateOne, UpdateMany)):
+        return type(op)(encode_filter(op._filter), encode_update(op._doc), upsert=op._upsert)
+    if isinstance(op, ReplaceOne):
+        return ReplaceOne(encode_filter(op._filter), encode_doc(op._doc), upsert=op._upsert)
+    if isinstance(op, (DeleteOne, DeleteMany)):
+        return type(op)(encode_filter(op._filter))
+    return op
+
+# ==================== WRAPPERS ====================
+class MappedCursor:
+    """Motor cursor whose documents come back with `id` instead of `_id`"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, key_or_list, direction=None):
+        key, direction = encode_sort(key_or_list, direction)
+        self._cursor = self._cursor.sort(key, direction) if direction is not None else self._cursor.sort(key)
+        return self
+
+    def limit(self, limit: int):
+        self._cursor = self._cursor.limit(limit)
+        return self
+
+    def skip(self, skip: int):
+        self._cursor = self._cursor.skip(skip)
+        return self
+
+    def batch_size(self, size: int):
+        self._cursor = self._cursor.batch_size(size)
+        return self
+
+    async def to_list(self, length: Optional[int]) -> List[dict]:
+        return [decode_doc(d) for d in await self._cursor.to_list(length)]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        return decode_doc(await self._cursor.__anext__())
+
+class UuidIdCollection:
+    """Motor collection adapter for the `uuid` storage mode"""
+
+    def __init__(self, collection):
+        self.raw = collection
+        self.name = collection.name
+
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> MappedCursor:
+        return MappedCursor(self.raw.find(encode_filter(filter) or {}, encode_projection(projection), **kwargs))
+
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs):
+        return decode_doc(await self.raw.find_one(encode_filter(filter) or {}, encode_projection(projection), **kwargs))
+
+    async def find_one_and_update(self, filter: dict, update, projection: Optional[dict] = None, **kwargs):
+        doc = await self.raw.find_one_and_update(
+            encode_filter(filter), encode_update(update), projection=encode_projection(projection), **kwargs
+        )
+        return decode_doc(doc)
+
+    async def insert_one(self, document: dict, **kwargs):
+        return await self.raw.insert_one(encode_doc(document), **kwargs)
+
+    async def insert_many(self, documents: Iterable[dict], **kwargs):
+        return await self.raw.insert_many([encode_doc(d) for d in documents], **kwargs)
+
+    async def update_one(self, filter: dict, update, **kwargs):
+        return await self.raw.update_one(encode_filter(filter), encode_update(update), **kwargs)
+
+    async def update_many(self, filter: dict, update, **kwargs):
+        return await self.raw.update_many(encode_filter(filter), encode_update(update), **kwargs)
+
+    async def replace_one(self, filter: dict, replacement: dict, **kwargs):
+        return await self.raw.replace_one(encode_filter(filter), encode_doc(replacement), **kwargs)
+
+    async def delete_one(self, filter: dict, **kwargs):
+        return await self.raw.delete_one(encode_filter(filter), **kwargs)
+
+    async def delete_many(self, filter: dict, **kwargs):
+        return await self.raw.delete_many(encode_filter(filter), **kwargs)
+
+    async def count_documents(self, filter: dict, **kwargs) -> int:
+        return await self.raw.count_documents(encode_filter(filter) or {}, **kwargs)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return await self.raw.estimated_document_count(**kwargs)
+
+    async def bulk_write(self, requests: Iterable, **kwargs):
+        return await self.raw.bulk_write([encode_request(op) for op in requests], **kwargs)
+
+    def aggregate(self, pipeline: Iterable[dict], **kwargs) -> MappedCursor:
+        return MappedCursor(self.raw.aggregate(encode_pipeline(pipeline), **kwargs))
+
+    async def create_index(self, keys, **kwargs):
+        encoded = encode_index_keys(keys)
+        if encoded == [("_id", 1)]:
+            # `_id` is already the unique primary index
+            return "_id_"
+        return await self.raw.create_index(encoded, **kwargs)
+
+    async def drop(self):
+        return await self.raw.drop()
+
+    def __getattr__(self, name: str):
+        # Anything not translated (index_information, rename, ...) goes to Motor
+        return getattr(self.raw, name)
+
+class Database:
+    """Application database handle: `db.users`, `db["users"]`, `db.raw`"""
+
+    def __init__(self, database, mode: str = "legacy"):
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"ID_STORAGE debe ser uno de {STORAGE_MODES}, no {mode!r}")
+        self.raw = database
+        self.mode = mode
+        # Optional (name, collection) -> collection hook, e.g. request tracing
+        self.observer: Optional[Callable[[str, Any], Any]] = None
+        self._collections: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str):
+        if name not in self._collections:
+            collection = self.raw[name]
+            if self.mode == "uuid" and name in ID_COLLECTIONS:
+                collection = UuidIdCollection(collection)
+            self._collections[name] = collection
+        if self.observer is not None:
+            return self.observer(name, self._collections[name])
+        return self._collections[name]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        return await self.raw.command(*args, **kwargs)
+
+# ==================== MIGRATION ====================
+async def collection_stats(database, name: str) -> Dict[str, int]:
+    stats = await database.command("collStats", name)
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "storage_size": stats.get("storageSize", 0),
+        "index_size": stats.get("totalIndexSize", 0),
+        "indexes": stats.get("nindexes", 0)
+    }
+
+async def migrate_id_storage(database, target: str, batch_size: int = 5000, progress=None) -> Dict[str, dict]:
+    """Rewrite every id collection into the `target` storage mode.
+
+    Each collection is copied in batches into a scratch collection and then
+    renamed over the original, so a failed run leaves the source untouched.
+    The API must be stopped while this runs. Indexes are not copied; rebuild
+    them afterwards with the target mode. Returns before/after stats.
+    """
+    if target not in STORAGE_MODES:
+        raise ValueError(f"Modo de almacenamiento desconocido: {target}")
+    report = {}
+    existing = set(await database.list_collection_names())
+    for name in sorted(ID_COLLECTIONS & existing):
+        source = database[name]
+        scratch = database[f"{name}__migrating"]
+        await scratch.drop()
+        before = await collection_stats(database, name)
+
+        copied = 0
+        batch = []
+        async for raw in source.find({}):
+            # Normalise to the application shape, then encode for the target
+            doc = decode_doc(raw) if "id" not in raw else {k: v for k, v in raw.items() if k != "_id"}
+            for field in REFERENCE_FIELDS:
+                if field in doc:
+                    doc[field] = decode_uuid(doc[field])
+            batch.append(encode_doc(doc) if target == "uuid" else doc)
+            if len(batch) >= batch_size:
+                await scratch.insert_many(batch, ordered=False)
+                copied += len(batch)
+                batch = []
+                if progress:
+                    progress(name, copied)
+        if batch:
+            await scratch.insert_many(batch, ordered=False)
+            copied += len(batch)
+        if progress:
+            progress(name, copied)
+
+        if copied:
+            await scratch.rename(name, dropTarget=True)
+        report[name] = {"before": before}
+    return report
@@ -0,0 +1,104 @@
+"""In-process autocomplete over small catalogs (data spaces).
+
+Entry texts are folded (see server.fold_text) and split into words; every
+word goes into a character trie whose nodes hold the ids of the entries with
+a word starting there. A query matches the entries that have, for each query
+word, some word with that prefix: "dat agr" and "agricola" both find
+"Espacio de Datos Agrícola". A lookup walks the query once and intersects the
+id sets, so it costs microseconds whatever the catalog size.
+
+CatalogSuggester keeps the index for one collection: rebuilt right after a
+change made by this process (`reload`) and at most `max_age` seconds old
+otherwise, so changes made through other workers show up too.
+"""
+import asyncio
+import re
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+WORD = re.compile(r"[a-z0-9]+")
+
+class TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.ids: Set[str] = set()
+
+class PrefixIndex:
+    """Word-prefix index; immutable once built"""
+
+    def __init__(self, entries: Iterable[Tuple[str, str, List[str]]], fold: Callable[[str], str]):
+        """`entries` are (id, name, other texts such as aliases)"""
+        self.fold = fold
+        self.root = TrieNode()
+        self.names: Dict[str, str] = {}
+        for entry_id, name, texts in entries:
+            self.names[entry_id] = fold(name)
+            for text in [name, *texts]:
+                for word in WORD.findall(fold(text)):
+                    node = self.root
+                    for char in word:
+                        node = node.children.setdefault(char, TrieNode())
+                        node.ids.add(entry_id)
+
+    def _prefix(self, word: str) -> Set[str]:
+        node = self.root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """Ids matching every query word; names starting with the query first,
+        then alphabetical"""
+        folded = self.fold(query).strip()
+        words = WORD.findall(folded)
+        if not words:
+            # Nothing typed yet: the start of the catalog by name
+            return sorted(self.names, key=self.names.__getitem__)[:limit]
+        # Smallest set first keeps the intersection cheap
+        sets = sorted((self._prefix(word) for word in words), key=len)
+        matches = set(sets[0]).intersection(*sets[1:])
+        return sorted(
+            matches,
+            key=lambda entry_id: (not self.names[entry_id].startswith(folded), self.names[entry_id])
+        )[:limit]
+
+class CatalogSuggester:
+    """Prefix index over a catalog loaded through `load`"""
+
+    def __init__(
+        self,
+        load: Callable[[], Awaitable[List[dict]]],
+        fold: Callable[[str], str],
+        texts: Callable[[dict], List[str]] = lambda entry: [],
+        max_age: float = 60.0
+    ):
+        self.load = load
+        self.fold = fold
+        self.texts = texts
+        self.max_age = max_age
+        self.index: Optional[PrefixIndex] = None
+        self.entries: Dict[str, dict] = {}
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def stale(self) -> bool:
+        return self.index is None or time.monotonic() - self.loaded_at > self.max_age
+
+    async def reload(self, if_stale: bool = False) -> None:
+        async with self._lock:
+            # Concurrent callers that waited on the lock reuse the fresh index
+            if if_stale and not self.stale():
+                return
+            entries = await self.load()
+            self.index = PrefixIndex(((e["id"], e["name"], self.texts(e)) for e in entries), self.fold)
+            self.entries = {e["id"]: e for e in entries}
+            self.loaded_at = time.monotonic()
+
+    async def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        if self.stale():
+            await self.reload(if_stale=True)
+        return [self.entries[entry_id] for entry_id in self.index.search(query, limit)]
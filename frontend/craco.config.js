@@ -68,6 +68,41 @@ const webpackConfig = {
         webpackConfig.plugins.push(healthPluginInstance);
       }
 
+      // Production chunking: the framework rarely changes, so it gets its own
+      // long-cached chunk; Radix primitives shared by several role sections
+      // are pulled out once; everything else stays with the route chunk that
+      // uses it. Sizes are checked by `yarn build:budget`.
+      if (webpackConfig.mode === "production") {
+        webpackConfig.optimization.splitChunks = {
+          chunks: "all",
+          cacheGroups: {
+            framework: {
+              name: "framework",
+              test: /[\\/]node_modules[\\/](react|react-dom|react-router|react-router-dom|scheduler)[\\/]/,
+              priority: 40,
+              enforce: true,
+            },
+            radix: {
+              name: "radix",
+              test: /[\\/]node_modules[\\/](@radix-ui|@floating-ui)[\\/]/,
+              minChunks: 2,
+              priority: 30,
+              reuseExistingChunk: true,
+            },
+            vendors: {
+              test: /[\\/]node_modules[\\/]/,
+              priority: -10,
+              reuseExistingChunk: true,
+            },
+          },
+        };
+        webpackConfig.performance = {
+          hints: "warning",
+          maxEntrypointSize: 250 * 1024,
+          maxAssetSize: 200 * 1024,
+        };
+      }
+
       return webpackConfig;
     },
   },
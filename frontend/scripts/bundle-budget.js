@@ -0,0 +1,96 @@
+// Bundle size budget report for the production build.
+//
+// Run after `yarn build` (or use `yarn build:budget`). Prints the gzip size
+// of every JS/CSS chunk against bundle-budget.json (KB, gzip) plus, for each
+// role, what the browser downloads before the first page of that role can
+// render: the entrypoint files plus the role's route chunk. Shared async
+// chunks split out by webpack are listed on their own. Exits with 1 when
+// anything is over budget so CI can fail the build.
+const fs = require("fs");
+const path = require("path");
+const zlib = require("zlib");
+
+const root = path.resolve(__dirname, "..");
+const buildDir = path.join(root, "build");
+const budgets = JSON.parse(fs.readFileSync(path.join(root, "bundle-budget.json"), "utf8"));
+
+const kb = (bytes) => bytes / 1024;
+const fmt = (bytes) => `${kb(bytes).toFixed(1)} KB`;
+
+// "static/js/asesor.1a2b3c4d.chunk.js" -> "asesor"
+const chunkName = (file) => path.basename(file).split(".")[0];
+
+const readAssets = () => {
+  const manifestPath = path.join(buildDir, "asset-manifest.json");
+  if (!fs.existsSync(manifestPath)) {
+    console.error("No build/asset-manifest.json found. Run `yarn build` first.");
+    process.exit(2);
+  }
+  const manifest = JSON.parse(fs.readFileSync(manifestPath, "utf8"));
+  const entry = new Set(manifest.entrypoints || []);
+  const assets = [];
+  for (const dir of ["static/js", "static/css"]) {
+    const full = path.join(buildDir, dir);
+    if (!fs.existsSync(full)) continue;
+    for (const name of fs.readdirSync(full)) {
+      if (!/\.(js|css)$/.test(name)) continue;
+      const file = `${dir}/${name}`;
+      const contents = fs.readFileSync(path.join(buildDir, file));
+      assets.push({
+        file,
+        name: chunkName(file),
+        type: name.endsWith(".css") ? "css" : "js",
+        raw: contents.length,
+        gzip: zlib.gzipSync(contents, { level: 9 }).length,
+        entry: entry.has(file),
+      });
+    }
+  }
+  return assets.sort((a, b) => b.gzip - a.gzip);
+};
+
+const budgetFor = (asset) => {
+  if (asset.type === "css") return budgets.css;
+  return budgets.chunks[asset.name] ?? budgets.chunks["*"];
+};
+
+const main = () => {
+  const assets = readAssets();
+  let failures = 0;
+
+  console.log("\nChunks (gzip)\n");
+  console.log(`${"file".padEnd(52)}${"raw".padStart(12)}${"gzip".padStart(12)}${"budget".padStart(12)}`);
+  for (const asset of assets) {
+    const budget = budgetFor(asset);
+    const over = budget !== undefined && kb(asset.gzip) > budget;
+    failures += over ? 1 : 0;
+    const flags = `${asset.entry ? " [entry]" : ""}${over ? "  OVER BUDGET" : ""}`;
+    console.log(
+      `${asset.file.padEnd(52)}${fmt(asset.raw).padStart(12)}${fmt(asset.gzip).padStart(12)}` +
+        `${(budget !== undefined ? `${budget} KB` : "-").padStart(12)}${flags}`
+    );
+  }
+
+  const entryBytes = assets.filter((a) => a.entry).reduce((sum, a) => sum + a.gzip, 0);
+  console.log(`\nFirst page per role (entrypoints ${fmt(entryBytes)} + role chunk, gzip)\n`);
+  for (const [role, budget] of Object.entries(budgets.roles || {})) {
+    const roleChunks = assets.filter((a) => a.name === role);
+    if (roleChunks.length === 0) {
+      console.log(`${role.padEnd(12)}no "${role}" chunk found; is the route lazy-loaded?`);
+      failures += 1;
+      continue;
+    }
+    const total = entryBytes + roleChunks.reduce((sum, a) => sum + a.gzip, 0);
+    const over = kb(total) > budget;
+    failures += over ? 1 : 0;
+    console.log(`${role.padEnd(12)}${fmt(total).padStart(12)}${`${budget} KB`.padStart(12)}${over ? "  OVER BUDGET" : ""}`);
+  }
+
+  if (failures) {
+    console.error(`\n${failures} budget(s) exceeded`);
+    process.exit(1);
+  }
+  console.log("\nAll bundles within budget");
+};
+
+main();
@@ -1,23 +1,37 @@
-import React from "react";
+import React, { Suspense, lazy } from "react";
 import "@/App.css";
 import { BrowserRouter, Routes, Route, Navigate } from "react-router-dom";
+import { Loader2 } from "lucide-react";
 import { AuthProvider } from "./context/AuthContext";
 
-// Pages
+// Public pages ship in the main bundle
 import Login from "./pages/Login";
 import Unauthorized from "./pages/Unauthorized";
-import AdminDashboard from "./pages/admin/AdminDashboard";
-import UserManagement from "./pages/admin/UserManagement";
-import AsesorDashboard from "./pages/asesor/AsesorDashboard";
-import CompanyList from "./pages/asesor/CompanyList";
-import CompanyForm from "./pages/asesor/CompanyForm";
-import CompanyDetail from "./pages/asesor/CompanyDetail";
-import ClienteDashboard from "./pages/cliente/ClienteDashboard";
 
 // Components
 import Layout from "./components/layout/Layout";
 import ProtectedRoute from "./components/auth/ProtectedRoute";
 
+// Role sections are split into one chunk per role (admin / asesor / cliente),
+// so each user only downloads the pages they can actually open
+const AdminDashboard = lazy(() => import(/* webpackChunkName: "admin" */ "./pages/admin/AdminDashboard"));
+const UserManagement = lazy(() => import(/* webpackChunkName: "admin" */ "./pages/admin/UserManagement"));
+const DataSpaces = lazy(() => import(/* webpackChunkName: "admin" */ "./pages/admin/DataSpaces"));
+const AsesorDashboard = lazy(() => import(/* webpackChunkName: "asesor" */ "./pages/asesor/AsesorDashboard"));
+const CompanyList = lazy(() => import(/* webpackChunkName: "asesor" */ "./pages/asesor/CompanyList"));
+const CompanyForm = lazy(() => import(/* webpackChunkName: "asesor" */ "./pages/asesor/CompanyForm"));
+const CompanyDetail = lazy(() => import(/* webpackChunkName: "asesor" */ "./pages/asesor/CompanyDetail"));
+const ArchivedCompanies = lazy(() => import(/* webpackChunkName: "asesor" */ "./pages/asesor/ArchivedCompanies"));
+const ClienteDashboard = lazy(() => import(/* webpackChunkName: "cliente" */ "./pages/cliente/ClienteDashboard"));
+
+const PageLoader = () => (
+  <div className="min-h-[50vh] flex items-center justify-center">
+    <Loader2 className="h-8 w-8 animate-spin text-[#8b1530]" />
+  </div>
+);
+
+const page = (element) => <Suspense fallback={<PageLoader />}>{element}</Suspense>;
+
 function App() {
   return (
     <AuthProvider>
@@ -36,8 +50,9 @@ function App() {
               </ProtectedRoute>
             }
           >
-            <Route index element={<AdminDashboard />} />
-            <Route path="users" element={<UserManagement />} />
+            <Route index element={page(<AdminDashboard />)} />
+            <Route path="users" element={page(<UserManagement />)} />
+            <Route path="espacios" element={page(<DataSpaces />)} />
           </Route>
 
           {/* Asesor Routes */}
@@ -49,11 +64,12 @@ function App() {
               </ProtectedRoute>
             }
           >
-            <Route index element={<AsesorDashboard />} />
-            <Route path="empresas" element={<CompanyList />} />
-            <Route path="empresas/nueva" element={<CompanyForm />} />
-            <Route path="empresas/:id" element={<CompanyDetail />} />
-            <Route path="empresas/:id/editar" element={<CompanyForm />} />
+            <Route index element={page(<AsesorDashboard />)} />
+            <Route path="empresas" element={page(<CompanyList />)} />
+            <Route path="empresas/nueva" element={page(<CompanyForm />)} />
+            <Route path="empresas/:id" element={page(<CompanyDetail />)} />
+            <Route path="empresas/:id/editar" element={page(<CompanyForm />)} />
+            <Route path="archivo" element={page(<ArchivedCompanies />)} />
           </Route>
 
           {/* Cliente Routes */}
@@ -65,7 +81,7 @@ function App() {
               </ProtectedRoute>
             }
           >
-            <Route index element={<ClienteDashboard />} />
+            <Route index element={page(<ClienteDashboard />)} />
           </Route>
 
           {/* Default redirect */}
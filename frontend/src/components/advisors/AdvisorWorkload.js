@@ -0,0 +1,202 @@
+import React, { useState } from 'react';
+import { api, invalidate } from '../../lib/api';
+import { useApi } from '../../hooks/use-api';
+import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../ui/card';
+import { Button } from '../ui/button';
+import { Label } from '../ui/label';
+import { Alert, AlertDescription } from '../ui/alert';
+import {
+  Dialog,
+  DialogContent,
+  DialogDescription,
+  DialogFooter,
+  DialogHeader,
+  DialogTitle,
+} from '../ui/dialog';
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from '../ui/select';
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from '../ui/table';
+import { Briefcase, Loader2, Shuffle } from 'lucide-react';
+
+const UNASSIGNED = 'none';
+const ALL_STATUSES = 'all';
+
+// Companies per asesor and status (GET /advisors/workload), lightest open
+// lead queue first, with bulk reassignment of one asesor's companies
+const AdvisorWorkload = () => {
+  const { data, loading } = useApi('/advisors/workload');
+  const advisors = data?.advisors || [];
+  const unassigned = data?.unassigned || {};
+  const [source, setSource] = useState(null);
+  const [target, setTarget] = useState(UNASSIGNED);
+  const [status, setStatus] = useState('lead');
+  const [error, setError] = useState('');
+  const [submitting, setSubmitting] = useState(false);
+
+  const openReassign = (advisor) => {
+    setSource(advisor);
+    setTarget(UNASSIGNED);
+    setStatus('lead');
+    setError('');
+  };
+
+  const handleReassign = async () => {
+    setSubmitting(true);
+    setError('');
+    try {
+      await api.post(`/advisors/${source.id}/reassign`, {
+        to_owner_id: target === UNASSIGNED ? null : target,
+        status: status === ALL_STATUSES ? null : status
+      });
+      invalidate('/advisors');
+      invalidate('/companies');
+      invalidate('/projects');
+      setSource(null);
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Error al reasignar las empresas');
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
+  return (
+    <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]" data-testid="advisor-workload">
+      <CardHeader>
+        <CardTitle className="text-lg flex items-center gap-2">
+          <Briefcase className="h-5 w-5 text-[#8b1530]" />
+          Carga de trabajo por asesor
+        </CardTitle>
+        <CardDescription>
+          Empresas asignadas a cada asesor; {unassigned.total ?? 0} sin asignar ({unassigned.lead ?? 0} en evaluación)
+        </CardDescription>
+      </CardHeader>
+      <CardContent>
+        {loading ? (
+          <div className="flex items-center justify-center py-8">
+            <Loader2 className="h-6 w-6 animate-spin text-[#8b1530]" />
+          </div>
+        ) : advisors.length === 0 ? (
+          <p className="text-[#64748b] text-center py-8">Todavía no hay asesores</p>
+        ) : (
+          <Table>
+            <TableHeader>
+              <TableRow>
+                <TableHead>Asesor</TableHead>
+                <TableHead className="text-right">En evaluación</TableHead>
+                <TableHead className="text-right">Aptas</TableHead>
+                <TableHead className="text-right">Descartadas</TableHead>
+                <TableHead className="text-right">Total</TableHead>
+                <TableHead className="text-right">Acciones</TableHead>
+              </TableRow>
+            </TableHeader>
+            <TableBody>
+              {advisors.map((advisor) => (
+                <TableRow key={advisor.id} data-testid={`workload-row-${advisor.id}`}>
+                  <TableCell>
+                    <p className="font-medium text-[#0f172a]">{advisor.name}</p>
+                    <p className="text-xs text-[#64748b]">{advisor.email}</p>
+                  </TableCell>
+                  <TableCell className="text-right font-medium">{advisor.lead}</TableCell>
+                  <TableCell className="text-right">{advisor.apta}</TableCell>
+                  <TableCell className="text-right">{advisor.descartada}</TableCell>
+                  <TableCell className="text-right text-[#64748b]">{advisor.total}</TableCell>
+                  <TableCell className="text-right">
+                    <Button
+                      variant="ghost"
+                      size="sm"
+                      onClick={() => openReassign(advisor)}
+                      disabled={advisor.total === 0}
+                      data-testid={`reassign-${advisor.id}`}
+                      className="text-[#64748b] hover:text-[#0f172a]"
+                      title="Reasignar empresas"
+                    >
+                      <Shuffle className="h-4 w-4" />
+                    </Button>
+                  </TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        )}
+      </CardContent>
+
+      <Dialog open={source !== null} onOpenChange={(open) => !open && setSource(null)}>
+        <DialogContent>
+          <DialogHeader>
+            <DialogTitle>Reasignar empresas</DialogTitle>
+            <DialogDescription>
+              Mueve las empresas de <strong>{source?.name}</strong> a otro asesor o a la cola sin asignar.
+            </DialogDescription>
+          </DialogHeader>
+          <div className="space-y-4 py-2">
+            {error && (
+              <Alert variant="destructive">
+                <AlertDescription>{error}</AlertDescription>
+              </Alert>
+            )}
+            <div className="space-y-2">
+              <Label>Empresas</Label>
+              <Select value={status} onValueChange={setStatus}>
+                <SelectTrigger data-testid="reassign-status">
+                  <SelectValue />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="lead">En evaluación</SelectItem>
+                  <SelectItem value="apta">Aptas</SelectItem>
+                  <SelectItem value="descartada">Descartadas</SelectItem>
+                  <SelectItem value={ALL_STATUSES}>Todas</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+            <div className="space-y-2">
+              <Label>Nuevo asesor</Label>
+              <Select value={target} onValueChange={setTarget}>
+                <SelectTrigger data-testid="reassign-target">
+                  <SelectValue />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value={UNASSIGNED}>Sin asignar</SelectItem>
+                  {advisors
+                    .filter((advisor) => advisor.id !== source?.id)
+                    .map((advisor) => (
+                      <SelectItem key={advisor.id} value={advisor.id}>
+                        {advisor.name} ({advisor.lead} en evaluación)
+                      </SelectItem>
+                    ))}
+                </SelectContent>
+              </Select>
+            </div>
+          </div>
+          <DialogFooter>
+            <Button variant="outline" onClick={() => setSource(null)}>
+              Cancelar
+            </Button>
+            <Button
+              onClick={handleReassign}
+              disabled={submitting}
+              data-testid="confirm-reassign"
+              className="bg-[#8b1530] hover:bg-[#701126]"
+            >
+              {submitting && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Reasignar
+            </Button>
+          </DialogFooter>
+        </DialogContent>
+      </Dialog>
+    </Card>
+  );
+};
+
+export default AdvisorWorkload;
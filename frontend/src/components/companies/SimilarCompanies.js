@@ -0,0 +1,82 @@
+import React from 'react';
+import { useNavigate } from 'react-router-dom';
+import { useApi } from '../../hooks/use-api';
+import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../ui/card';
+import { Building2, Database, Loader2, Users } from 'lucide-react';
+
+// Companies that already passed the diagnostic and look most like this one
+// (sector, size and intake answers), and the data spaces their projects join
+// (GET /companies/{id}/similar).
+const SimilarCompanies = ({ companyId, k = 5 }) => {
+  const navigate = useNavigate();
+  const { data, loading } = useApi(`/companies/${companyId}/similar?k=${k}`);
+  const items = data?.items || [];
+  const spaces = data?.spaces || [];
+
+  return (
+    <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)] mt-6" data-testid="similar-companies">
+      <CardHeader>
+        <CardTitle className="text-lg flex items-center gap-2">
+          <Users className="h-5 w-5 text-[#8b1530]" />
+          Empresas similares
+        </CardTitle>
+        <CardDescription>Empresas aptas con un perfil parecido y los espacios a los que se incorporan</CardDescription>
+      </CardHeader>
+      <CardContent className="space-y-4">
+        {loading ? (
+          <div className="flex items-center justify-center py-6">
+            <Loader2 className="h-6 w-6 animate-spin text-[#8b1530]" />
+          </div>
+        ) : items.length === 0 ? (
+          <p className="text-[#64748b] text-center py-6">Todavía no hay empresas aptas con un perfil parecido</p>
+        ) : (
+          <>
+            {spaces.length > 0 && (
+              <div className="flex flex-wrap items-center gap-2">
+                <span className="text-sm text-[#64748b]">Espacios recomendados:</span>
+                {spaces.map((space) => (
+                  <span
+                    key={space.space_id}
+                    className="inline-flex items-center gap-1 px-3 py-1 rounded-full text-sm font-medium bg-[#fbeff3] text-[#8b1530]"
+                    data-testid={`recommended-space-${space.space_id}`}
+                  >
+                    <Database className="h-3.5 w-3.5" />
+                    {space.space_name || 'Sin nombre'}
+                    <span className="text-xs text-[#64748b]">({space.companies})</span>
+                  </span>
+                ))}
+              </div>
+            )}
+            <ul className="divide-y">
+              {items.map(({ company, similarity, space_name, target_role }) => (
+                <li
+                  key={company.id}
+                  onClick={() => navigate(`/asesor/empresas/${company.id}`)}
+                  className="flex items-center justify-between gap-4 py-3 cursor-pointer hover:bg-[#f8fafc]"
+                  data-testid={`similar-company-${company.id}`}
+                >
+                  <div className="flex items-center gap-3 min-w-0">
+                    <div className="h-9 w-9 rounded-lg bg-[#fbeff3] flex items-center justify-center shrink-0">
+                      <Building2 className="h-5 w-5 text-[#8b1530]" />
+                    </div>
+                    <div className="min-w-0">
+                      <p className="font-medium text-[#0f172a] truncate">{company.name}</p>
+                      <p className="text-sm text-[#64748b] truncate">
+                        {[company.sector, company.size_range, space_name && `${space_name}${target_role ? ` · ${target_role}` : ''}`]
+                          .filter(Boolean)
+                          .join(' · ')}
+                      </p>
+                    </div>
+                  </div>
+                  <span className="text-sm font-medium text-[#0f172a] shrink-0">{Math.round(similarity * 100)}%</span>
+                </li>
+              ))}
+            </ul>
+          </>
+        )}
+      </CardContent>
+    </Card>
+  );
+};
+
+export default SimilarCompanies;
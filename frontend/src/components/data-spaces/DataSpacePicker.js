@@ -0,0 +1,136 @@
+import React, { useEffect, useState } from 'react';
+import { fetchCached } from '../../lib/api';
+import { Input } from '../ui/input';
+import { Database, Loader2, X } from 'lucide-react';
+
+// Autocomplete over the data space catalog (GET /data-spaces/suggest).
+// Matches word prefixes of names and aliases, accents ignored. Only catalog
+// entries can be picked: `onSelect` receives the entry, or null when the
+// space is cleared. Suggestions go through the request cache, so retyping a
+// query is instant.
+const DataSpacePicker = ({ id = 'space_name', value, onSelect, disabled }) => {
+  const [query, setQuery] = useState(value || '');
+  const [open, setOpen] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+  const [loading, setLoading] = useState(false);
+  const [active, setActive] = useState(0);
+
+  useEffect(() => {
+    setQuery(value || '');
+  }, [value]);
+
+  useEffect(() => {
+    if (!open) return undefined;
+    let cancelled = false;
+    const timeout = setTimeout(async () => {
+      setLoading(true);
+      try {
+        const data = await fetchCached(`/data-spaces/suggest?${new URLSearchParams({ q: query.trim() })}`);
+        if (!cancelled) {
+          setSuggestions(data);
+          setActive(0);
+        }
+      } catch (error) {
+        if (!cancelled) setSuggestions([]);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timeout);
+    };
+  }, [query, open]);
+
+  const select = (space) => {
+    setOpen(false);
+    setQuery(space ? space.name : '');
+    onSelect(space);
+  };
+
+  const handleKeyDown = (e) => {
+    if (e.key === 'ArrowDown') {
+      e.preventDefault();
+      setOpen(true);
+      setActive((index) => Math.min(index + 1, suggestions.length - 1));
+    } else if (e.key === 'ArrowUp') {
+      e.preventDefault();
+      setActive((index) => Math.max(index - 1, 0));
+    } else if (e.key === 'Enter' && open && suggestions[active]) {
+      e.preventDefault();
+      select(suggestions[active]);
+    } else if (e.key === 'Escape') {
+      setOpen(false);
+      setQuery(value || '');
+    }
+  };
+
+  return (
+    <div className="relative">
+      <Database className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-[#64748b]" />
+      <Input
+        id={id}
+        value={query}
+        onChange={(e) => {
+          setQuery(e.target.value);
+          setOpen(true);
+        }}
+        onFocus={() => setOpen(true)}
+        onBlur={() => {
+          // Free text is never saved: fall back to the current space
+          setOpen(false);
+          setQuery(value || '');
+        }}
+        onKeyDown={handleKeyDown}
+        disabled={disabled}
+        placeholder="Busca un espacio de datos..."
+        autoComplete="off"
+        role="combobox"
+        aria-expanded={open}
+        data-testid="space-name-select"
+        className="pl-10 pr-9"
+      />
+      {value && !disabled && (
+        <button
+          type="button"
+          onMouseDown={(e) => e.preventDefault()}
+          onClick={() => select(null)}
+          title="Quitar espacio"
+          className="absolute right-3 top-1/2 -translate-y-1/2 text-[#64748b] hover:text-[#0f172a]"
+        >
+          <X className="h-4 w-4" />
+        </button>
+      )}
+      {open && (
+        <ul role="listbox" className="absolute z-20 mt-1 w-full max-h-64 overflow-auto rounded-md border bg-white py-1 shadow-lg">
+          {loading && suggestions.length === 0 ? (
+            <li className="flex items-center gap-2 px-3 py-2 text-sm text-[#64748b]">
+              <Loader2 className="h-4 w-4 animate-spin" />
+              Buscando...
+            </li>
+          ) : suggestions.length === 0 ? (
+            <li className="px-3 py-2 text-sm text-[#64748b]">Sin coincidencias en el catálogo</li>
+          ) : (
+            suggestions.map((space, index) => (
+              <li
+                key={space.id}
+                role="option"
+                aria-selected={index === active}
+                onMouseDown={(e) => e.preventDefault()}
+                onClick={() => select(space)}
+                onMouseEnter={() => setActive(index)}
+                data-testid={`space-option-${space.id}`}
+                className={`cursor-pointer px-3 py-2 text-sm ${index === active ? 'bg-[#fbeff3] text-[#8b1530]' : 'text-[#0f172a]'}`}
+              >
+                <span className="font-medium">{space.name}</span>
+                {space.sector && <span className="ml-2 text-xs text-[#64748b]">{space.sector}</span>}
+              </li>
+            ))
+          )}
+        </ul>
+      )}
+    </div>
+  );
+};
+
+export default DataSpacePicker;
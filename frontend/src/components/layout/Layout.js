@@ -9,7 +9,9 @@ import {
   LogOut,
   ChevronRight,
   Building2,
-  FileText
+  FileText,
+  Database,
+  Archive
 } from 'lucide-react';
 import { Button } from '../ui/button';
 
@@ -28,12 +30,14 @@ const Layout = () => {
       return [
         { path: '/admin', label: 'Dashboard', icon: LayoutDashboard },
         { path: '/admin/users', label: 'Usuarios', icon: Users },
+        { path: '/admin/espacios', label: 'Espacios de Datos', icon: Database },
       ];
     }
     if (isAsesor) {
       return [
         { path: '/asesor', label: 'Dashboard', icon: LayoutDashboard },
         { path: '/asesor/empresas', label: 'Empresas', icon: Building2 },
+        { path: '/asesor/archivo', label: 'Archivo', icon: Archive },
       ];
     }
     if (isCliente) {
@@ -1,10 +1,8 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
-import axios from 'axios';
+import { api, clearCache } from '../lib/api';
 
 const AuthContext = createContext(null);
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 export const AuthProvider = ({ children }) => {
   const [user, setUser] = useState(null);
   const [token, setToken] = useState(localStorage.getItem('token'));
@@ -14,7 +12,7 @@ export const AuthProvider = ({ children }) => {
     const initAuth = async () => {
       if (token) {
         try {
-          const response = await axios.get(`${API_URL}/auth/me`, {
+          const response = await api.get('/auth/me', {
             headers: { Authorization: `Bearer ${token}` }
           });
           setUser(response.data);
@@ -29,9 +27,11 @@ export const AuthProvider = ({ children }) => {
   }, [token]);
 
   const login = async (email, password) => {
-    const response = await axios.post(`${API_URL}/auth/login`, { email, password });
+    const response = await api.post('/auth/login', { email, password });
     const { token: newToken, user: userData } = response.data;
     
+    // Cached responses belong to the previous session
+    clearCache();
     localStorage.setItem('token', newToken);
     setToken(newToken);
     setUser(userData);
@@ -40,6 +40,7 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
+    clearCache();
     localStorage.removeItem('token');
     setToken(null);
     setUser(null);
@@ -0,0 +1,113 @@
+import { useCallback, useEffect, useReducer, useRef, useState } from 'react';
+import {
+  api,
+  DEFAULT_STALE_TIME,
+  getCached,
+  isStale,
+  revalidate,
+  setCached,
+  subscribe,
+} from '../lib/api';
+
+// Read an API path through the shared cache (see lib/api.js).
+//
+// Returns cached data straight away and revalidates it in the background
+// when stale. `path` may be null to skip fetching. `refreshInterval` (ms)
+// polls while the component is mounted.
+export function useApi(path, { staleTime = DEFAULT_STALE_TIME, refreshInterval = 0 } = {}) {
+  const [, rerender] = useReducer((n) => n + 1, 0);
+
+  useEffect(() => {
+    if (!path) return undefined;
+    const unsubscribe = subscribe(path, rerender);
+    if (isStale(path, staleTime)) {
+      revalidate(path).catch(() => {});
+    }
+    let timer;
+    if (refreshInterval > 0) {
+      timer = setInterval(() => revalidate(path).catch(() => {}), refreshInterval);
+    }
+    return () => {
+      unsubscribe();
+      clearInterval(timer);
+    };
+  }, [path, staleTime, refreshInterval]);
+
+  const entry = path ? getCached(path) : undefined;
+  const refresh = useCallback(() => (path ? revalidate(path) : Promise.resolve()), [path]);
+  const mutate = useCallback((data) => path && setCached(path, data), [path]);
+
+  return {
+    data: entry?.data,
+    headers: entry?.headers || {},
+    error: entry?.error || null,
+    loading: Boolean(path) && entry?.data === undefined && !entry?.error,
+    validating: Boolean(entry?.promise),
+    refresh,
+    mutate,
+  };
+}
+
+const withParams = (path, params) => (
+  `${path}${path.includes('?') ? '&' : '?'}${new URLSearchParams(params).toString()}`
+);
+
+// Read a keyset-paginated list (X-Next-Cursor / X-Total-Count) page by page.
+//
+// The first page goes through useApi, so it is cached and refetched when the
+// path is invalidated. Whenever it changes (other filters, a mutation, a
+// refresh) the pages loaded after it are dropped and loading starts over from
+// its cursor. `loadMore` appends the next page; repeated calls for the same
+// page are ignored. Later pages are not cached: they only make sense on top
+// of the first page they were loaded with.
+export function useInfiniteApi(path, { pageSize = 100, staleTime = DEFAULT_STALE_TIME } = {}) {
+  const first = useApi(path ? withParams(path, { limit: pageSize }) : null, { staleTime });
+  const [more, setMore] = useState({ head: undefined, rows: [], cursor: null, loading: false, error: null });
+  const pending = useRef(null);
+
+  const current = more.head === first.data ? more : {
+    head: first.data,
+    rows: first.data || [],
+    cursor: first.headers['x-next-cursor'] || null,
+    loading: false,
+    error: null,
+  };
+  const state = useRef(current);
+  state.current = current;
+
+  const loadMore = useCallback(async () => {
+    const { head, cursor } = state.current;
+    if (!path || head === undefined || !cursor) return;
+    if (pending.current && pending.current.head === head && pending.current.cursor === cursor) return;
+    pending.current = { head, cursor };
+    setMore({ ...state.current, loading: true });
+    try {
+      const response = await api.get(withParams(path, { limit: pageSize, cursor }));
+      setMore((prev) => (prev.head !== head ? prev : {
+        ...prev,
+        rows: [...prev.rows, ...response.data],
+        cursor: response.headers['x-next-cursor'] || null,
+        loading: false,
+      }));
+    } catch (error) {
+      setMore((prev) => (prev.head !== head ? prev : { ...prev, loading: false, error }));
+    } finally {
+      if (pending.current && pending.current.head === head && pending.current.cursor === cursor) {
+        pending.current = null;
+      }
+    }
+  }, [path, pageSize]);
+
+  return {
+    rows: current.rows,
+    total: Number(first.headers['x-total-count'] ?? current.rows.length),
+    hasMore: Boolean(current.cursor),
+    loading: first.loading,
+    loadingMore: current.loading,
+    error: first.error || current.error,
+    loadMore,
+    refresh: first.refresh,
+  };
+}
+
+export default useApi;
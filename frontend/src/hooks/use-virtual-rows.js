@@ -0,0 +1,58 @@
+import { useCallback, useEffect, useState } from 'react';
+
+// Windowing for long tables with fixed-height rows.
+//
+// Attach `containerRef` to the scrolling element; only rows `start`..`end`
+// (plus `overscan` on each side) are rendered and two spacer rows of
+// `paddingTop` / `paddingBottom` px keep the scrollbar true to the full list,
+// so the DOM stays the same size however many rows are loaded. Scroll events
+// are folded into one update per animation frame.
+export function useVirtualRows({ count, rowHeight, overscan = 10 }) {
+  const [container, setContainer] = useState(null);
+  const [viewport, setViewport] = useState({ scrollTop: 0, height: 0 });
+
+  useEffect(() => {
+    if (!container) return undefined;
+    let frame = 0;
+    const measure = () => {
+      frame = 0;
+      setViewport((current) => (
+        current.scrollTop === container.scrollTop && current.height === container.clientHeight
+          ? current
+          : { scrollTop: container.scrollTop, height: container.clientHeight }
+      ));
+    };
+    const onScroll = () => {
+      if (!frame) frame = requestAnimationFrame(measure);
+    };
+    measure();
+    container.addEventListener('scroll', onScroll, { passive: true });
+    const observer = typeof ResizeObserver !== 'undefined' ? new ResizeObserver(onScroll) : null;
+    observer?.observe(container);
+    return () => {
+      container.removeEventListener('scroll', onScroll);
+      observer?.disconnect();
+      cancelAnimationFrame(frame);
+    };
+  }, [container]);
+
+  const first = Math.floor(viewport.scrollTop / rowHeight);
+  const visible = Math.ceil(viewport.height / rowHeight) + 1;
+  const start = Math.max(0, Math.min(count, first - overscan));
+  const end = Math.min(count, first + visible + overscan);
+
+  const scrollToTop = useCallback(() => {
+    if (container) container.scrollTop = 0;
+  }, [container]);
+
+  return {
+    containerRef: setContainer,
+    start,
+    end,
+    paddingTop: start * rowHeight,
+    paddingBottom: (count - end) * rowHeight,
+    scrollToTop,
+  };
+}
+
+export default useVirtualRows;
@@ -0,0 +1,153 @@
+import axios from 'axios';
+
+export const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
+
+// Shared axios instance: adds the bearer token from the session so pages
+// don't build auth headers by hand
+export const api = axios.create({ baseURL: API_URL });
+
+api.interceptors.request.use((config) => {
+  const token = localStorage.getItem('token');
+  if (token && !config.headers.Authorization) {
+    config.headers.Authorization = `Bearer ${token}`;
+  }
+  return config;
+});
+
+// ---------------------------------------------------------------------------
+// GET cache: stale-while-revalidate with in-flight deduplication.
+//
+// Entries are keyed by request path (including the query string). A read
+// returns the cached data immediately; if it is older than `staleTime` a
+// single background request refreshes it and every subscriber re-renders.
+// Concurrent reads of the same path share one request. Mutations call
+// `invalidate` (or `setCached` with the fresh server response) so the next
+// read doesn't serve outdated data.
+// ---------------------------------------------------------------------------
+export const DEFAULT_STALE_TIME = 30 * 1000;
+const MAX_ENTRIES = 200;
+
+const cache = new Map();
+
+const getEntry = (key) => {
+  let entry = cache.get(key);
+  if (!entry) {
+    entry = {
+      data: undefined, headers: {}, error: null, fetchedAt: 0, generation: 0, promise: null, listeners: new Set(),
+    };
+    cache.set(key, entry);
+    evict(key);
+  }
+  return entry;
+};
+
+// Drop the oldest entries nobody is watching once the cache grows too big
+const evict = (keep) => {
+  if (cache.size <= MAX_ENTRIES) return;
+  const idle = [...cache.entries()]
+    .filter(([key, entry]) => key !== keep && entry.listeners.size === 0 && !entry.promise)
+    .sort((a, b) => a[1].fetchedAt - b[1].fetchedAt);
+  for (const [key] of idle.slice(0, cache.size - MAX_ENTRIES)) {
+    cache.delete(key);
+  }
+};
+
+const notify = (entry) => entry.listeners.forEach((listener) => listener());
+
+export const getCached = (key) => cache.get(key);
+
+export const isStale = (key, staleTime = DEFAULT_STALE_TIME) => {
+  const entry = cache.get(key);
+  return !entry || entry.fetchedAt === 0 || Date.now() - entry.fetchedAt > staleTime;
+};
+
+// Fetch `key`, sharing any request already in flight for it
+export const revalidate = (key) => {
+  const entry = getEntry(key);
+  if (entry.promise) return entry.promise;
+  const generation = entry.generation;
+  entry.promise = api.get(key)
+    .then((response) => {
+      // Invalidated or overwritten while in flight: this response may predate
+      // the mutation, so keep what the cache has now
+      if (generation === entry.generation) {
+        entry.data = response.data;
+        entry.headers = response.headers;
+        entry.error = null;
+        entry.fetchedAt = Date.now();
+      }
+      return response.data;
+    })
+    .catch((error) => {
+      entry.error = error;
+      throw error;
+    })
+    .finally(() => {
+      entry.promise = null;
+      notify(entry);
+      if (generation !== entry.generation && entry.fetchedAt === 0 && entry.listeners.size > 0) {
+        revalidate(key).catch(() => {});
+      }
+    });
+  notify(entry);
+  return entry.promise;
+};
+
+// Cached data when fresh, otherwise a (deduplicated) request
+export const fetchCached = (key, { staleTime = DEFAULT_STALE_TIME, force = false } = {}) => {
+  if (!force && !isStale(key, staleTime)) {
+    return Promise.resolve(cache.get(key).data);
+  }
+  return revalidate(key);
+};
+
+// Store a server response we already have (e.g. the body of a PUT)
+export const setCached = (key, data) => {
+  const entry = getEntry(key);
+  entry.data = data;
+  entry.error = null;
+  entry.fetchedAt = Date.now();
+  entry.generation += 1;
+  notify(entry);
+};
+
+// Mark entries stale: a string matches that path and everything below it
+// ("/companies" also matches "/companies?status=lead" and "/companies/42"),
+// a function receives each key. Watched entries refetch right away.
+export const invalidate = (match) => {
+  const matches = typeof match === 'function'
+    ? match
+    : (key) => key === match || key.startsWith(`${match}/`) || key.startsWith(`${match}?`);
+  for (const [key, entry] of cache.entries()) {
+    if (!matches(key)) continue;
+    entry.fetchedAt = 0;
+    entry.generation += 1;
+    if (entry.listeners.size > 0 && !entry.promise) {
+      revalidate(key).catch(() => {});
+    }
+  }
+};
+
+export const subscribe = (key, listener) => {
+  const entry = getEntry(key);
+  entry.listeners.add(listener);
+  return () => entry.listeners.delete(listener);
+};
+
+// Forget everything, e.g. when the session changes
+export const clearCache = () => cache.clear();
+
+// Background refresh: when the tab regains focus or the network comes back,
+// refetch whatever is on screen and already stale
+const refreshVisible = () => {
+  for (const [key, entry] of cache.entries()) {
+    if (entry.listeners.size > 0 && isStale(key)) {
+      revalidate(key).catch(() => {});
+    }
+  }
+};
+
+if (typeof window !== 'undefined') {
+  window.addEventListener('focus', refreshVisible);
+  window.addEventListener('online', refreshVisible);
+}
@@ -4,6 +4,7 @@ import { useAuth } from '../../context/AuthContext';
 import axios from 'axios';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
+import AdvisorWorkload from '../../components/advisors/AdvisorWorkload';
 import { 
   Users, 
   UserCheck, 
@@ -31,17 +32,23 @@ const AdminDashboard = () => {
   useEffect(() => {
     const fetchStats = async () => {
       try {
-        const response = await axios.get(`${API_URL}/users`, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
-        const users = response.data;
-        setStats({
-          total: users.length,
-          admins: users.filter(u => u.role === 'admin').length,
-          asesores: users.filter(u => u.role === 'asesor').length,
-          clientes: users.filter(u => u.role === 'cliente').length,
-          pending: users.filter(u => !u.role).length
-        });
+        // One count per role from X-Total-Count; no need to download every user
+        const countUsers = async (role) => {
+          const params = new URLSearchParams({ limit: '1' });
+          if (role) params.append('role', role);
+          const response = await axios.get(`${API_URL}/users?${params.toString()}`, {
+            headers: { Authorization: `Bearer ${token}` }
+          });
+          return Number(response.headers['x-total-count'] ?? response.data.length);
+        };
+        const [total, admins, asesores, clientes, pending] = await Promise.all([
+          countUsers(null),
+          countUsers('admin'),
+          countUsers('asesor'),
+          countUsers('cliente'),
+          countUsers('sin_rol')
+        ]);
+        setStats({ total, admins, asesores, clientes, pending });
       } catch (error) {
         console.error('Error fetching stats:', error);
       }
@@ -190,6 +197,8 @@ const AdminDashboard = () => {
           </CardContent>
         </Card>
       </div>
+
+      <AdvisorWorkload />
     </div>
   );
 };
@@ -0,0 +1,325 @@
+import React, { useState } from 'react';
+import { api, invalidate } from '../../lib/api';
+import { useApi } from '../../hooks/use-api';
+import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
+import { Button } from '../../components/ui/button';
+import { Input } from '../../components/ui/input';
+import { Label } from '../../components/ui/label';
+import { Textarea } from '../../components/ui/textarea';
+import {
+  Dialog,
+  DialogContent,
+  DialogDescription,
+  DialogFooter,
+  DialogHeader,
+  DialogTitle,
+} from '../../components/ui/dialog';
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from '../../components/ui/table';
+import { Plus, Pencil, Trash2, Database, Loader2 } from 'lucide-react';
+import { Alert, AlertDescription } from '../../components/ui/alert';
+
+const EMPTY_FORM = { name: '', sector: '', website: '', description: '', aliases: '' };
+
+const DataSpaces = () => {
+  const { data: spaces = [], loading } = useApi('/data-spaces');
+  const [showFormDialog, setShowFormDialog] = useState(false);
+  const [showDeleteDialog, setShowDeleteDialog] = useState(false);
+  const [selectedSpace, setSelectedSpace] = useState(null);
+  const [formData, setFormData] = useState(EMPTY_FORM);
+  const [error, setError] = useState('');
+  const [submitting, setSubmitting] = useState(false);
+
+  const openCreateDialog = () => {
+    setSelectedSpace(null);
+    setFormData(EMPTY_FORM);
+    setError('');
+    setShowFormDialog(true);
+  };
+
+  const openEditDialog = (space) => {
+    setSelectedSpace(space);
+    setFormData({
+      name: space.name,
+      sector: space.sector || '',
+      website: space.website || '',
+      description: space.description || '',
+      aliases: space.aliases.join(', ')
+    });
+    setError('');
+    setShowFormDialog(true);
+  };
+
+  const openDeleteDialog = (space) => {
+    setSelectedSpace(space);
+    setError('');
+    setShowDeleteDialog(true);
+  };
+
+  const handleSave = async (e) => {
+    e.preventDefault();
+    setError('');
+    setSubmitting(true);
+
+    const payload = {
+      name: formData.name,
+      sector: formData.sector || null,
+      website: formData.website || null,
+      description: formData.description || null,
+      aliases: formData.aliases.split(',').map((alias) => alias.trim()).filter(Boolean)
+    };
+
+    try {
+      if (selectedSpace) {
+        await api.put(`/data-spaces/${selectedSpace.id}`, payload);
+        // A rename is copied onto the projects of the space
+        invalidate('/projects');
+      } else {
+        await api.post('/data-spaces', payload);
+      }
+      invalidate('/data-spaces');
+      setShowFormDialog(false);
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Error al guardar el espacio de datos');
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
+  const handleDelete = async () => {
+    setError('');
+    setSubmitting(true);
+
+    try {
+      await api.delete(`/data-spaces/${selectedSpace.id}`);
+      invalidate('/data-spaces');
+      setShowDeleteDialog(false);
+      setSelectedSpace(null);
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Error al eliminar el espacio de datos');
+    } finally {
+      setSubmitting(false);
+    }
+  };
+
+  return (
+    <div data-testid="data-spaces" className="space-y-6">
+      {/* Header */}
+      <div className="flex flex-col sm:flex-row sm:items-center sm:justify-between gap-4">
+        <div>
+          <h1 className="text-3xl font-bold text-[#0f172a] tracking-tight">
+            Espacios de Datos
+          </h1>
+          <p className="text-[#64748b] mt-1">
+            Catálogo de espacios al que se vinculan los proyectos de incorporación
+          </p>
+        </div>
+        <Button
+          onClick={openCreateDialog}
+          data-testid="create-space-btn"
+          className="bg-[#8b1530] hover:bg-[#701126] gap-2"
+        >
+          <Plus className="h-4 w-4" />
+          Nuevo Espacio
+        </Button>
+      </div>
+
+      <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]">
+        <CardHeader>
+          <CardTitle>Espacios ({spaces.length})</CardTitle>
+          <CardDescription>Empresas participantes y proveedoras por espacio</CardDescription>
+        </CardHeader>
+        <CardContent>
+          {loading ? (
+            <div className="flex items-center justify-center py-12">
+              <Loader2 className="h-8 w-8 animate-spin text-[#8b1530]" />
+            </div>
+          ) : spaces.length === 0 ? (
+            <div className="text-center py-12">
+              <Database className="h-12 w-12 text-[#64748b] mx-auto mb-4" />
+              <p className="text-[#64748b]">Todavía no hay espacios de datos en el catálogo</p>
+            </div>
+          ) : (
+            <Table>
+              <TableHeader>
+                <TableRow>
+                  <TableHead>Espacio</TableHead>
+                  <TableHead>Sector</TableHead>
+                  <TableHead>Otros nombres</TableHead>
+                  <TableHead className="text-right">Participantes</TableHead>
+                  <TableHead className="text-right">Proveedores</TableHead>
+                  <TableHead className="text-right">Proyectos</TableHead>
+                  <TableHead className="text-right">Acciones</TableHead>
+                </TableRow>
+              </TableHeader>
+              <TableBody>
+                {spaces.map((space) => (
+                  <TableRow key={space.id} data-testid={`space-row-${space.id}`}>
+                    <TableCell>
+                      <div className="flex items-center gap-3">
+                        <div className="h-9 w-9 rounded-lg bg-[#fbeff3] flex items-center justify-center">
+                          <Database className="h-5 w-5 text-[#8b1530]" />
+                        </div>
+                        <span className="font-medium text-[#0f172a]">{space.name}</span>
+                      </div>
+                    </TableCell>
+                    <TableCell className="text-[#64748b]">{space.sector || '-'}</TableCell>
+                    <TableCell className="text-[#64748b] text-sm">{space.aliases.join(', ') || '-'}</TableCell>
+                    <TableCell className="text-right font-medium">{space.participants}</TableCell>
+                    <TableCell className="text-right font-medium">{space.providers}</TableCell>
+                    <TableCell className="text-right text-[#64748b]">{space.projects}</TableCell>
+                    <TableCell className="text-right">
+                      <div className="flex items-center justify-end gap-2">
+                        <Button
+                          variant="ghost"
+                          size="sm"
+                          onClick={() => openEditDialog(space)}
+                          data-testid={`edit-space-${space.id}`}
+                          className="text-[#64748b] hover:text-[#0f172a]"
+                          title="Editar espacio"
+                        >
+                          <Pencil className="h-4 w-4" />
+                        </Button>
+                        <Button
+                          variant="ghost"
+                          size="sm"
+                          onClick={() => openDeleteDialog(space)}
+                          data-testid={`delete-space-${space.id}`}
+                          className="text-[#64748b] hover:text-red-600"
+                          title="Eliminar espacio"
+                          disabled={space.projects > 0}
+                        >
+                          <Trash2 className="h-4 w-4" />
+                        </Button>
+                      </div>
+                    </TableCell>
+                  </TableRow>
+                ))}
+              </TableBody>
+            </Table>
+          )}
+        </CardContent>
+      </Card>
+
+      {/* Create / Edit Dialog */}
+      <Dialog open={showFormDialog} onOpenChange={setShowFormDialog}>
+        <DialogContent>
+          <form onSubmit={handleSave}>
+            <DialogHeader>
+              <DialogTitle>{selectedSpace ? 'Editar Espacio de Datos' : 'Nuevo Espacio de Datos'}</DialogTitle>
+              <DialogDescription>
+                Los otros nombres se usan en la búsqueda y al vincular proyectos escritos a mano.
+              </DialogDescription>
+            </DialogHeader>
+            <div className="space-y-4 py-4">
+              {error && (
+                <Alert variant="destructive">
+                  <AlertDescription>{error}</AlertDescription>
+                </Alert>
+              )}
+              <div className="space-y-2">
+                <Label htmlFor="space-name">Nombre</Label>
+                <Input
+                  id="space-name"
+                  value={formData.name}
+                  onChange={(e) => setFormData({ ...formData, name: e.target.value })}
+                  data-testid="space-name-input"
+                  required
+                />
+              </div>
+              <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
+                <div className="space-y-2">
+                  <Label htmlFor="space-sector">Sector</Label>
+                  <Input
+                    id="space-sector"
+                    value={formData.sector}
+                    onChange={(e) => setFormData({ ...formData, sector: e.target.value })}
+                  />
+                </div>
+                <div className="space-y-2">
+                  <Label htmlFor="space-website">Web</Label>
+                  <Input
+                    id="space-website"
+                    value={formData.website}
+                    onChange={(e) => setFormData({ ...formData, website: e.target.value })}
+                  />
+                </div>
+              </div>
+              <div className="space-y-2">
+                <Label htmlFor="space-aliases">Otros nombres (separados por comas)</Label>
+                <Input
+                  id="space-aliases"
+                  value={formData.aliases}
+                  onChange={(e) => setFormData({ ...formData, aliases: e.target.value })}
+                  data-testid="space-aliases-input"
+                />
+              </div>
+              <div className="space-y-2">
+                <Label htmlFor="space-description">Descripción</Label>
+                <Textarea
+                  id="space-description"
+                  value={formData.description}
+                  onChange={(e) => setFormData({ ...formData, description: e.target.value })}
+                  rows={3}
+                />
+              </div>
+            </div>
+            <DialogFooter>
+              <Button type="button" variant="outline" onClick={() => setShowFormDialog(false)}>
+                Cancelar
+              </Button>
+              <Button
+                type="submit"
+                disabled={submitting}
+                data-testid="save-space-btn"
+                className="bg-[#8b1530] hover:bg-[#701126]"
+              >
+                {submitting && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                Guardar
+              </Button>
+            </DialogFooter>
+          </form>
+        </DialogContent>
+      </Dialog>
+
+      {/* Delete Dialog */}
+      <Dialog open={showDeleteDialog} onOpenChange={setShowDeleteDialog}>
+        <DialogContent>
+          <DialogHeader>
+            <DialogTitle>Eliminar Espacio de Datos</DialogTitle>
+            <DialogDescription>
+              ¿Seguro que quieres eliminar <strong>{selectedSpace?.name}</strong> del catálogo?
+            </DialogDescription>
+          </DialogHeader>
+          {error && (
+            <Alert variant="destructive">
+              <AlertDescription>{error}</AlertDescription>
+            </Alert>
+          )}
+          <DialogFooter>
+            <Button variant="outline" onClick={() => setShowDeleteDialog(false)}>
+              Cancelar
+            </Button>
+            <Button
+              variant="destructive"
+              onClick={handleDelete}
+              disabled={submitting}
+              data-testid="confirm-delete-space"
+            >
+              {submitting && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+              Eliminar
+            </Button>
+          </DialogFooter>
+        </DialogContent>
+      </Dialog>
+    </div>
+  );
+};
+
+export default DataSpaces;
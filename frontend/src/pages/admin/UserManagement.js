@@ -1,6 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
 import axios from 'axios';
+import { invalidate } from '../../lib/api';
+import { useInfiniteApi } from '../../hooks/use-api';
+import { useVirtualRows } from '../../hooks/use-virtual-rows';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { Input } from '../../components/ui/input';
@@ -43,12 +46,13 @@ import {
 import { Alert, AlertDescription } from '../../components/ui/alert';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const PAGE_SIZE = 100;
+const ROW_HEIGHT = 60;
 
 const UserManagement = () => {
   const { token, user: currentUser } = useAuth();
-  const [users, setUsers] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
+  const [appliedSearch, setAppliedSearch] = useState('');
   const [showCreateDialog, setShowCreateDialog] = useState(false);
   const [showEditDialog, setShowEditDialog] = useState(false);
   const [showDeleteDialog, setShowDeleteDialog] = useState(false);
@@ -59,22 +63,35 @@ const UserManagement = () => {
   const [error, setError] = useState('');
   const [submitting, setSubmitting] = useState(false);
 
-  const fetchUsers = async () => {
-    try {
-      const response = await axios.get(`${API_URL}/users`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setUsers(response.data);
-    } catch (error) {
-      console.error('Error fetching users:', error);
-    } finally {
-      setLoading(false);
+  // Search runs server-side; wait for the user to stop typing
+  useEffect(() => {
+    const timeout = setTimeout(() => setAppliedSearch(search.trim()), 300);
+    return () => clearTimeout(timeout);
+  }, [search]);
+
+  const {
+    rows: users, total, hasMore, loading, loadingMore, loadMore
+  } = useInfiniteApi(
+    appliedSearch ? `/users?${new URLSearchParams({ q: appliedSearch })}` : '/users',
+    { pageSize: PAGE_SIZE }
+  );
+
+  // Only the rows in view are in the DOM; the next page loads before the
+  // user reaches the end of what is already here
+  const { containerRef, start, end, paddingTop, paddingBottom, scrollToTop } = useVirtualRows({
+    count: users.length,
+    rowHeight: ROW_HEIGHT,
+  });
+
+  useEffect(() => {
+    if (hasMore && end >= users.length - PAGE_SIZE / 2) {
+      loadMore();
     }
-  };
+  }, [end, users.length, hasMore, loadMore]);
 
   useEffect(() => {
-    fetchUsers();
-  }, [token]);
+    scrollToTop();
+  }, [appliedSearch, scrollToTop]);
 
   const handleCreate = async (e) => {
     e.preventDefault();
@@ -90,7 +107,7 @@ const UserManagement = () => {
       });
       setShowCreateDialog(false);
       setFormData({ email: '', name: '', password: '', role: '' });
-      fetchUsers();
+      invalidate('/users');
     } catch (error) {
       setError(error.response?.data?.detail || 'Error al crear usuario');
     } finally {
@@ -113,7 +130,7 @@ const UserManagement = () => {
       setShowEditDialog(false);
       setSelectedUser(null);
       setFormData({ email: '', name: '', password: '', role: '' });
-      fetchUsers();
+      invalidate('/users');
     } catch (error) {
       setError(error.response?.data?.detail || 'Error al actualizar usuario');
     } finally {
@@ -131,7 +148,7 @@ const UserManagement = () => {
       });
       setShowDeleteDialog(false);
       setSelectedUser(null);
-      fetchUsers();
+      invalidate('/users');
     } catch (error) {
       setError(error.response?.data?.detail || 'Error al eliminar usuario');
     } finally {
@@ -212,19 +229,6 @@ const UserManagement = () => {
     return styles[role] || styles.null;
   };
 
-  const filteredUsers = users.filter(user => 
-    user.name.toLowerCase().includes(search.toLowerCase()) ||
-    user.email.toLowerCase().includes(search.toLowerCase())
-  );
-
-  if (loading) {
-    return (
-      <div className="flex items-center justify-center h-64">
-        <Loader2 className="h-8 w-8 animate-spin text-[#8b1530]" />
-      </div>
-    );
-  }
-
   return (
     <div data-testid="user-management" className="space-y-6">
       {/* Header */}
@@ -270,83 +274,104 @@ const UserManagement = () => {
       {/* Users Table */}
       <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]">
         <CardHeader>
-          <CardTitle>Usuarios ({filteredUsers.length})</CardTitle>
+          <CardTitle>Usuarios ({total})</CardTitle>
           <CardDescription>Lista de todos los usuarios registrados</CardDescription>
         </CardHeader>
         <CardContent>
-          <Table>
-            <TableHeader>
-              <TableRow>
-                <TableHead>Usuario</TableHead>
-                <TableHead>Email</TableHead>
-                <TableHead>Rol</TableHead>
-                <TableHead>Creado</TableHead>
-                <TableHead className="text-right">Acciones</TableHead>
-              </TableRow>
-            </TableHeader>
-            <TableBody>
-              {filteredUsers.map((user) => (
-                <TableRow key={user.id} data-testid={`user-row-${user.id}`}>
-                  <TableCell>
-                    <div className="flex items-center gap-3">
-                      <div className="h-9 w-9 rounded-full bg-[#fbeff3] flex items-center justify-center">
-                        <span className="text-[#8b1530] font-semibold text-sm">
-                          {user.name.charAt(0).toUpperCase()}
+          {loading ? (
+            <div className="flex items-center justify-center py-12">
+              <Loader2 className="h-8 w-8 animate-spin text-[#8b1530]" />
+            </div>
+          ) : (
+            <div ref={containerRef} className="max-h-[calc(100vh-22rem)] min-h-[20rem] overflow-y-auto">
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Usuario</TableHead>
+                    <TableHead>Email</TableHead>
+                    <TableHead>Rol</TableHead>
+                    <TableHead>Empresa</TableHead>
+                    <TableHead>Creado</TableHead>
+                    <TableHead className="text-right">Acciones</TableHead>
+                  </TableRow>
+                </TableHeader>
+                <TableBody>
+                  {paddingTop > 0 && <tr aria-hidden="true" style={{ height: paddingTop }} />}
+                  {users.slice(start, end).map((user) => (
+                    <TableRow
+                      key={user.id}
+                      data-testid={`user-row-${user.id}`}
+                      style={{ height: ROW_HEIGHT }}
+                    >
+                      <TableCell>
+                        <div className="flex items-center gap-3">
+                          <div className="h-9 w-9 rounded-full bg-[#fbeff3] flex items-center justify-center">
+                            <span className="text-[#8b1530] font-semibold text-sm">
+                              {user.name.charAt(0).toUpperCase()}
+                            </span>
+                          </div>
+                          <span className="font-medium text-[#0f172a]">{user.name}</span>
+                        </div>
+                      </TableCell>
+                      <TableCell className="text-[#64748b]">{user.email}</TableCell>
+                      <TableCell>
+                        <span className={`inline-flex items-center gap-1.5 px-2.5 py-1 rounded-full text-xs font-medium ${getRoleBadge(user.role)}`}>
+                          {getRoleIcon(user.role)}
+                          {user.role ? user.role.charAt(0).toUpperCase() + user.role.slice(1) : 'Sin rol'}
                         </span>
-                      </div>
-                      <span className="font-medium text-[#0f172a]">{user.name}</span>
-                    </div>
-                  </TableCell>
-                  <TableCell className="text-[#64748b]">{user.email}</TableCell>
-                  <TableCell>
-                    <span className={`inline-flex items-center gap-1.5 px-2.5 py-1 rounded-full text-xs font-medium ${getRoleBadge(user.role)}`}>
-                      {getRoleIcon(user.role)}
-                      {user.role ? user.role.charAt(0).toUpperCase() + user.role.slice(1) : 'Sin rol'}
-                    </span>
-                  </TableCell>
-                  <TableCell className="text-[#64748b]">
-                    {new Date(user.created_at).toLocaleDateString('es-ES')}
-                  </TableCell>
-                  <TableCell className="text-right">
-                    <div className="flex items-center justify-end gap-2">
-                      <Button
-                        variant="ghost"
-                        size="sm"
-                        onClick={() => openEditDialog(user)}
-                        data-testid={`edit-user-${user.id}`}
-                        className="text-[#64748b] hover:text-[#0f172a]"
-                        title="Editar usuario"
-                      >
-                        <Pencil className="h-4 w-4" />
-                      </Button>
-                      <Button
-                        variant="ghost"
-                        size="sm"
-                        onClick={() => openPasswordDialog(user)}
-                        data-testid={`password-user-${user.id}`}
-                        className="text-[#64748b] hover:text-amber-600"
-                        title="Cambiar contraseña"
-                      >
-                        <Key className="h-4 w-4" />
-                      </Button>
-                      {currentUser?.id !== user.id && (
-                        <Button
-                          variant="ghost"
-                          size="sm"
-                          onClick={() => openDeleteDialog(user)}
-                          data-testid={`delete-user-${user.id}`}
-                          className="text-[#64748b] hover:text-red-600"
-                          title="Eliminar usuario"
-                        >
-                          <Trash2 className="h-4 w-4" />
-                        </Button>
-                      )}
-                    </div>
-                  </TableCell>
-                </TableRow>
-              ))}
-            </TableBody>
-          </Table>
+                      </TableCell>
+                      <TableCell className="text-[#64748b]">{user.company_name || '-'}</TableCell>
+                      <TableCell className="text-[#64748b]">
+                        {new Date(user.created_at).toLocaleDateString('es-ES')}
+                      </TableCell>
+                      <TableCell className="text-right">
+                        <div className="flex items-center justify-end gap-2">
+                          <Button
+                            variant="ghost"
+                            size="sm"
+                            onClick={() => openEditDialog(user)}
+                            data-testid={`edit-user-${user.id}`}
+                            className="text-[#64748b] hover:text-[#0f172a]"
+                            title="Editar usuario"
+                          >
+                            <Pencil className="h-4 w-4" />
+                          </Button>
+                          <Button
+                            variant="ghost"
+                            size="sm"
+                            onClick={() => openPasswordDialog(user)}
+                            data-testid={`password-user-${user.id}`}
+                            className="text-[#64748b] hover:text-amber-600"
+                            title="Cambiar contraseña"
+                          >
+                            <Key className="h-4 w-4" />
+                          </Button>
+                          {currentUser?.id !== user.id && (
+                            <Button
+                              variant="ghost"
+                              size="sm"
+                              onClick={() => openDeleteDialog(user)}
+                              data-testid={`delete-user-${user.id}`}
+                              className="text-[#64748b] hover:text-red-600"
+                              title="Eliminar usuario"
+                            >
+                              <Trash2 className="h-4 w-4" />
+                            </Button>
+                          )}
+                        </div>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                  {paddingBottom > 0 && <tr aria-hidden="true" style={{ height: paddingBottom }} />}
+                </TableBody>
+              </Table>
+              {loadingMore && (
+                <div className="flex items-center justify-center py-4">
+                  <Loader2 className="h-5 w-5 animate-spin text-[#8b1530]" />
+                </div>
+              )}
+            </div>
+          )}
         </CardContent>
       </Card>
 
@@ -0,0 +1,163 @@
+import React, { useEffect, useState } from 'react';
+import { useNavigate } from 'react-router-dom';
+import { api, invalidate } from '../../lib/api';
+import { useInfiniteApi } from '../../hooks/use-api';
+import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
+import { Button } from '../../components/ui/button';
+import { Input } from '../../components/ui/input';
+import { Alert, AlertDescription } from '../../components/ui/alert';
+import {
+  Table,
+  TableBody,
+  TableCell,
+  TableHead,
+  TableHeader,
+  TableRow,
+} from '../../components/ui/table';
+import { Archive, ArchiveRestore, Loader2, Search } from 'lucide-react';
+
+const PAGE_SIZE = 100;
+
+// Companies moved out of the working set by the archive job: discarded ones
+// and completed incorporations. Only the archive entries are listed; restoring
+// brings the company back with its diagnostic, intake and project.
+const ArchivedCompanies = () => {
+  const navigate = useNavigate();
+  const [search, setSearch] = useState('');
+  const [appliedSearch, setAppliedSearch] = useState('');
+  const [restoring, setRestoring] = useState(null);
+  const [error, setError] = useState('');
+
+  useEffect(() => {
+    const timeout = setTimeout(() => setAppliedSearch(search.trim()), 300);
+    return () => clearTimeout(timeout);
+  }, [search]);
+
+  const path = appliedSearch
+    ? `/archive/companies?search=${encodeURIComponent(appliedSearch)}`
+    : '/archive/companies';
+  const { rows: companies, total, hasMore, loading, loadingMore, loadMore } = useInfiniteApi(path, { pageSize: PAGE_SIZE });
+
+  const restoreCompany = async (company) => {
+    setRestoring(company.id);
+    setError('');
+    try {
+      await api.post(`/archive/companies/${company.id}/restore`);
+      invalidate('/archive');
+      invalidate('/companies');
+      invalidate('/projects');
+      navigate(`/asesor/empresas/${company.id}`);
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Error al restaurar la empresa');
+    } finally {
+      setRestoring(null);
+    }
+  };
+
+  return (
+    <div className="space-y-6" data-testid="archived-companies">
+      <div>
+        <h1 className="text-3xl font-bold text-[#0f172a] tracking-tight">Archivo</h1>
+        <p className="text-[#64748b] mt-1">
+          Empresas descartadas e incorporaciones completadas sin actividad reciente
+        </p>
+      </div>
+
+      <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]">
+        <CardContent className="p-4">
+          <div className="relative">
+            <Search className="absolute left-3 top-1/2 -translate-y-1/2 h-4 w-4 text-[#64748b]" />
+            <Input
+              placeholder="Buscar por nombre o NIF..."
+              value={search}
+              onChange={(e) => setSearch(e.target.value)}
+              data-testid="search-archive"
+              className="pl-10"
+            />
+          </div>
+        </CardContent>
+      </Card>
+
+      {error && (
+        <Alert variant="destructive">
+          <AlertDescription>{error}</AlertDescription>
+        </Alert>
+      )}
+
+      <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]">
+        <CardHeader>
+          <CardTitle>Empresas archivadas ({total})</CardTitle>
+          <CardDescription>Restaura una empresa para volver a gestionarla</CardDescription>
+        </CardHeader>
+        <CardContent>
+          {loading ? (
+            <div className="flex items-center justify-center py-12">
+              <Loader2 className="h-8 w-8 animate-spin text-[#8b1530]" />
+            </div>
+          ) : companies.length === 0 ? (
+            <div className="text-center py-12">
+              <Archive className="h-12 w-12 text-[#64748b] mx-auto mb-4" />
+              <p className="text-[#64748b]">No hay empresas archivadas</p>
+            </div>
+          ) : (
+            <>
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Empresa</TableHead>
+                    <TableHead>NIF</TableHead>
+                    <TableHead>Estado</TableHead>
+                    <TableHead>Archivada</TableHead>
+                    <TableHead className="text-right">Acciones</TableHead>
+                  </TableRow>
+                </TableHeader>
+                <TableBody>
+                  {companies.map((company) => (
+                    <TableRow key={company.id} data-testid={`archived-row-${company.id}`}>
+                      <TableCell>
+                        <p className="font-medium text-[#0f172a]">{company.name}</p>
+                        {company.sector && <p className="text-xs text-[#64748b]">{company.sector}</p>}
+                      </TableCell>
+                      <TableCell className="text-[#64748b]">{company.nif}</TableCell>
+                      <TableCell>
+                        {company.status === 'descartada' ? 'Descartada' : 'Incorporación completada'}
+                      </TableCell>
+                      <TableCell className="text-[#64748b]">
+                        {new Date(company.archived_at).toLocaleDateString('es-ES')}
+                      </TableCell>
+                      <TableCell className="text-right">
+                        <Button
+                          variant="outline"
+                          size="sm"
+                          onClick={() => restoreCompany(company)}
+                          disabled={restoring !== null}
+                          data-testid={`restore-${company.id}`}
+                          className="gap-2"
+                        >
+                          {restoring === company.id
+                            ? <Loader2 className="h-4 w-4 animate-spin" />
+                            : <ArchiveRestore className="h-4 w-4" />}
+                          Restaurar
+                        </Button>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+              {hasMore && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={loadMore} disabled={loadingMore} className="gap-2">
+                    {loadingMore && <Loader2 className="h-4 w-4 animate-spin" />}
+                    Cargar más
+                  </Button>
+                </div>
+              )}
+            </>
+          )}
+        </CardContent>
+      </Card>
+    </div>
+  );
+};
+
+export default ArchivedCompanies;
@@ -1,7 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import axios from 'axios';
+import { useApi } from '../../hooks/use-api';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { 
@@ -14,45 +14,30 @@ import {
   ArrowRight
 } from 'lucide-react';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 const AsesorDashboard = () => {
-  const { user, token } = useAuth();
+  const { user } = useAuth();
   const navigate = useNavigate();
-  const [stats, setStats] = useState({
-    total: 0,
-    leads: 0,
-    aptas: 0,
-    descartadas: 0,
-    projects: 0
-  });
-  const [recentCompanies, setRecentCompanies] = useState([]);
+  // Counts come from X-Total-Count, so the dashboard never downloads the
+  // whole company list: the five newest companies plus one row per status
+  const recent = useApi('/companies?limit=5');
+  const leads = useApi('/companies?status=lead&limit=1');
+  const aptas = useApi('/companies?status=apta&limit=1');
+  const descartadas = useApi('/companies?status=descartada&limit=1');
+  // Scoped to the asesor's own companies; unassigned leads are offered apart
+  const unassignedLeads = useApi('/companies?owner=none&status=lead&limit=1');
+  const { data: projects = [] } = useApi('/projects');
 
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const [companiesRes, projectsRes] = await Promise.all([
-          axios.get(`${API_URL}/companies`, { headers: { Authorization: `Bearer ${token}` } }),
-          axios.get(`${API_URL}/projects`, { headers: { Authorization: `Bearer ${token}` } })
-        ]);
-        
-        const companies = companiesRes.data;
-        setStats({
-          total: companies.length,
-          leads: companies.filter(c => c.status === 'lead').length,
-          aptas: companies.filter(c => c.status === 'apta').length,
-          descartadas: companies.filter(c => c.status === 'descartada').length,
-          projects: projectsRes.data.length
-        });
-        
-        // Get 5 most recent companies
-        setRecentCompanies(companies.slice(0, 5));
-      } catch (error) {
-        console.error('Error fetching data:', error);
-      }
-    };
-    fetchData();
-  }, [token]);
+  const countOf = (result) => Number(result.headers['x-total-count'] ?? 0);
+  const stats = {
+    total: countOf(recent),
+    leads: countOf(leads),
+    aptas: countOf(aptas),
+    descartadas: countOf(descartadas),
+    projects: projects.length,
+    unassigned: countOf(unassignedLeads)
+  };
+
+  const recentCompanies = recent.data || [];
 
   const statCards = [
     { label: 'Total Empresas', value: stats.total, icon: Building2, color: 'bg-slate-100 text-slate-600' },
@@ -101,7 +86,25 @@ const AsesorDashboard = () => {
         </Button>
       </div>
 
-      {/* Stats Grid */}
+      {stats.unassigned > 0 && (
+        <Card className="border-amber-200 bg-amber-50">
+          <CardContent className="p-4 flex flex-col sm:flex-row sm:items-center sm:justify-between gap-4">
+            <p className="font-semibold text-amber-900">
+              {stats.unassigned} empresa(s) en evaluación sin asesor asignado
+            </p>
+            <Button
+              onClick={() => navigate('/asesor/empresas?owner=none')}
+              data-testid="unassigned-leads-btn"
+              className="bg-amber-600 hover:bg-amber-700 gap-2"
+            >
+              Ver sin asignar
+              <ArrowRight className="h-4 w-4" />
+            </Button>
+          </CardContent>
+        </Card>
+      )}
+
+            {/* Stats Grid */}
       <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
         {statCards.map((stat, index) => {
           const Icon = stat.icon;
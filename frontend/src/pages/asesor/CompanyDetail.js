@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 import { useAuth } from '../../context/AuthContext';
-import axios from 'axios';
+import { api, fetchCached, invalidate, setCached } from '../../lib/api';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { Input } from '../../components/ui/input';
@@ -25,6 +25,8 @@ import {
   DialogTitle,
 } from '../../components/ui/dialog';
 import { Alert, AlertDescription } from '../../components/ui/alert';
+import DataSpacePicker from '../../components/data-spaces/DataSpacePicker';
+import SimilarCompanies from '../../components/companies/SimilarCompanies';
 import { 
   ArrowLeft, 
   Pencil,
@@ -53,13 +55,12 @@ import {
   Square,
   ClipboardList,
   BadgeCheck,
-  RotateCcw
+  RotateCcw,
+  Gauge
 } from 'lucide-react';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 const CompanyDetail = () => {
-  const { token, user } = useAuth();
+  const { user } = useAuth();
   const navigate = useNavigate();
   const { id } = useParams();
 
@@ -70,6 +71,8 @@ const CompanyDetail = () => {
   const [saving, setSaving] = useState(false);
   const [error, setError] = useState('');
   
+  const [claiming, setClaiming] = useState(false);
+  
   const [showConfirmDialog, setShowConfirmDialog] = useState(false);
   const [confirmAction, setConfirmAction] = useState(null);
   
@@ -82,7 +85,6 @@ const CompanyDetail = () => {
   
   // Project state
   const [projectForm, setProjectForm] = useState({
-    space_name: '',
     target_role: '',
     use_case: '',
     rgpd_checked: false
@@ -97,30 +99,32 @@ const CompanyDetail = () => {
     fetchData();
   }, [id]);
 
-  const fetchData = async () => {
+  // Served from the request cache when fresh; `force` skips it after a
+  // conflict or a decision that changed several resources at once
+  const fetchData = async ({ force = false } = {}) => {
     setLoading(true);
+    const optional = (path) => fetchCached(path, { force }).catch(() => null);
     try {
-      const [companyRes, diagnosticRes, projectRes, userRes, intakeRes] = await Promise.all([
-        axios.get(`${API_URL}/companies/${id}`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/companies/${id}/diagnostic`, { headers: { Authorization: `Bearer ${token}` } }),
-        axios.get(`${API_URL}/companies/${id}/project`, { headers: { Authorization: `Bearer ${token}` } }).catch(() => ({ data: null })),
-        axios.get(`${API_URL}/companies/${id}/user`, { headers: { Authorization: `Bearer ${token}` } }).catch(() => ({ data: null })),
-        axios.get(`${API_URL}/companies/${id}/intake`, { headers: { Authorization: `Bearer ${token}` } }).catch(() => ({ data: null }))
+      const [companyData, diagnosticData, projectData, userData, intakeData] = await Promise.all([
+        fetchCached(`/companies/${id}`, { force }),
+        fetchCached(`/companies/${id}/diagnostic`, { force }),
+        optional(`/companies/${id}/project`),
+        optional(`/companies/${id}/user`),
+        optional(`/companies/${id}/intake`)
       ]);
       
-      setCompany(companyRes.data);
-      setDiagnostic(diagnosticRes.data);
-      setProject(projectRes.data);
-      setCompanyUser(userRes.data);
-      setIntake(intakeRes.data);
+      setCompany(companyData);
+      setDiagnostic(diagnosticData);
+      setProject(projectData);
+      setCompanyUser(userData);
+      setIntake(intakeData);
       
       // Initialize project form if project exists
-      if (projectRes.data) {
+      if (projectData) {
         setProjectForm({
-          space_name: projectRes.data.space_name || '',
-          target_role: projectRes.data.target_role || '',
-          use_case: projectRes.data.use_case || '',
-          rgpd_checked: projectRes.data.rgpd_checked || false
+          target_role: projectData.target_role || '',
+          use_case: projectData.use_case || '',
+          rgpd_checked: projectData.rgpd_checked || false
         });
       }
     } catch (error) {
@@ -137,12 +141,10 @@ const CompanyDetail = () => {
     setCreatingUser(true);
     
     try {
-      const response = await axios.post(
-        `${API_URL}/companies/${id}/user`,
-        userFormData,
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      const response = await api.post(`/companies/${id}/user`, userFormData);
       setCompanyUser(response.data);
+      setCached(`/companies/${id}/user`, response.data);
+      invalidate('/users');
       setShowCreateUserDialog(false);
       setUserFormData({ email: '', name: '', password: '' });
     } catch (error) {
@@ -163,20 +165,40 @@ const CompanyDetail = () => {
     setShowCreateUserDialog(true);
   };
 
+  // If-Match makes the backend reject the write when someone else changed
+  // the project since we loaded it (412) instead of silently overwriting
+  const projectHeaders = () => (project ? { 'If-Match': `"${project.version ?? 0}"` } : {});
+
+  const handleProjectError = (error, fallback) => {
+    setProjectError(error.response?.data?.detail || fallback);
+    if (error.response?.status === 412) {
+      fetchData({ force: true });
+    }
+  };
+
+  const storeProject = (updated) => {
+    setProject(updated);
+    setCached(`/companies/${id}/project`, updated);
+    invalidate('/projects');
+    if (updated.incorporation_status === 'completada') {
+      invalidate('/analytics');
+    }
+  };
+
   const updateProjectField = async (field, value) => {
     setSavingProject(true);
     setProjectError('');
     
     try {
-      const response = await axios.put(
-        `${API_URL}/companies/${id}/project`,
+      const response = await api.put(
+        `/companies/${id}/project`,
         { [field]: value },
-        { headers: { Authorization: `Bearer ${token}` } }
+        { headers: projectHeaders() }
       );
-      setProject(response.data);
+      storeProject(response.data);
       setProjectForm(prev => ({ ...prev, [field]: value }));
     } catch (error) {
-      setProjectError(error.response?.data?.detail || 'Error al actualizar');
+      handleProjectError(error, 'Error al actualizar');
     } finally {
       setSavingProject(false);
     }
@@ -187,19 +209,37 @@ const CompanyDetail = () => {
     setProjectError('');
     
     try {
-      const response = await axios.put(
-        `${API_URL}/companies/${id}/project`,
+      const response = await api.put(
+        `/companies/${id}/project`,
         { incorporation_status: newStatus },
-        { headers: { Authorization: `Bearer ${token}` } }
+        { headers: projectHeaders() }
       );
-      setProject(response.data);
+      storeProject(response.data);
     } catch (error) {
-      setProjectError(error.response?.data?.detail || 'Error al actualizar estado');
+      handleProjectError(error, 'Error al actualizar estado');
     } finally {
       setSavingProject(false);
     }
   };
 
+  const claimCompany = async () => {
+    setClaiming(true);
+    setError('');
+    
+    try {
+      const response = await api.put(`/companies/${id}/owner`, { owner_id: user.id });
+      setCompany(response.data);
+      setCached(`/companies/${id}`, response.data);
+      invalidate('/companies');
+      invalidate('/projects');
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Error al asignar la empresa');
+      fetchData({ force: true });
+    } finally {
+      setClaiming(false);
+    }
+  };
+
   const getIncorporationStatusBadge = (status) => {
     const config = {
       pendiente: { color: 'bg-amber-100 text-amber-800', label: 'Pendiente' },
@@ -214,12 +254,9 @@ const CompanyDetail = () => {
     if (diagnostic.result !== 'pendiente') return;
     
     try {
-      const response = await axios.put(
-        `${API_URL}/companies/${id}/diagnostic`,
-        { [field]: value },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      const response = await api.put(`/companies/${id}/diagnostic`, { [field]: value });
       setDiagnostic(response.data);
+      setCached(`/companies/${id}/diagnostic`, response.data);
     } catch (error) {
       console.error('Error updating diagnostic:', error);
     }
@@ -230,17 +267,17 @@ const CompanyDetail = () => {
     setError('');
     
     try {
-      await axios.post(
-        `${API_URL}/companies/${id}/diagnostic/decide`,
-        { result: decision },
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      await api.post(`/companies/${id}/diagnostic/decide`, { result: decision });
       
       setShowConfirmDialog(false);
       setConfirmAction(null);
       
-      // Refresh data
-      await fetchData();
+      // The decision changes the company status, the diagnostic and may
+      // create the project: drop everything cached for companies/projects
+      invalidate('/companies');
+      invalidate('/projects');
+      invalidate('/analytics');
+      await fetchData({ force: true });
     } catch (error) {
       setError(error.response?.data?.detail || 'Error al procesar la decisión');
     } finally {
@@ -320,16 +357,33 @@ const CompanyDetail = () => {
               {getStatusBadge(company.status)}
             </div>
             <p className="text-[#64748b] mt-1 font-mono">{company.nif}</p>
+            <p className="text-sm text-[#64748b] mt-1 flex items-center gap-1.5" data-testid="company-owner">
+              <User className="h-4 w-4" />
+              {company.owner_name ? `Asesor: ${company.owner_name}` : 'Sin asesor asignado'}
+            </p>
           </div>
         </div>
-        <Button
-          onClick={() => navigate(`/asesor/empresas/${id}/editar`)}
-          variant="outline"
-          className="gap-2"
-        >
-          <Pencil className="h-4 w-4" />
-          Editar empresa
-        </Button>
+        <div className="flex gap-2">
+          {!company.owner_id && (
+            <Button
+              onClick={claimCompany}
+              disabled={claiming}
+              data-testid="claim-company-btn"
+              className="bg-[#8b1530] hover:bg-[#701126] gap-2"
+            >
+              {claiming ? <Loader2 className="h-4 w-4 animate-spin" /> : <UserPlus className="h-4 w-4" />}
+              Asignarme
+            </Button>
+          )}
+          <Button
+            onClick={() => navigate(`/asesor/empresas/${id}/editar`)}
+            variant="outline"
+            className="gap-2"
+          >
+            <Pencil className="h-4 w-4" />
+            Editar empresa
+          </Button>
+        </div>
       </div>
 
       {error && (
@@ -637,23 +691,11 @@ const CompanyDetail = () => {
                         <Database className="h-4 w-4" />
                         Espacio de Datos
                       </Label>
-                      <Select
-                        value={projectForm.space_name}
-                        onValueChange={(value) => updateProjectField('space_name', value)}
+                      <DataSpacePicker
+                        value={project.space_name}
+                        onSelect={(space) => updateProjectField('space_id', space ? space.id : '')}
                         disabled={savingProject}
-                      >
-                        <SelectTrigger data-testid="space-name-select">
-                          <SelectValue placeholder="Selecciona un espacio" />
-                        </SelectTrigger>
-                        <SelectContent>
-                          <SelectItem value="Espacio de Datos Industrial">Espacio de Datos Industrial</SelectItem>
-                          <SelectItem value="Espacio de Datos Agrícola">Espacio de Datos Agrícola</SelectItem>
-                          <SelectItem value="Espacio de Datos Turismo">Espacio de Datos Turismo</SelectItem>
-                          <SelectItem value="Espacio de Datos Salud">Espacio de Datos Salud</SelectItem>
-                          <SelectItem value="Espacio de Datos Movilidad">Espacio de Datos Movilidad</SelectItem>
-                          <SelectItem value="Espacio de Datos Energía">Espacio de Datos Energía</SelectItem>
-                        </SelectContent>
-                      </Select>
+                      />
                     </div>
 
                     <div className="space-y-2">
@@ -752,6 +794,23 @@ const CompanyDetail = () => {
             <CardContent className="space-y-6">
               {diagnostic ? (
                 <>
+                  {/* Score computed from the submitted intake */}
+                  {diagnostic.score != null && (
+                    <div data-testid="diagnostic-score" className="flex flex-col sm:flex-row sm:items-center gap-2 sm:gap-4 p-4 rounded-lg bg-[#fbeff3]">
+                      <div className="flex items-center gap-2 shrink-0">
+                        <Gauge className="h-5 w-5 text-[#8b1530]" />
+                        <span className="font-semibold text-[#0f172a]">
+                          Puntuación: {diagnostic.score.toFixed(1)} / 100
+                        </span>
+                      </div>
+                      <p className="text-sm text-[#64748b]">
+                        {diagnostic.prefilled
+                          ? 'Campos pre-rellenados a partir del cuestionario. Revísalos antes de decidir.'
+                          : `Sugerencia del cuestionario: ${diagnostic.suggestion?.eligibility_ok ? 'elegible' : 'no elegible'}, riesgo legal ${diagnostic.suggestion?.legal_risk}.`}
+                      </p>
+                    </div>
+                  )}
+
                   {/* Checklist */}
                   <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                     <div className="space-y-4">
@@ -892,6 +951,8 @@ const CompanyDetail = () => {
             </CardContent>
           </Card>
 
+          <SimilarCompanies companyId={id} />
+
           {/* Client Intake Info */}
           <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)] mt-6">
             <CardHeader>
@@ -1,7 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
-import { useAuth } from '../../context/AuthContext';
-import axios from 'axios';
+import { api, fetchCached, invalidate, setCached } from '../../lib/api';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { Input } from '../../components/ui/input';
@@ -22,10 +21,7 @@ import {
   Building2
 } from 'lucide-react';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 const CompanyForm = () => {
-  const { token } = useAuth();
   const navigate = useNavigate();
   const { id } = useParams();
   const isEdit = !!id;
@@ -55,10 +51,7 @@ const CompanyForm = () => {
   const fetchCompany = async () => {
     setLoading(true);
     try {
-      const response = await axios.get(`${API_URL}/companies/${id}`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setFormData(response.data);
+      setFormData(await fetchCached(`/companies/${id}`));
     } catch (error) {
       setError('Error al cargar la empresa');
       console.error('Error:', error);
@@ -73,14 +66,15 @@ const CompanyForm = () => {
     setSaving(true);
 
     try {
+      // Company lists must refetch; an edit already returns the fresh company
       if (isEdit) {
-        await axios.put(`${API_URL}/companies/${id}`, formData, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
+        const response = await api.put(`/companies/${id}`, formData);
+        invalidate('/companies');
+        setCached(`/companies/${id}`, response.data);
       } else {
-        await axios.post(`${API_URL}/companies`, formData, {
-          headers: { Authorization: `Bearer ${token}` }
-        });
+        await api.post('/companies', formData);
+        invalidate('/companies');
+        invalidate('/analytics');
       }
       navigate('/asesor/empresas');
     } catch (error) {
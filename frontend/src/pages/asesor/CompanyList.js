@@ -1,7 +1,9 @@
-import React, { useState, useEffect } from 'react';
+import React, { useEffect, useState } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
+import { api, invalidate } from '../../lib/api';
 import { useAuth } from '../../context/AuthContext';
-import axios from 'axios';
+import { useInfiniteApi } from '../../hooks/use-api';
+import { useVirtualRows } from '../../hooks/use-virtual-rows';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { Input } from '../../components/ui/input';
@@ -28,50 +30,74 @@ import {
   Loader2,
   Clock,
   CheckCircle2,
-  XCircle
+  XCircle,
+  UserPlus
 } from 'lucide-react';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const PAGE_SIZE = 100;
+const ROW_HEIGHT = 60;
 
 const CompanyList = () => {
-  const { token } = useAuth();
   const navigate = useNavigate();
+  const { user } = useAuth();
   const [searchParams, setSearchParams] = useSearchParams();
   
-  const [companies, setCompanies] = useState([]);
-  const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
+  const [appliedSearch, setAppliedSearch] = useState('');
   const [statusFilter, setStatusFilter] = useState(searchParams.get('status') || 'all');
+  const [sort, setSort] = useState(searchParams.get('sort') || 'recent');
+  // "mine" is the asesor's own portfolio; "none" the queue of unassigned companies
+  const [ownerFilter, setOwnerFilter] = useState(searchParams.get('owner') === 'none' ? 'none' : 'mine');
+  const [claiming, setClaiming] = useState(null);
 
+  // Search runs server-side; wait for the user to stop typing
   useEffect(() => {
-    fetchCompanies();
-  }, [token, statusFilter]);
+    const timeout = setTimeout(() => setAppliedSearch(search.trim()), 300);
+    return () => clearTimeout(timeout);
+  }, [search]);
 
-  const fetchCompanies = async () => {
-    setLoading(true);
-    try {
-      const params = new URLSearchParams();
-      if (statusFilter && statusFilter !== 'all') {
-        params.append('status', statusFilter);
-      }
-      if (search) {
-        params.append('search', search);
-      }
-      
-      const response = await axios.get(`${API_URL}/companies?${params.toString()}`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setCompanies(response.data);
-    } catch (error) {
-      console.error('Error fetching companies:', error);
-    } finally {
-      setLoading(false);
+  const params = new URLSearchParams();
+  if (statusFilter && statusFilter !== 'all') {
+    params.append('status', statusFilter);
+  }
+  if (appliedSearch) {
+    params.append('search', appliedSearch);
+  }
+  if (sort === 'score') {
+    params.append('sort', 'score');
+  }
+  if (ownerFilter === 'none') {
+    params.append('owner', 'none');
+  }
+  const query = params.toString();
+  const {
+    rows: companies, total, hasMore, loading, loadingMore, loadMore, refresh
+  } = useInfiniteApi(query ? `/companies?${query}` : '/companies', { pageSize: PAGE_SIZE });
+
+  // Only the rows in view are in the DOM; the next page loads before the
+  // user reaches the end of what is already here
+  const { containerRef, start, end, paddingTop, paddingBottom, scrollToTop } = useVirtualRows({
+    count: companies.length,
+    rowHeight: ROW_HEIGHT,
+  });
+
+  useEffect(() => {
+    if (hasMore && end >= companies.length - PAGE_SIZE / 2) {
+      loadMore();
     }
-  };
+  }, [end, companies.length, hasMore, loadMore]);
+
+  useEffect(() => {
+    scrollToTop();
+  }, [query, scrollToTop]);
 
   const handleSearch = (e) => {
     e.preventDefault();
-    fetchCompanies();
+    if (search.trim() === appliedSearch) {
+      refresh().catch(() => {});
+    } else {
+      setAppliedSearch(search.trim());
+    }
   };
 
   const handleStatusChange = (value) => {
@@ -84,6 +110,43 @@ const CompanyList = () => {
     setSearchParams(searchParams);
   };
 
+  const handleOwnerChange = (value) => {
+    setOwnerFilter(value);
+    if (value === 'none') {
+      searchParams.set('owner', 'none');
+    } else {
+      searchParams.delete('owner');
+    }
+    setSearchParams(searchParams);
+  };
+
+  // Taking a company moves it from the unassigned queue to "Mis empresas"
+  const claimCompany = async (company) => {
+    setClaiming(company.id);
+    try {
+      await api.put(`/companies/${company.id}/owner`, { owner_id: user.id });
+      invalidate('/companies');
+      invalidate('/projects');
+      await refresh();
+    } catch (error) {
+      // Someone else took it first: the refreshed queue no longer shows it
+      await refresh().catch(() => {});
+    } finally {
+      setClaiming(null);
+    }
+  };
+
+  // By score only lists companies whose submitted intake has been scored
+  const handleSortChange = (value) => {
+    setSort(value);
+    if (value === 'recent') {
+      searchParams.delete('sort');
+    } else {
+      searchParams.set('sort', value);
+    }
+    setSearchParams(searchParams);
+  };
+
   const getStatusIcon = (status) => {
     switch (status) {
       case 'lead': return <Clock className="h-4 w-4 text-amber-600" />;
@@ -148,6 +211,15 @@ const CompanyList = () => {
                 className="pl-10"
               />
             </div>
+            <Select value={ownerFilter} onValueChange={handleOwnerChange}>
+              <SelectTrigger className="w-full sm:w-[200px]" data-testid="owner-filter">
+                <SelectValue placeholder="Asignación" />
+              </SelectTrigger>
+              <SelectContent>
+                <SelectItem value="mine">Mis empresas</SelectItem>
+                <SelectItem value="none">Sin asignar</SelectItem>
+              </SelectContent>
+            </Select>
             <Select value={statusFilter} onValueChange={handleStatusChange}>
               <SelectTrigger className="w-full sm:w-[200px]" data-testid="status-filter">
                 <SelectValue placeholder="Filtrar por estado" />
@@ -159,6 +231,15 @@ const CompanyList = () => {
                 <SelectItem value="descartada">Descartadas</SelectItem>
               </SelectContent>
             </Select>
+            <Select value={sort} onValueChange={handleSortChange}>
+              <SelectTrigger className="w-full sm:w-[200px]" data-testid="sort-companies">
+                <SelectValue placeholder="Ordenar por" />
+              </SelectTrigger>
+              <SelectContent>
+                <SelectItem value="recent">Más recientes</SelectItem>
+                <SelectItem value="score">Mayor puntuación</SelectItem>
+              </SelectContent>
+            </Select>
             <Button type="submit" variant="outline" className="gap-2">
               <Search className="h-4 w-4" />
               Buscar
@@ -170,8 +251,12 @@ const CompanyList = () => {
       {/* Companies Table */}
       <Card className="border-0 shadow-[0_2px_8px_rgba(0,0,0,0.04)]">
         <CardHeader>
-          <CardTitle>Empresas ({companies.length})</CardTitle>
-          <CardDescription>Lista de empresas registradas en el sistema</CardDescription>
+          <CardTitle>Empresas ({total})</CardTitle>
+          <CardDescription>
+            {ownerFilter === 'none'
+              ? 'Empresas sin asesor asignado: asígnatelas para gestionarlas'
+              : 'Empresas de tu cartera'}
+          </CardDescription>
         </CardHeader>
         <CardContent>
           {loading ? (
@@ -190,53 +275,83 @@ const CompanyList = () => {
               </Button>
             </div>
           ) : (
-            <Table>
-              <TableHeader>
-                <TableRow>
-                  <TableHead>Empresa</TableHead>
-                  <TableHead>NIF</TableHead>
-                  <TableHead>Sector</TableHead>
-                  <TableHead>Contacto</TableHead>
-                  <TableHead>Estado</TableHead>
-                  <TableHead className="text-right">Acciones</TableHead>
-                </TableRow>
-              </TableHeader>
-              <TableBody>
-                {companies.map((company) => (
-                  <TableRow key={company.id} data-testid={`company-row-${company.id}`}>
-                    <TableCell>
-                      <div className="flex items-center gap-3">
-                        <div className="h-9 w-9 rounded-lg bg-[#fbeff3] flex items-center justify-center">
-                          <Building2 className="h-5 w-5 text-[#8b1530]" />
-                        </div>
-                        <span className="font-medium text-[#0f172a]">{company.name}</span>
-                      </div>
-                    </TableCell>
-                    <TableCell className="text-[#64748b] font-mono text-sm">{company.nif}</TableCell>
-                    <TableCell className="text-[#64748b]">{company.sector || '-'}</TableCell>
-                    <TableCell>
-                      <div>
-                        <p className="text-sm text-[#0f172a]">{company.contact_name || '-'}</p>
-                        <p className="text-xs text-[#64748b]">{company.contact_phone || ''}</p>
-                      </div>
-                    </TableCell>
-                    <TableCell>{getStatusBadge(company.status)}</TableCell>
-                    <TableCell className="text-right">
-                      <Button
-                        variant="ghost"
-                        size="sm"
-                        onClick={() => navigate(`/asesor/empresas/${company.id}`)}
-                        data-testid={`view-company-${company.id}`}
-                        className="gap-2 text-[#8b1530] hover:text-[#701126] hover:bg-[#fbeff3]"
-                      >
-                        <Eye className="h-4 w-4" />
-                        Ver
-                      </Button>
-                    </TableCell>
+            <div ref={containerRef} className="max-h-[calc(100vh-22rem)] min-h-[20rem] overflow-y-auto">
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Empresa</TableHead>
+                    <TableHead>NIF</TableHead>
+                    <TableHead>Sector</TableHead>
+                    <TableHead>Contacto</TableHead>
+                    <TableHead>Estado</TableHead>
+                    <TableHead>Puntuación</TableHead>
+                    <TableHead className="text-right">Acciones</TableHead>
                   </TableRow>
-                ))}
-              </TableBody>
-            </Table>
+                </TableHeader>
+                <TableBody>
+                  {paddingTop > 0 && <tr aria-hidden="true" style={{ height: paddingTop }} />}
+                  {companies.slice(start, end).map((company) => (
+                    <TableRow
+                      key={company.id}
+                      data-testid={`company-row-${company.id}`}
+                      style={{ height: ROW_HEIGHT }}
+                    >
+                      <TableCell>
+                        <div className="flex items-center gap-3">
+                          <div className="h-9 w-9 shrink-0 rounded-lg bg-[#fbeff3] flex items-center justify-center">
+                            <Building2 className="h-5 w-5 text-[#8b1530]" />
+                          </div>
+                          <span className="font-medium text-[#0f172a] truncate max-w-[18rem]">{company.name}</span>
+                        </div>
+                      </TableCell>
+                      <TableCell className="text-[#64748b] font-mono text-sm">{company.nif}</TableCell>
+                      <TableCell className="text-[#64748b] whitespace-nowrap">{company.sector || '-'}</TableCell>
+                      <TableCell>
+                        <div className="max-w-[14rem]">
+                          <p className="text-sm text-[#0f172a] truncate">{company.contact_name || '-'}</p>
+                          <p className="text-xs text-[#64748b] truncate">{company.contact_phone || ''}</p>
+                        </div>
+                      </TableCell>
+                      <TableCell>{getStatusBadge(company.status)}</TableCell>
+                      <TableCell className="text-[#0f172a] font-medium">
+                        {company.eligibility_score != null ? company.eligibility_score.toFixed(1) : '-'}
+                      </TableCell>
+                      <TableCell className="text-right whitespace-nowrap">
+                        {ownerFilter === 'none' && (
+                          <Button
+                            variant="ghost"
+                            size="sm"
+                            onClick={() => claimCompany(company)}
+                            disabled={claiming === company.id}
+                            data-testid={`claim-company-${company.id}`}
+                            className="gap-2 text-[#64748b] hover:text-[#0f172a]"
+                          >
+                            {claiming === company.id ? <Loader2 className="h-4 w-4 animate-spin" /> : <UserPlus className="h-4 w-4" />}
+                            Asignarme
+                          </Button>
+                        )}
+                        <Button
+                          variant="ghost"
+                          size="sm"
+                          onClick={() => navigate(`/asesor/empresas/${company.id}`)}
+                          data-testid={`view-company-${company.id}`}
+                          className="gap-2 text-[#8b1530] hover:text-[#701126] hover:bg-[#fbeff3]"
+                        >
+                          <Eye className="h-4 w-4" />
+                          Ver
+                        </Button>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                  {paddingBottom > 0 && <tr aria-hidden="true" style={{ height: paddingBottom }} />}
+                </TableBody>
+              </Table>
+              {loadingMore && (
+                <div className="flex items-center justify-center py-4">
+                  <Loader2 className="h-5 w-5 animate-spin text-[#8b1530]" />
+                </div>
+              )}
+            </div>
           )}
         </CardContent>
       </Card>
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../context/AuthContext';
-import axios from 'axios';
+import { api } from '../../lib/api';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '../../components/ui/card';
 import { Button } from '../../components/ui/button';
 import { Checkbox } from '../../components/ui/checkbox';
@@ -25,8 +25,6 @@ import {
   BadgeCheck
 } from 'lucide-react';
 
-const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
-
 const ClienteDashboard = () => {
   const { user, token } = useAuth();
   const [loading, setLoading] = useState(true);
@@ -51,9 +49,7 @@ const ClienteDashboard = () => {
 
   const fetchDashboard = async () => {
     try {
-      const response = await axios.get(`${API_URL}/client/dashboard`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
+      const response = await api.get('/client/dashboard');
       setDashboardData(response.data);
       
       // Initialize form with existing intake data
@@ -97,23 +93,25 @@ const ClienteDashboard = () => {
     setIntakeError('');
     
     try {
-      // First save the intake
-      await axios.post(
-        `${API_URL}/companies/${dashboardData.company.id}/intake`,
-        intakeForm,
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
-      
-      // Then submit it
-      await axios.post(
-        `${API_URL}/companies/${dashboardData.company.id}/intake/submit`,
-        {},
-        { headers: { Authorization: `Bearer ${token}` } }
-      );
+      // Save, submit and reload the dashboard in a single round trip
+      const companyId = dashboardData.company.id;
+      const response = await api.post('/batch', {
+        sequential: true,
+        stop_on_error: true,
+        operations: [
+          { method: 'POST', path: `/companies/${companyId}/intake`, body: intakeForm },
+          { method: 'POST', path: `/companies/${companyId}/intake/submit`, body: {} },
+          { method: 'GET', path: '/client/dashboard' }
+        ]
+      });
+      const failed = response.data.find(result => result.status >= 400);
+      if (failed) {
+        setIntakeError(failed.body?.detail || 'Error al enviar el cuestionario');
+        return;
+      }
       
       setIntakeSuccess(true);
-      // Refresh dashboard
-      await fetchDashboard();
+      setDashboardData(response.data[2].body);
     } catch (error) {
       setIntakeError(error.response?.data?.detail || 'Error al enviar el cuestionario');
     } finally {
@@ -0,0 +1,62 @@
+"""Fixtures running the API in-process on the memory storage engine.
+
+Every test shares one app (and so one store): tests create the companies and
+users they need rather than relying on a clean database.
+"""
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+os.environ.update({
+    "MONGO_URL": "mongodb://localhost:1",
+    "DB_NAME": "test",
+    "STORAGE_ENGINE": "memory",
+    # Changes are readable as soon as they are written
+    "CHANGE_FEED_SETTLE_SECONDS": "0",
+    "JWT_SECRET": "test-secret-long-enough-for-hs256-keys"
+})
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(server.app, raise_server_exceptions=False) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def make_user(client):
+    """Insert a user and return the Authorization headers of a token for it"""
+    def make_user(role: str, company_id=None) -> dict:
+        user_id = str(uuid.uuid4())
+        email = f"{role}-{user_id[:8]}@example.com"
+        client.portal.call(server.repos.users.insert, {
+            "id": user_id,
+            "email": email,
+            "name": f"Test {role}",
+            "name_lower": f"test {role}",
+            "password": "",
+            "role": role,
+            "company_id": company_id,
+            "created_at": server.utcnow()
+        })
+        return {"Authorization": f"Bearer {server.create_token(user_id, email, role)}"}
+    return make_user
+
+@pytest.fixture(scope="session")
+def admin(make_user):
+    return make_user("admin")
+
+@pytest.fixture
+def make_company(client, admin):
+    """Create a company (and its pending diagnostic) through the API"""
+    def make_company(**fields) -> dict:
+        body = {"name": f"Empresa {uuid.uuid4().hex[:8]}", "nif": uuid.uuid4().hex[:9].upper(), **fields}
+        response = client.post("/api/companies", json=body, headers=admin)
+        assert response.status_code == 200, response.text
+        return response.json()
+    return make_company
@@ -0,0 +1,61 @@
+import server
+
+def run_batch(client, headers, operations, **options):
+    response = client.post("/api/batch", json={"operations": operations, **options}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {result["id"]: result for result in response.json()}
+
+def test_batch_runs_every_operation_with_the_callers_token(client, admin, make_company):
+    company = make_company()
+    results = run_batch(client, admin, [
+        {"id": "company", "method": "GET", "path": f"/companies/{company['id']}"},
+        {"id": "rename", "method": "PUT", "path": f"/api/companies/{company['id']}", "body": {"name": "Renombrada"}},
+        {"id": "after", "method": "GET", "path": f"/companies/{company['id']}"}
+    ])
+    assert results["company"]["status"] == 200
+    assert results["rename"]["status"] == 200
+    # A read after a write sees it
+    assert results["after"]["body"]["name"] == "Renombrada"
+
+def test_operation_headers_cannot_replace_the_batch_ones(client, admin, make_company):
+    company = make_company()
+    results = run_batch(client, admin, [{
+        "id": "rename",
+        "method": "PUT",
+        "path": f"/companies/{company['id']}",
+        "body": {"name": "Con cabeceras"},
+        "headers": {"Authorization": "Bearer nope", "Content-Type": "text/plain", "Content-Length": "1"}
+    }])
+    assert results["rename"]["status"] == 200
+    assert results["rename"]["body"]["name"] == "Con cabeceras"
+
+def test_nested_batches_are_refused(client, admin):
+    results = run_batch(client, admin, [{"id": "nested", "method": "POST", "path": "/batch", "body": {}}])
+    assert results["nested"]["status"] == 400
+
+def test_a_raising_operation_fails_alone(client, admin, make_company, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(server.repos.outbox, "count", broken)
+    company = make_company()
+
+    results = run_batch(client, admin, [
+        {"id": "broken", "method": "GET", "path": "/admin/outbox"},
+        {"id": "company", "method": "GET", "path": f"/companies/{company['id']}"}
+    ])
+    assert results["broken"]["status"] == 500
+    assert results["company"]["status"] == 200
+
+def test_stop_on_error_skips_the_rest(client, admin, make_company, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(server.repos.outbox, "count", broken)
+    company = make_company()
+
+    results = run_batch(client, admin, [
+        {"id": "broken", "method": "GET", "path": "/admin/outbox"},
+        {"id": "rename", "method": "PUT", "path": f"/companies/{company['id']}", "body": {"name": "Nunca"}}
+    ], sequential=True, stop_on_error=True)
+    assert results["broken"]["status"] == 500
+    assert results["rename"]["status"] == 424
+    assert client.get(f"/api/companies/{company['id']}", headers=admin).json()["name"] == company["name"]
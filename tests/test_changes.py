@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from changes import ChangeFeed, Position
+from repositories import memory_repositories
+
+def drain(client, admin, cursor=None):
+    """Read the feed to its end; returns the changes and the final cursor"""
+    items = []
+    while True:
+        response = client.get("/api/changes", params={"since": cursor} if cursor else {}, headers=admin)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        items += page["items"]
+        cursor = page["cursor"]
+        if not page["has_more"]:
+            return items, cursor
+
+def test_a_cursor_resumes_after_what_it_saw(client, admin, make_company):
+    _, cursor = drain(client, admin)
+    company = make_company()
+
+    items, cursor = drain(client, admin, cursor)
+    assert [(item["entity"], item["op"], item["id"]) for item in items] == [("company", "upsert", company["id"])]
+    assert drain(client, admin, cursor)[0] == []
+
+def test_repeated_updates_show_up_once_with_the_latest_state(client, admin, make_company):
+    company = make_company()
+    _, cursor = drain(client, admin)
+    for name in ("Primera", "Segunda"):
+        client.put(f"/api/companies/{company['id']}", json={"name": name}, headers=admin)
+
+    items, _ = drain(client, admin, cursor)
+    assert len(items) == 1
+    assert items[0]["data"]["name"] == "Segunda"
+
+def test_deletes_leave_tombstones(client, admin, make_company):
+    company = make_company()
+    _, cursor = drain(client, admin)
+    assert client.delete(f"/api/companies/{company['id']}", headers=admin).status_code == 200
+
+    items, _ = drain(client, admin, cursor)
+    assert [(item["op"], item["id"], item["data"]) for item in items] == [("delete", company["id"], None)]
+
+def test_pages_split_on_the_limit(client, admin, make_company):
+    _, cursor = drain(client, admin)
+    created = [make_company()["id"] for _ in range(3)]
+
+    first = client.get("/api/changes", params={"since": cursor, "limit": 2}, headers=admin).json()
+    assert first["has_more"]
+    rest, _ = drain(client, admin, first["cursor"])
+    assert [item["id"] for item in first["items"] + rest] == created
+
+def test_bad_and_expired_cursors(client, admin):
+    assert client.get("/api/changes", params={"since": "???"}, headers=admin).status_code == 400
+    old = Position(1, "company", "x", datetime.now(timezone.utc) - timedelta(days=400)).encode()
+    assert client.get("/api/changes", params={"since": old}, headers=admin).status_code == 410
+
+# ==================== SEQUENCE ====================
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+def tracked_companies():
+    repos = memory_repositories()
+    clock = Clock()
+    feed = ChangeFeed(repos.counters, repos.tombstones, clock, id_factory=lambda: "t", settle=timedelta(seconds=2))
+    return repos, feed, feed.track("company", repos.companies), clock
+
+async def last_seq(repos) -> int:
+    return (await repos.counters.get({"id": "changes"}))["seq"]
+
+def test_an_update_is_stamped_in_the_same_write():
+    async def scenario():
+        repos, _, companies, _ = tracked_companies()
+        await companies.insert({"id": "a", "version": 1})
+        writes = []
+        update = repos.companies.update
+
+        async def counted(*args, **kwargs):
+            writes.append(args)
+            return await update(*args, **kwargs)
+        repos.companies.update = counted
+
+        updated = await companies.update({"id": "a", "version": 1}, {"name": "x"})
+        assert len(writes) == 1
+        assert updated["change_seq"] == await last_seq(repos)
+    asyncio.run(scenario())
+
+def test_recovery_stamps_documents_written_around_the_feed():
+    async def scenario():
+        repos, feed, companies, clock = tracked_companies()
+        await companies.insert({"id": "a", "name": "x"})
+        # Restored straight into the collection, without a stamp
+        await repos.companies.insert({"id": "b", "name": "y"})
+
+        page, _, _ = await feed.read({"company": companies}, Position(), 10)
+        assert page == []  # "a" is still settling; "b" is not in the feed
+        assert await feed.recover({"company": companies}) == 1
+        clock.now += timedelta(seconds=5)
+        page, _, _ = await feed.read({"company": companies}, Position(), 10)
+        assert [change.id for change in page] == ["a", "b"]
+    asyncio.run(scenario())
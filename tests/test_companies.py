@@ -0,0 +1,53 @@
+import uuid
+
+def test_create_and_get_company(client, admin, make_company):
+    company = make_company(sector="Agroalimentario")
+    assert company["status"] == "lead"
+    assert company["intake_status"] == "pendiente"
+
+    response = client.get(f"/api/companies/{company['id']}", headers=admin)
+    assert response.status_code == 200
+    assert response.json()["sector"] == "Agroalimentario"
+
+    diagnostic = client.get(f"/api/companies/{company['id']}/diagnostic", headers=admin)
+    assert diagnostic.json()["result"] == "pendiente"
+
+def test_duplicate_nif_is_rejected(client, admin, make_company):
+    company = make_company()
+    response = client.post("/api/companies", json={"name": "Otra", "nif": company["nif"]}, headers=admin)
+    assert response.status_code == 400
+
+def test_missing_company_is_404(client, admin):
+    assert client.get(f"/api/companies/{uuid.uuid4()}", headers=admin).status_code == 404
+
+def test_list_pages_through_every_company_once(client, admin, make_company):
+    tag = uuid.uuid4().hex[:10]
+    created = [make_company(name=f"{tag} {i}")["id"] for i in range(5)]
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"search": tag, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/companies", params=params, headers=admin)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "5"
+        seen += [company["id"] for company in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    # Newest first, each company exactly once
+    assert seen == created[::-1]
+
+def test_list_rejects_a_malformed_cursor(client, admin):
+    response = client.get("/api/companies", params={"cursor": "no-es-un-cursor"}, headers=admin)
+    assert response.status_code == 400
+
+def test_asesor_only_lists_their_companies(client, make_user, make_company):
+    asesor = make_user("asesor")
+    tag = uuid.uuid4().hex[:10]
+    make_company(name=f"{tag} ajena")
+    own = client.post("/api/companies", json={"name": f"{tag} propia", "nif": tag.upper()}, headers=asesor).json()
+
+    response = client.get("/api/companies", params={"search": tag}, headers=asesor)
+    assert [company["id"] for company in response.json()] == [own["id"]]
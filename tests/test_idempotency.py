@@ -0,0 +1,48 @@
+import uuid
+
+import server
+
+def company_body() -> dict:
+    return {"name": f"Empresa {uuid.uuid4().hex[:8]}", "nif": uuid.uuid4().hex[:9].upper()}
+
+def test_a_retry_replays_the_first_response(client, admin):
+    headers = {**admin, "Idempotency-Key": str(uuid.uuid4())}
+    body = company_body()
+
+    first = client.post("/api/companies", json=body, headers=headers)
+    retry = client.post("/api/companies", json=body, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["id"] == first.json()["id"]
+    assert retry.headers.get("idempotent-replayed") == "true"
+    assert "idempotent-replayed" not in first.headers
+
+    listed = client.get("/api/companies", params={"search": body["nif"]}, headers=admin)
+    assert [company["id"] for company in listed.json()] == [first.json()["id"]]
+
+def test_a_key_reused_for_another_request_is_422(client, admin):
+    headers = {**admin, "Idempotency-Key": str(uuid.uuid4())}
+    assert client.post("/api/companies", json=company_body(), headers=headers).status_code == 200
+    assert client.post("/api/companies", json=company_body(), headers=headers).status_code == 422
+
+def test_keys_are_scoped_to_the_user(client, admin, make_user):
+    key = str(uuid.uuid4())
+    other = make_user("admin")
+    first = client.post("/api/companies", json=company_body(), headers={**admin, "Idempotency-Key": key})
+    second = client.post("/api/companies", json=company_body(), headers={**other, "Idempotency-Key": key})
+    assert first.status_code == second.status_code == 200
+    assert second.json()["id"] != first.json()["id"]
+    assert "idempotent-replayed" not in second.headers
+
+def test_a_server_error_releases_the_key(client, admin, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+    headers = {**admin, "Idempotency-Key": str(uuid.uuid4())}
+    body = {"name": f"Espacio {uuid.uuid4().hex[:8]}"}
+
+    monkeypatch.setattr(server, "check_data_space_names", broken)
+    assert client.post("/api/data-spaces", json=body, headers=headers).status_code == 500
+    monkeypatch.undo()
+
+    retry = client.post("/api/data-spaces", json=body, headers=headers)
+    assert retry.status_code == 200
+    assert "idempotent-replayed" not in retry.headers
@@ -0,0 +1,193 @@
+import asyncio
+import uuid
+
+import server
+from archive import CollectionStore, CompanyArchiver
+from lifecycle import StateMachine
+from repositories import memory_repositories
+
+def approved_company(client, admin, make_company) -> dict:
+    company = make_company()
+    response = client.post(f"/api/companies/{company['id']}/transitions/approve", headers=admin)
+    assert response.status_code == 200, response.text
+    return company
+
+def fill_checklist(client, admin, company_id: str) -> None:
+    space = client.post("/api/data-spaces", json={"name": f"Espacio {uuid.uuid4().hex[:8]}"}, headers=admin).json()
+    response = client.put(f"/api/companies/{company_id}/project", headers=admin, json={
+        "space_id": space["id"], "target_role": "proveedor", "use_case": "Trazabilidad", "rgpd_checked": True
+    })
+    assert response.status_code == 200, response.text
+
+def test_approve_mirrors_the_company_and_opens_a_project(client, admin, make_company):
+    company = make_company()
+    response = client.post(f"/api/companies/{company['id']}/transitions/approve", headers=admin)
+    assert response.status_code == 200
+    assert response.json()["company"]["status"] == "apta"
+
+    project = client.get(f"/api/companies/{company['id']}/project", headers=admin).json()
+    assert project["incorporation_status"] == "pendiente"
+
+def test_deciding_twice_is_a_conflict(client, admin, make_company):
+    company = approved_company(client, admin, make_company)
+    response = client.post(f"/api/companies/{company['id']}/transitions/reject", headers=admin)
+    assert response.status_code == 409
+    # The dedicated route reports the same rejection as a 400
+    response = client.post(f"/api/companies/{company['id']}/diagnostic/decide", json={"result": "no_apta"}, headers=admin)
+    assert response.status_code == 400
+    assert client.get(f"/api/companies/{company['id']}", headers=admin).json()["status"] == "apta"
+
+def test_missing_documents_and_transitions_are_404(client, admin, make_company):
+    company = make_company()
+    # A lead has no project yet
+    response = client.post(f"/api/companies/{company['id']}/transitions/start_incorporation", headers=admin)
+    assert response.status_code == 404
+    response = client.post(f"/api/companies/{company['id']}/transitions/archive", headers=admin)
+    assert response.status_code == 404
+
+def test_roles_outside_the_transition_are_refused(client, make_user, make_company):
+    company = make_company()
+    cliente = make_user("cliente", company["id"])
+    response = client.post(f"/api/companies/{company['id']}/transitions/approve", headers=cliente)
+    assert response.status_code == 403
+
+def test_completing_needs_the_whole_checklist(client, admin, make_company):
+    company = approved_company(client, admin, make_company)
+    response = client.post(f"/api/companies/{company['id']}/transitions/complete_incorporation", headers=admin)
+    assert response.status_code == 409
+    assert "checklist" in response.json()["detail"]
+
+    fill_checklist(client, admin, company["id"])
+    response = client.post(f"/api/companies/{company['id']}/transitions/complete_incorporation", headers=admin)
+    assert response.status_code == 200
+    response = client.post(f"/api/companies/{company['id']}/transitions/complete_incorporation", headers=admin)
+    assert response.status_code == 409
+
+def test_project_update_honours_if_match(client, admin, make_company):
+    company = approved_company(client, admin, make_company)
+    url = f"/api/companies/{company['id']}/project"
+    etag = client.get(url, headers=admin).headers["ETag"]
+
+    first = client.put(url, json={"use_case": "Primero"}, headers={**admin, "If-Match": etag})
+    assert first.status_code == 200
+    assert first.headers["ETag"] != etag
+
+    stale = client.put(url, json={"use_case": "Segundo"}, headers={**admin, "If-Match": etag})
+    assert stale.status_code == 412
+    assert client.get(url, headers=admin).json()["use_case"] == "Primero"
+
+# ==================== MIRRORS ====================
+def state_machine(repos) -> StateMachine:
+    return StateMachine(repos, server.lifecycle.transitions.values(), initial=server.INITIAL_COMPANY_STATE)
+
+async def company_with_intake(repos) -> None:
+    await repos.companies.insert({"id": "c1", **server.INITIAL_COMPANY_STATE})
+    await repos.intakes.insert({"id": "i1", "company_id": "c1", "submitted": False})
+
+def test_a_late_mirror_write_never_overwrites_a_newer_one():
+    async def scenario():
+        repos = memory_repositories()
+        machine = state_machine(repos)
+        await company_with_intake(repos)
+        companies = repos.companies
+        release = asyncio.Event()
+
+        class HeldSubmitMirror:
+            """Holds the submit's company write until the reset has landed"""
+            def __getattr__(self, name):
+                return getattr(companies, name)
+
+            async def update(self, match, fields, *args, **kwargs):
+                if fields.get("intake_status") == "recibida":
+                    await release.wait()
+                return await companies.update(match, fields, *args, **kwargs)
+
+        repos.companies = HeldSubmitMirror()
+        now = server.utcnow()
+        submit = asyncio.create_task(machine.apply("submit_intake", "c1", now))
+        while not (await repos.intakes.get({"id": "i1"}))["submitted"]:
+            await asyncio.sleep(0)
+        await machine.apply("reset_intake", "c1", now)
+        release.set()
+        applied = await submit
+
+        assert applied.company["intake_status"] == "pendiente"
+        assert (await companies.get({"id": "c1"}))["intake_status"] == "pendiente"
+    asyncio.run(scenario())
+
+def test_repair_puts_a_lagging_mirror_back_in_step():
+    async def scenario():
+        repos = memory_repositories()
+        machine = state_machine(repos)
+        await company_with_intake(repos)
+        # The intake moved but the process died before its mirror write
+        await repos.intakes.update({"id": "i1"}, {"submitted": True}, increments={"state_version": 1})
+
+        assert await machine.repair(await repos.companies.list({}), server.utcnow()) == 1
+        assert (await repos.companies.get({"id": "c1"}))["intake_status"] == "recibida"
+        assert await machine.repair(await repos.companies.list({}), server.utcnow()) == 0
+    asyncio.run(scenario())
+
+# ==================== PROJECT UPDATE ====================
+def spy_on_projects(monkeypatch) -> list:
+    """Record every call reaching the project repository"""
+    calls = []
+    inner = server.repos.projects.inner
+    for name in ("get", "list", "update", "update_computed", "update_many"):
+        method = getattr(inner, name)
+
+        async def spy(*args, _name=name, _method=method, **kwargs):
+            result = await _method(*args, **kwargs)
+            calls.append((_name, args, result))
+            return result
+        monkeypatch.setattr(inner, name, spy)
+    return calls
+
+def test_project_update_is_a_single_write(client, admin, make_company, monkeypatch):
+    company = approved_company(client, admin, make_company)
+    calls = spy_on_projects(monkeypatch)
+
+    response = client.put(f"/api/companies/{company['id']}/project", json={"use_case": "Uno"}, headers=admin)
+    assert response.status_code == 200
+    assert [name for name, _, _ in calls] == ["update_computed"]
+    assert response.json()["incorporation_checklist"]["caso_uso_definido"] is True
+
+def test_completion_is_refused_by_the_write_filter(client, admin, make_company, monkeypatch):
+    company = approved_company(client, admin, make_company)
+    fill_checklist(client, admin, company["id"])
+    client.put(f"/api/companies/{company['id']}/project", json={"rgpd_checked": False}, headers=admin)
+    calls = spy_on_projects(monkeypatch)
+
+    response = client.put(
+        f"/api/companies/{company['id']}/project", json={"incorporation_status": "completada"}, headers=admin
+    )
+    assert response.status_code == 400
+    (name, (match, *_), result), *_ = calls
+    assert name == "update_computed" and result is None
+    assert match["incorporation_checklist.validacion_rgpd"] is True
+    project = client.get(f"/api/companies/{company['id']}/project", headers=admin).json()
+    assert project["incorporation_status"] == "pendiente"
+
+# ==================== ARCHIVE ====================
+def test_a_child_written_during_the_archive_keeps_its_company_hot():
+    async def scenario():
+        repos = memory_repositories()
+        archiver = CompanyArchiver(repos, CollectionStore(repos.archive))
+        for company_id in ("c1", "c2"):
+            await repos.companies.insert({"id": company_id, "status": "descartada"})
+            await repos.projects.insert({"id": f"p-{company_id}", "company_id": company_id, "version": 1})
+        companies = await repos.companies.list({})
+        bundles = archiver.bundles
+
+        async def write_after_read(read):
+            read_bundles = await bundles(read)
+            await repos.projects.update({"id": "p-c2"}, {"use_case": "Nuevo"}, increments={"version": 1})
+            return read_bundles
+        archiver.bundles = write_after_read
+
+        assert await archiver.archive(companies, server.utcnow()) == ["c1"]
+        assert await repos.companies.get({"id": "c1"}) is None
+        assert (await repos.companies.get({"id": "c2"}))["status"] == "descartada"
+        assert (await repos.projects.get({"id": "p-c2"}))["use_case"] == "Nuevo"
+        assert [entry["id"] for entry in await repos.archive.list({})] == ["c1"]
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from notifications import PENDING_COUNT, OutboxDispatcher, StubSink, outbox_entries, pending_notification
+from repositories import memory_repositories
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def dispatcher(repos, clock=lambda: NOW) -> OutboxDispatcher:
+    async def render(document: dict, record: dict):
+        return outbox_entries(
+            ["stub"], record["event"], document["company_id"], "Asunto", "Cuerpo", [], {}, record["created_at"],
+            key=record["id"]
+        )
+    return OutboxDispatcher(
+        repos.outbox, {"stub": StubSink()}, clock, sources={"diagnostics": repos.diagnostics}, render=render, grace=60
+    )
+
+async def decided_diagnostic(repos) -> dict:
+    """A diagnostic decided with its notification recorded in the same write"""
+    await repos.diagnostics.insert({"id": "d1", "company_id": "c1", "result": "pendiente"})
+    fields, increments = pending_notification("diagnostic_decided", NOW)
+    return await repos.diagnostics.update({"id": "d1"}, {"result": "apta", **fields}, increments=increments)
+
+def test_collecting_twice_writes_the_entries_once():
+    async def scenario():
+        repos = memory_repositories()
+        notifier = dispatcher(repos)
+        diagnostic = await decided_diagnostic(repos)
+
+        assert await notifier.collect("diagnostics", diagnostic) == 1
+        # A second collector working from the same read
+        assert await notifier.collect("diagnostics", diagnostic) == 0
+        assert await repos.outbox.count({}) == 1
+        stored = await repos.diagnostics.get({"id": "d1"})
+        assert stored[PENDING_COUNT] == 0 and stored["pending_notifications"] == {}
+    asyncio.run(scenario())
+
+def test_the_sweep_picks_up_what_a_request_left_behind():
+    async def scenario():
+        repos = memory_repositories()
+        clock = [NOW]
+        notifier = dispatcher(repos, lambda: clock[0])
+        await decided_diagnostic(repos)
+
+        # Still within the grace period of the request that wrote it
+        assert await notifier.sweep() == 0
+        clock[0] += timedelta(minutes=2)
+        assert await notifier.sweep() == 1
+        assert await notifier.run_once() == 1
+        assert len(notifier.sinks["stub"].sent) == 1
+    asyncio.run(scenario())